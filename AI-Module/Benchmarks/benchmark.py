@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmark
+Builds a synthetic library in growing steps and measures, at every library size:
+  - ingestion throughput (songs/s and audio seconds/s) through LocalIndexer
+  - database size per song and fingerprints per song
+  - SongRecognizer.recognize latency (p50/p99) and per-stage costs of a query
+Results are written as JSON and can be compared against a stored baseline.
+Runs fully offline on CPU.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import platform
+import tempfile
+import argparse
+import contextlib
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, '..', 'Core'))
+sys.path.append(os.path.join(current_dir, '..', 'Preprocessing'))
+sys.path.append(os.path.join(current_dir, '..', 'Inference'))
+sys.path.append(os.path.join(current_dir, '..', 'Training'))
+
+from fingerprinter import fingerprint_config, config_version
+from recognizer import SongRecognizer, fingerprint_query_samples
+from local_indexer import LocalIndexer
+from synthetic import generate_library, generate_queries
+
+# Metric -> +1 if higher is better, -1 if lower is better (used for baseline comparison)
+METRICS = {
+    "ingest_songs_per_second": 1,
+    "ingest_audio_seconds_per_second": 1,
+    "db_bytes_per_song": -1,
+    "recognize_p50_ms": -1,
+    "recognize_p99_ms": -1,
+    "top1_accuracy": 1,
+}
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+def db_size(db_path):
+    """Database size on disk (including an un-checkpointed WAL)"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def count_fingerprints(db):
+    conn = sqlite3.connect(db.db_path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {db._fp_table(conn.cursor())}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def time_stages(recognizer, path):
+    """Run the recognition steps one by one. Returns per-stage milliseconds"""
+    timings = {}
+    start = time.perf_counter()
+    y, sr = recognizer.processor.load_audio(path)
+    timings["load"] = time.perf_counter() - start
+
+    # Same window selection and fingerprinting as SongRecognizer.recognize
+    start = time.perf_counter()
+    hashes, _ = fingerprint_query_samples(recognizer.processor, recognizer.fingerprinter, y,
+                                          recognizer.max_query_seconds)
+    timings["fingerprint"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = list(recognizer.db.get_matches(hashes))
+    timings["lookup"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recognizer.score_matches(matches, len(hashes), return_top_n=3, min_confidence=0.1)
+    timings["score"] = time.perf_counter() - start
+    return {stage: seconds * 1000 for stage, seconds in timings.items()}
+
+
+class Benchmark:
+    def __init__(self, work_dir, sizes=(10, 50, 200), song_seconds=30.0, queries=20, clip_seconds=5.0,
+                 snr_db=10.0, workers=None, seed=0):
+        """
+        Args:
+            work_dir: Where the library, queries and database are created
+            sizes: Library sizes to measure (ascending; the library grows between steps)
+            song_seconds: Length of every synthetic song
+            queries: Query clips recognized at every size
+            clip_seconds: Query clip length
+            snr_db: Noise added to query clips
+            workers: Fingerprinting processes used for ingestion (default: CPU count)
+            seed: Library seed
+        """
+        self.work_dir = work_dir
+        self.sizes = sorted(sizes)
+        self.song_seconds = song_seconds
+        self.queries = queries
+        self.clip_seconds = clip_seconds
+        self.snr_db = snr_db
+        self.workers = workers
+        self.seed = seed
+
+    def run(self, quiet=True):
+        """Returns: Results dict (environment, parameters and one entry per library size)"""
+        library_dir = os.path.join(self.work_dir, "library")
+        active_dir = os.path.join(self.work_dir, "active")
+        db_path = os.path.join(self.work_dir, "bench.db")
+        for path in (active_dir, db_path, db_path + "-wal", db_path + "-shm"):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        os.makedirs(active_dir)
+
+        print(f"[*] Generating {self.sizes[-1]} synthetic songs...", file=sys.stderr)
+        songs = generate_library(library_dir, self.sizes[-1], self.song_seconds, self.seed)
+
+        steps = []
+        indexed = 0
+        for size in self.sizes:
+            # Grow the library the indexer sees; only the new songs are ingested
+            manifest = {}
+            for song in songs[:size]:
+                name = os.path.basename(song["path"])
+                link = os.path.join(active_dir, name)
+                if not os.path.exists(link):
+                    os.symlink(os.path.abspath(song["path"]), link)
+                manifest[name] = {"title": song["title"], "artist": song["artist"]}
+            with open(os.path.join(active_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+
+            print(f"[*] Library size {size}: ingesting {size - indexed} songs...", file=sys.stderr)
+            indexer = LocalIndexer(db_path=db_path, workers=self.workers)
+            with self._quiet(quiet):
+                start = time.perf_counter()
+                summary = indexer.index_directory(active_dir)
+                ingest_seconds = time.perf_counter() - start
+            new_songs = summary["indexed"]
+            indexed += new_songs
+
+            queries = generate_queries(songs[:size], os.path.join(self.work_dir, f"queries_{size}"), self.queries,
+                                       self.clip_seconds, self.song_seconds, self.snr_db, self.seed + size)
+            print(f"[*] Library size {size}: recognizing {len(queries)} queries...", file=sys.stderr)
+            steps.append(self._measure(size, db_path, indexer.db, queries, new_songs, ingest_seconds, summary))
+
+        return {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "parameters": {
+                "sizes": self.sizes,
+                "song_seconds": self.song_seconds,
+                "queries": self.queries,
+                "clip_seconds": self.clip_seconds,
+                "snr_db": self.snr_db,
+                "workers": self.workers,
+                "seed": self.seed,
+            },
+            "steps": steps,
+        }
+
+    @staticmethod
+    def _quiet(quiet):
+        return contextlib.redirect_stdout(open(os.devnull, "w")) if quiet else contextlib.nullcontext()
+
+    def _measure(self, size, db_path, db, queries, new_songs, ingest_seconds, summary):
+        recognizer = SongRecognizer(db_path=db_path)
+        if queries:
+            # Warm-up (imports, JIT compilation, page cache) is not part of steady-state latency
+            recognizer.recognize(queries[0]["path"])
+        latencies = []
+        stages = {}
+        correct = 0
+        for query in queries:
+            start = time.perf_counter()
+            result = recognizer.recognize(query["path"])
+            latencies.append((time.perf_counter() - start) * 1000)
+            if result.get("match_found") and result["matches"][0]["title"] == query["title"]:
+                correct += 1
+            for stage, ms in time_stages(recognizer, query["path"]).items():
+                stages.setdefault(stage, []).append(ms)
+
+        total_bytes = db_size(db_path)
+        fingerprints = count_fingerprints(db)
+        return {
+            "library_size": size,
+            "ingested": new_songs,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "ingest_songs_per_second": round(new_songs / ingest_seconds, 3) if ingest_seconds > 0 else None,
+            "ingest_audio_seconds_per_second": round(new_songs * self.song_seconds / ingest_seconds, 2) if ingest_seconds > 0 else None,
+            "ingest_stages": summary.get("stages"),
+            "db_bytes": total_bytes,
+            "db_bytes_per_song": round(total_bytes / size, 1),
+            "fingerprints_per_song": round(fingerprints / size, 1),
+            "recognize_p50_ms": percentile(latencies, 50),
+            "recognize_p99_ms": percentile(latencies, 99),
+            "recognize_mean_ms": round(float(np.mean(latencies)), 2),
+            "query_stages_mean_ms": {stage: round(float(np.mean(values)), 3) for stage, values in stages.items()},
+            "top1_accuracy": round(correct / len(queries), 3) if queries else None,
+            "fingerprint_version": config_version(fingerprint_config(recognizer.processor, recognizer.fingerprinter)),
+        }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare results with a baseline run (steps matched by library size).
+
+    Returns: List of regression dicts (metric, library_size, baseline, current, change)
+    """
+    regressions = []
+    base_steps = {step["library_size"]: step for step in baseline.get("steps", [])}
+    for step in results["steps"]:
+        base = base_steps.get(step["library_size"])
+        if not base:
+            continue
+        for metric, direction in METRICS.items():
+            old, new = base.get(metric), step.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction < -tolerance:
+                regressions.append({"metric": metric, "library_size": step["library_size"],
+                                    "baseline": old, "current": new, "change": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark ingestion, storage and recognition on a synthetic library",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Quick run, save results
+  python benchmark.py --sizes 10,50 --out results.json
+
+  # Compare with a stored baseline (exit code 1 on regressions beyond 20%)
+  python benchmark.py --baseline baseline.json --tolerance 0.2
+        """
+    )
+    parser.add_argument('--sizes', default='10,50,200', help='Comma-separated library sizes (default: 10,50,200)')
+    parser.add_argument('--song-seconds', type=float, default=30.0, help='Synthetic song length (default: 30)')
+    parser.add_argument('--queries', type=int, default=20, help='Queries per library size (default: 20)')
+    parser.add_argument('--clip-seconds', type=float, default=5.0, help='Query clip length (default: 5)')
+    parser.add_argument('--snr', type=float, default=10.0, help='Query SNR in dB (default: 10)')
+    parser.add_argument('--workers', type=int, help='Ingestion fingerprinting processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=0, help='Library seed (default: 0)')
+    parser.add_argument('--work-dir', help='Keep library and database here (default: temporary directory)')
+    parser.add_argument('--out', help='Write results JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='Baseline results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression (default: 0.2)')
+    parser.add_argument('--verbose', action='store_true', help='Show indexer output')
+
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="viltrumite-bench-")
+    try:
+        bench = Benchmark(work_dir, sizes=sizes, song_seconds=args.song_seconds, queries=args.queries,
+                          clip_seconds=args.clip_seconds, snr_db=args.snr, workers=args.workers, seed=args.seed)
+        results = bench.run(quiet=not args.verbose)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    for step in results["steps"]:
+        print(f"[{step['library_size']:>6} songs] ingest {step['ingest_songs_per_second']} songs/s, "
+              f"{step['db_bytes_per_song'] / 1024:.1f} KiB/song, recognize p50 {step['recognize_p50_ms']}ms "
+              f"p99 {step['recognize_p99_ms']}ms, top-1 {step['top1_accuracy']:.0%}", file=sys.stderr)
+    for r in regressions:
+        print(f"[!] Regression: {r['metric']} at {r['library_size']} songs: {r['baseline']} -> {r['current']} "
+              f"({r['change']:+.0%})", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
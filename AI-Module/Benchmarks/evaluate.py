@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Fingerprint Parameter Evaluation
+Measures what a fingerprint parameter profile costs (hashes per second of audio, storage,
+indexing and query time) and what it buys (recall and false-positive rate on distorted
+queries), so the profile on the accuracy/speed Pareto front can be chosen deliberately.
+
+Queries are cut from indexed tracks and distorted with crops, additive noise, gain changes
+and lossy codec round-trips; negative queries come from tracks that are not indexed.
+Every profile is evaluated on exactly the same queries.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import argparse
+import contextlib
+
+import numpy as np
+import soundfile as sf
+import librosa
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, '..', 'Core'))
+sys.path.append(os.path.join(current_dir, '..', 'Preprocessing'))
+sys.path.append(os.path.join(current_dir, '..', 'Inference'))
+
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter, fingerprint_config, config_version
+from database import DatabaseHandler
+from recognizer import SongRecognizer
+from synthetic import SAMPLE_RATE, NEGATIVE_SEED_BASE, synth_song
+
+PROCESSOR_KEYS = ('sample_rate', 'window_size', 'step_size')
+FINGERPRINTER_KEYS = ('fan_value', 'amp_min', 'neighborhood_size', 'max_time_delta',
+                      'pairing', 'zone_min_dt', 'zone_max_dt', 'zone_df',
+                      'peak_budget', 'query_peak_budget', 'slice_frames', 'freq_bands')
+
+# Built-in profiles; "current" is whatever AudioProcessor/Fingerprinter default to
+PROFILES = {
+    "current": {},
+    "previous": {"fan_value": 5, "amp_min": 30, "neighborhood_size": 20},
+    "dense": {"fan_value": 10, "amp_min": 10, "neighborhood_size": 10},
+    "sparse": {"fan_value": 5, "amp_min": 40, "neighborhood_size": 25},
+    "fine-time": {"step_size": 1024},
+    "zone": {"pairing": "zone"},
+}
+
+# Distortion name -> (kind, value)
+DISTORTIONS = {
+    "clean": ("none", None),
+    "noise-20db": ("noise", 20),
+    "noise-10db": ("noise", 10),
+    "noise-5db": ("noise", 5),
+    "noise-0db": ("noise", 0),
+    "gain-minus-12db": ("gain", -12),
+    "gain-plus-12db": ("gain", 12),       # clips
+    "mp3": ("codec", ("MP3", "MPEG_LAYER_III")),
+    "ogg": ("codec", ("OGG", "VORBIS")),
+}
+
+
+def parse_profile(spec):
+    """
+    "name" (built-in) or "name:key=value,key=value" (custom, unspecified keys use the defaults)
+    Returns: (name, params dict)
+    """
+    name, _, params = spec.partition(':')
+    if not params:
+        if name not in PROFILES:
+            raise ValueError(f"Unknown profile '{name}' (built-in: {', '.join(PROFILES)})")
+        return name, dict(PROFILES[name])
+    values = {}
+    for pair in params.split(','):
+        key, _, value = pair.partition('=')
+        key = key.strip().replace('-', '_')
+        if key not in PROCESSOR_KEYS + FINGERPRINTER_KEYS:
+            raise ValueError(f"Unknown parameter '{key}'")
+        values[key] = value.strip() if key == 'pairing' else int(value)
+    return name, values
+
+
+def build_components(params):
+    """Returns: (AudioProcessor, Fingerprinter) for a profile"""
+    processor = AudioProcessor(**{k: v for k, v in params.items() if k in PROCESSOR_KEYS})
+    fingerprinter = Fingerprinter(**{k: v for k, v in params.items() if k in FINGERPRINTER_KEYS})
+    return processor, fingerprinter
+
+
+def distort(y, kind, value, seed=0, sample_rate=SAMPLE_RATE):
+    """Apply one distortion to mono float audio. Returns float32 audio"""
+    y = y.astype(np.float64)
+    if kind == "noise":
+        rng = np.random.default_rng(seed)
+        noise_power = np.mean(y ** 2) / (10 ** (value / 10))
+        y = y + rng.normal(0, np.sqrt(noise_power), len(y))
+    elif kind == "gain":
+        y = np.clip(y * 10 ** (value / 20), -1.0, 1.0)
+    elif kind == "codec":
+        fmt, subtype = value
+        buffer = io.BytesIO()
+        sf.write(buffer, y.astype(np.float32), sample_rate, format=fmt, subtype=subtype)
+        buffer.seek(0)
+        y, _ = sf.read(buffer, dtype='float64')
+    return np.clip(y, -1.0, 1.0).astype(np.float32)
+
+
+def codec_available(fmt, subtype):
+    try:
+        distort(np.zeros(SAMPLE_RATE // 10, dtype=np.float32), "codec", (fmt, subtype))
+        return True
+    except Exception:
+        return False
+
+
+def load_library(directory=None, n_songs=20, song_seconds=30.0, seed=0):
+    """
+    Tracks to index: audio files from a directory, or synthetic songs.
+    Returns: List of (title, float32 audio at SAMPLE_RATE)
+    """
+    if directory:
+        tracks = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and name.lower().endswith(('.wav', '.mp3', '.flac', '.ogg', '.m4a', '.webm', '.opus')):
+                y, _ = librosa.load(path, sr=SAMPLE_RATE, mono=True)
+                tracks.append((os.path.splitext(name)[0], y))
+                if len(tracks) >= n_songs:
+                    break
+        return tracks
+    return [(f"Synthetic {i:05d}", synth_song(seed * 1_000_003 + i, song_seconds)) for i in range(n_songs)]
+
+
+def build_queries(tracks, distortions, clip_seconds=(5.0,), per_track=1, negatives=10, song_seconds=30.0, seed=0):
+    """
+    Distorted query clips. Negatives are cut from synthetic songs that are never indexed.
+    Returns: List of dicts (title or None, distortion, clip_seconds, audio)
+    """
+    rng = np.random.default_rng(seed + 11)
+    sources = [(title, y) for title, y in tracks for _ in range(per_track)]
+    sources += [(None, synth_song(NEGATIVE_SEED_BASE + seed * 1_000_003 + n, song_seconds)) for n in range(negatives)]
+
+    queries = []
+    for n, (title, y) in enumerate(sources):
+        for seconds in clip_seconds:
+            length = min(int(seconds * SAMPLE_RATE), len(y))
+            start = int(rng.integers(0, len(y) - length + 1))
+            clip = y[start:start + length]
+            for name in distortions:
+                kind, value = DISTORTIONS[name]
+                queries.append({"title": title, "distortion": name, "clip_seconds": seconds,
+                                "audio": distort(clip, kind, value, seed=seed + n)})
+    return queries
+
+
+def db_size(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+
+
+def fingerprint_audio(processor, fingerprinter, y, query=False):
+    if processor.sample_rate != SAMPLE_RATE:
+        y = librosa.resample(y, orig_sr=SAMPLE_RATE, target_sr=processor.sample_rate)
+    spec = processor.get_spectrogram(y)
+    return fingerprinter.generate_hashes(fingerprinter.get_2d_peaks(spec, query=query))
+
+
+def evaluate_profile(name, params, tracks, queries, work_dir, accept_confidence=5.0):
+    """
+    Index the tracks with one profile and run every query against it.
+    Returns: Report dict
+    """
+    processor, fingerprinter = build_components(params)
+    config = fingerprint_config(processor, fingerprinter)
+    db_path = os.path.join(work_dir, f"{config_version(config)}.db")
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    db = DatabaseHandler(db_path)
+    db.ensure_fingerprint_version(config_version(config), config)
+
+    start = time.perf_counter()
+    total_hashes = 0
+    songs = []
+    for i, (title, y) in enumerate(tracks):
+        hashes = fingerprint_audio(processor, fingerprinter, y)
+        total_hashes += len(hashes)
+        songs.append({"title": title, "artist": "Evaluation", "file_hash": f"eval-{i}", "genre": None,
+                      "url": None, "thumbnail": None, "fingerprints": hashes})
+    fingerprint_seconds = time.perf_counter() - start
+    db.add_songs_batch(songs)
+    index_seconds = time.perf_counter() - start
+    audio_seconds = sum(len(y) for _, y in tracks) / SAMPLE_RATE
+
+    recognizer = SongRecognizer(db_path=db_path, processor=processor, fingerprinter=fingerprinter)
+    latencies = []
+    rows_matched = []
+    by_distortion = {}
+    true_positives = positives = false_positives = negatives = 0
+    for query in queries:
+        start = time.perf_counter()
+        result = recognizer.recognize_hashes(fingerprint_audio(processor, fingerprinter, query["audio"], query=True),
+                                             return_top_n=1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows_matched.append(result.get("total_matches_checked", 0))
+
+        top = result["matches"][0] if result.get("match_found") else None
+        accepted = top if top and top["confidence"] >= accept_confidence else None
+        stats = by_distortion.setdefault(query["distortion"], {"hits": 0, "positives": 0})
+        if query["title"] is None:
+            negatives += 1
+            false_positives += accepted is not None
+        else:
+            positives += 1
+            stats["positives"] += 1
+            if accepted and accepted["title"] == query["title"]:
+                true_positives += 1
+                stats["hits"] += 1
+
+    return {
+        "profile": name,
+        "params": dict({k: v for k, v in config.items() if k != "hash_scheme"},
+                       **({"query_peak_budget": fingerprinter.query_peak_budget} if fingerprinter.query_peak_budget else {})),
+        "version": config_version(config),
+        "recall": round(true_positives / positives, 4) if positives else None,
+        "false_positive_rate": round(false_positives / negatives, 4) if negatives else None,
+        "recall_by_distortion": {d: round(s["hits"] / s["positives"], 4) for d, s in by_distortion.items() if s["positives"]},
+        "hashes_per_audio_second": round(total_hashes / audio_seconds, 1),
+        "db_bytes_per_song": round(db_size(db_path) / len(tracks), 1),
+        "index_seconds_per_audio_hour": round(fingerprint_seconds / audio_seconds * 3600, 1),
+        "write_seconds": round(index_seconds - fingerprint_seconds, 3),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "query_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "rows_per_query": round(float(np.mean(rows_matched)), 1),
+    }
+
+
+def pareto_front(reports):
+    """
+    Mark reports that no other report beats on every axis
+    (higher recall, lower false-positive rate, fewer hashes, lower query latency).
+    """
+    def axes(r):
+        return (-(r["recall"] or 0), r["false_positive_rate"] or 0, r["hashes_per_audio_second"], r["query_p50_ms"])
+
+    for report in reports:
+        mine = axes(report)
+        report["pareto"] = not any(
+            all(o <= m for o, m in zip(axes(other), mine)) and axes(other) != mine
+            for other in reports if other is not report
+        )
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate recall, false positives, storage and latency of fingerprint parameter profiles",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Built-in profiles: {', '.join(PROFILES)}
+Distortions: {', '.join(DISTORTIONS)}
+
+Examples:
+  python evaluate.py --profiles current,previous,dense
+  python evaluate.py --profiles current,"wide:fan_value=10,neighborhood_size=20" --songs 50 --out eval.json
+  python evaluate.py --library ~/Music/sample --distortions clean,noise-5db,mp3
+        """
+    )
+    parser.add_argument('--profiles', default='current,previous,dense,sparse',
+                        help='Comma-separated profiles; custom ones as name:key=value,... (quote them)')
+    parser.add_argument('--profile', action='append', default=[], help='Add one profile (may be repeated)')
+    parser.add_argument('--library', help='Directory of real tracks to index (default: synthetic songs)')
+    parser.add_argument('--songs', type=int, default=20, help='Tracks to index (default: 20)')
+    parser.add_argument('--song-seconds', type=float, default=30.0, help='Synthetic song length (default: 30)')
+    parser.add_argument('--clip-seconds', default='5', help='Comma-separated query lengths (default: 5)')
+    parser.add_argument('--distortions', default=','.join(DISTORTIONS), help='Comma-separated distortions (default: all)')
+    parser.add_argument('--negatives', type=int, default=10, help='Tracks used for negative queries (default: 10)')
+    parser.add_argument('--accept-confidence', type=float, default=5.0,
+                        help='Confidence (%%) a top match needs to count as an answer (default: 5)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--out', help='Write the report JSON here (default: stdout)')
+
+    args = parser.parse_args()
+
+    # Split on commas that start a new profile (custom profiles contain commas themselves)
+    specs = []
+    for part in args.profiles.split(','):
+        if '=' in part and ':' not in part and specs:
+            specs[-1] += ',' + part
+        elif part:
+            specs.append(part)
+    profiles = [parse_profile(spec) for spec in specs + args.profile]
+
+    distortions = [d for d in args.distortions.split(',') if d]
+    for d in distortions:
+        if d not in DISTORTIONS:
+            parser.error(f"Unknown distortion '{d}'")
+        kind, value = DISTORTIONS[d]
+        if kind == "codec" and not codec_available(*value):
+            print(f"[!] Skipping {d}: codec not available in libsndfile", file=sys.stderr)
+    distortions = [d for d in distortions if DISTORTIONS[d][0] != "codec" or codec_available(*DISTORTIONS[d][1])]
+    if not distortions:
+        parser.error("No distortions left to evaluate (none given, or their codecs are not available)")
+
+    print("[*] Preparing tracks and queries...", file=sys.stderr)
+    tracks = load_library(args.library, args.songs, args.song_seconds, args.seed)
+    if not tracks:
+        print("Error: No tracks to index", file=sys.stderr)
+        sys.exit(1)
+    clip_seconds = [float(s) for s in args.clip_seconds.split(',') if s]
+    queries = build_queries(tracks, distortions, clip_seconds, negatives=args.negatives,
+                            song_seconds=args.song_seconds, seed=args.seed)
+    if not queries:
+        parser.error("No queries to evaluate (check --clip-seconds and --negatives)")
+
+    work_dir = tempfile.mkdtemp(prefix="viltrumite-eval-")
+    reports = []
+    try:
+        for name, params in profiles:
+            print(f"[*] Profile {name}: {len(tracks)} tracks, {len(queries)} queries...", file=sys.stderr)
+            with contextlib.redirect_stdout(sys.stderr):
+                reports.append(evaluate_profile(name, params, tracks, queries, work_dir, args.accept_confidence))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    pareto_front(reports)
+
+    output = json.dumps({"tracks": len(tracks), "queries": len(queries), "distortions": distortions,
+                         "accept_confidence": args.accept_confidence, "profiles": reports}, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    print(f"\n{'profile':<16}{'recall':>8}{'fpr':>8}{'hash/s':>9}{'KiB/song':>10}{'p50 ms':>9}{'p99 ms':>9}{'rows/q':>9}  pareto",
+          file=sys.stderr)
+    for r in reports:
+        print(f"{r['profile']:<16}{r['recall'] or 0:>8.1%}{r['false_positive_rate'] or 0:>8.1%}{r['hashes_per_audio_second']:>9.0f}"
+              f"{r['db_bytes_per_song'] / 1024:>10.1f}{r['query_p50_ms']:>9.1f}{r['query_p99_ms']:>9.1f}{r['rows_per_query']:>9.0f}  "
+              f"{'*' if r['pareto'] else ''}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Synthetic Audio Library
+Deterministic tone-and-noise "songs" and noisy query clips for benchmarks and evaluations.
+The same seed always produces the same audio, so results are comparable across runs and machines.
+"""
+
+import os
+import json
+import argparse
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 44100
+NEGATIVE_SEED_BASE = 1 << 40
+
+
+def synth_song(seed, seconds=30.0, sample_rate=SAMPLE_RATE):
+    """
+    Generate one song: a sequence of short notes (1-3 partials each) over quiet noise,
+    with a noise burst on every beat.
+
+    Returns: float32 mono audio
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    y = np.zeros(total, dtype=np.float64)
+
+    pos = 0
+    while pos < total:
+        length = min(int(rng.uniform(0.15, 0.5) * sample_rate), total - pos)
+        t = np.arange(length) / sample_rate
+        envelope = np.minimum(1.0, np.minimum(t, t[::-1]) * 40)  # 25ms attack/release
+        for _ in range(rng.integers(1, 4)):
+            freq = rng.uniform(100, 5000)
+            y[pos:pos + length] += rng.uniform(0.2, 0.6) * envelope * np.sin(2 * np.pi * freq * t + rng.uniform(0, 2 * np.pi))
+        pos += length
+
+    beat = int(sample_rate * 60 / rng.uniform(80, 140))
+    burst = int(0.03 * sample_rate)
+    for start in range(0, total - burst, beat):
+        y[start:start + burst] += rng.normal(0, 0.3, burst) * np.linspace(1, 0, burst)
+
+    y += rng.normal(0, 0.01, total)
+    return (0.8 * y / np.max(np.abs(y))).astype(np.float32)
+
+
+def make_clip(y, start, seconds, snr_db=None, seed=0, sample_rate=SAMPLE_RATE):
+    """
+    Cut a query clip from a song and optionally add white noise at the given SNR (dB).
+
+    Returns: float32 mono audio
+    """
+    begin = int(start * sample_rate)
+    clip = y[begin:begin + int(seconds * sample_rate)].astype(np.float64)
+    if snr_db is not None:
+        rng = np.random.default_rng(seed)
+        noise_power = np.mean(clip ** 2) / (10 ** (snr_db / 10))
+        clip = clip + rng.normal(0, np.sqrt(noise_power), len(clip))
+    peak = np.max(np.abs(clip)) or 1.0
+    return (0.9 * clip / max(peak, 0.9)).astype(np.float32)
+
+
+def song_title(index):
+    return f"Synthetic {index:05d}"
+
+
+def generate_library(directory, n_songs, seconds=30.0, seed=0):
+    """
+    Write n_songs songs as 16-bit WAV plus a manifest.json usable by local_indexer.py.
+    Existing files are kept (generation is deterministic), so growing a library is cheap.
+
+    Returns: List of song dicts (index, path, title, artist, seed)
+    """
+    os.makedirs(directory, exist_ok=True)
+    songs = []
+    manifest = {}
+    for i in range(n_songs):
+        name = f"song_{i:05d}.wav"
+        path = os.path.join(directory, name)
+        song_seed = seed * 1_000_003 + i
+        if not os.path.exists(path):
+            sf.write(path, synth_song(song_seed, seconds), SAMPLE_RATE, subtype='PCM_16')
+        title = song_title(i)
+        artist = f"Generator {seed}"
+        manifest[name] = {"title": title, "artist": artist, "genre": "Synthetic"}
+        songs.append({"index": i, "path": path, "title": title, "artist": artist, "seed": song_seed})
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return songs
+
+
+def generate_queries(songs, directory, n_queries, clip_seconds=5.0, song_seconds=30.0, snr_db=10.0, seed=0,
+                     n_negatives=0):
+    """
+    Write noisy query clips cut from random songs, plus a manifest.jsonl usable by batch_recognizer.py.
+    Negatives are clips of songs that are not in the library ("title": None).
+
+    Returns: List of query dicts (id, path, title, start)
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed + 7)
+    queries = []
+    for q in range(n_queries + n_negatives):
+        if q < n_queries:
+            song = songs[int(rng.integers(len(songs)))]
+            song_seed, title = song["seed"], song["title"]
+        else:
+            # Seeds far outside the range generate_library uses
+            song_seed, title = NEGATIVE_SEED_BASE + seed * 1_000_003 + q, None
+        start = float(rng.uniform(0, max(0.0, song_seconds - clip_seconds)))
+        y = synth_song(song_seed, song_seconds)
+        path = os.path.join(directory, f"query_{q:05d}.wav")
+        sf.write(path, make_clip(y, start, clip_seconds, snr_db, seed=seed + q), SAMPLE_RATE, subtype='PCM_16')
+        queries.append({"id": f"query_{q:05d}", "path": path, "title": title, "start": round(start, 3)})
+    with open(os.path.join(directory, "manifest.jsonl"), "w") as f:
+        for query in queries:
+            f.write(json.dumps(query) + "\n")
+    return queries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic library and query clips")
+    parser.add_argument('directory', help='Output directory (library/ and queries/ are created inside)')
+    parser.add_argument('--songs', type=int, default=100, help='Number of songs (default: 100)')
+    parser.add_argument('--seconds', type=float, default=30.0, help='Song length in seconds (default: 30)')
+    parser.add_argument('--queries', type=int, default=50, help='Number of query clips (default: 50)')
+    parser.add_argument('--clip-seconds', type=float, default=5.0, help='Query clip length (default: 5)')
+    parser.add_argument('--negatives', type=int, default=0, help='Query clips of songs not in the library (default: 0)')
+    parser.add_argument('--snr', type=float, default=10.0, help='Query SNR in dB (default: 10)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    args = parser.parse_args()
+    songs = generate_library(os.path.join(args.directory, "library"), args.songs, args.seconds, args.seed)
+    queries = generate_queries(songs, os.path.join(args.directory, "queries"), args.queries,
+                               args.clip_seconds, args.seconds, args.snr, args.seed, n_negatives=args.negatives)
+    print(f"[*] Wrote {len(songs)} songs and {len(queries)} queries to {args.directory}")
@@ -1,7 +1,18 @@
 import sqlite3
 import os
+import json
+import time
+from collections import Counter
 from difflib import SequenceMatcher
 
+from fingerprint_batch import FingerprintBatch
+import minhash
+
+# Ingestion ledger statuses
+LEDGER_DONE = "done"
+LEDGER_FAILED = "failed"
+LEDGER_DUPLICATE = "skipped-duplicate"
+
 class DatabaseHandler:
     def __init__(self, db_path=None):
         if db_path is None:
@@ -48,6 +59,339 @@ class DatabaseHandler:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_hash ON fingerprints (hash)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_song_id ON fingerprints (song_id)')
         
+        # Fingerprint versions: each parameter set gets its own table so a new version can be
+        # rebuilt side-by-side and switched to atomically. The original "fingerprints" table is
+        # adopted as the first version.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fingerprint_versions (
+                version TEXT PRIMARY KEY,
+                config TEXT,
+                table_name TEXT,
+                status TEXT,
+                created_at REAL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        
+        # Archived decoded audio, used to re-fingerprint without re-downloading
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS song_archives (
+                song_id INTEGER PRIMARY KEY,
+                path TEXT,
+                sample_rate INTEGER,
+                FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+            )
+        ''')
+        
+        # MinHash signatures and LSH band buckets per song and fingerprint table, so audio
+        # duplicate checks only compare against a handful of candidate songs
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS minhash_signatures (
+                song_id INTEGER,
+                fp_table TEXT,
+                signature BLOB,
+                PRIMARY KEY (song_id, fp_table),
+                FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS minhash_bands (
+                fp_table TEXT,
+                band INTEGER,
+                bucket INTEGER,
+                song_id INTEGER,
+                FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_minhash_bands ON minhash_bands (fp_table, band, bucket)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_minhash_bands_song ON minhash_bands (song_id)')
+        
+        # Ingestion ledger: per-video outcome so interrupted playlists resume without re-downloading
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ingestion_ledger (
+                video_id TEXT PRIMARY KEY,
+                url TEXT,
+                status TEXT,
+                song_id INTEGER,
+                detail TEXT,
+                updated_at REAL
+            )
+        ''')
+        
+        conn.commit()
+        conn.close()
+
+    def minhash_ready(self):
+        """Returns: True if every song of the active version has a MinHash signature (backfill done)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM meta WHERE key = ?", (f"minhash_backfilled:{self._fp_table(cursor)}",))
+        ready = cursor.fetchone() is not None
+        conn.close()
+        return ready
+
+    def migrate_minhash(self):
+        """
+        Sign songs of the active version stored before MinHash signatures existed (once per table).
+        Run from ingestion entry points, never from queries, since it reads every fingerprint.
+        Returns: Number of songs signed
+        """
+        if self.minhash_ready():
+            return 0
+        return self.backfill_minhash()
+
+    def _fp_table(self, cursor):
+        """Name of the fingerprint table of the active version."""
+        cursor.execute("SELECT value FROM meta WHERE key = 'active_fingerprint_table'")
+        row = cursor.fetchone()
+        return row[0] if row else "fingerprints"
+
+    def _index_names(self, table):
+        if table == "fingerprints":
+            return "idx_hash", "idx_song_id"
+        return f"idx_hash_{table}", f"idx_song_id_{table}"
+
+    def get_active_fingerprint_version(self):
+        """
+        Returns: (version, config dict) of the active fingerprint version, or (None, None) if unversioned
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM meta WHERE key = 'active_fingerprint_version'")
+        row = cursor.fetchone()
+        result = (None, None)
+        if row:
+            cursor.execute("SELECT config FROM fingerprint_versions WHERE version = ?", (row[0],))
+            config = cursor.fetchone()
+            result = (row[0], json.loads(config[0]) if config else None)
+        conn.close()
+        return result
+
+    def ensure_fingerprint_version(self, version, config):
+        """
+        Checks that fingerprints generated with `config` are compatible with the stored ones.
+        An unversioned database adopts the caller's version for its existing fingerprints.
+        
+        Returns: True if `version` is the active version
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT value FROM meta WHERE key = 'active_fingerprint_version'")
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('INSERT OR REPLACE INTO fingerprint_versions (version, config, table_name, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                               (version, json.dumps(config, sort_keys=True), "fingerprints", "active", time.time()))
+                cursor.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [("active_fingerprint_version", version), ("active_fingerprint_table", "fingerprints")])
+                active = version
+            else:
+                active = row[0]
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return active == version
+
+    def create_fingerprint_version(self, version, config):
+        """
+        Creates (or returns the existing) table for a new fingerprint version, status "building".
+        Returns: Table name
+        """
+        table = f"fingerprints_{version}"
+        idx_hash, idx_song = self._index_names(table)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute("SELECT table_name FROM fingerprint_versions WHERE version = ?", (version,))
+        row = cursor.fetchone()
+        if row:
+            conn.close()
+            return row[0]
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                hash BLOB,
+                song_id INTEGER,
+                offset INTEGER,
+                FOREIGN KEY(song_id) REFERENCES songs(id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {idx_hash} ON {table} (hash)')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {idx_song} ON {table} (song_id)')
+        cursor.execute('INSERT INTO fingerprint_versions (version, config, table_name, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                       (version, json.dumps(config, sort_keys=True), table, "building", time.time()))
+        conn.commit()
+        conn.close()
+        return table
+
+    def activate_fingerprint_version(self, version):
+        """Atomically switch queries and ingestion to another (already built) version."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute("SELECT table_name FROM fingerprint_versions WHERE version = ?", (version,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.close()
+            raise ValueError(f"Unknown fingerprint version: {version}")
+        # One transaction: readers see either the old or the new version, never a mix
+        cursor.execute("UPDATE fingerprint_versions SET status = 'retired' WHERE status = 'active'")
+        cursor.execute("UPDATE fingerprint_versions SET status = 'active' WHERE version = ?", (version,))
+        cursor.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                           [("active_fingerprint_version", version), ("active_fingerprint_table", row[0])])
+        conn.commit()
+        conn.close()
+        self.migrate_minhash()
+
+    def drop_fingerprint_version(self, version):
+        """Deletes a retired version and its fingerprints."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
+        cursor.execute("SELECT table_name, status FROM fingerprint_versions WHERE version = ?", (version,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.close()
+            return False
+        if row[1] == "active":
+            conn.close()
+            raise ValueError("Cannot drop the active fingerprint version")
+        cursor.execute(f"DROP TABLE IF EXISTS {row[0]}")
+        cursor.execute("DELETE FROM minhash_signatures WHERE fp_table = ?", (row[0],))
+        cursor.execute("DELETE FROM minhash_bands WHERE fp_table = ?", (row[0],))
+        cursor.execute("DELETE FROM fingerprint_versions WHERE version = ?", (version,))
+        conn.commit()
+        conn.close()
+        return True
+
+    def list_fingerprint_versions(self):
+        """
+        Returns: List of (version, status, table_name, fingerprint_count, config dict)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT version, status, table_name, config FROM fingerprint_versions ORDER BY created_at")
+        versions = []
+        for version, status, table, config in cursor.fetchall():
+            count = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            versions.append((version, status, table, count, json.loads(config)))
+        conn.close()
+        return versions
+
+    def get_version_table(self, version):
+        """Returns the table name of a fingerprint version (None if unknown)."""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("SELECT table_name FROM fingerprint_versions WHERE version = ?", (version,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def get_songs_to_refingerprint(self, version):
+        """
+        Songs that have no fingerprints in `version` yet.
+        Returns: (list of (song_id, archive_path, sample_rate) for archived songs, list of song_ids without archive)
+        """
+        table = self.get_version_table(version)
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT s.id, a.path, a.sample_rate FROM songs s
+            LEFT JOIN song_archives a ON a.song_id = s.id
+            WHERE NOT EXISTS (SELECT 1 FROM {table} f WHERE f.song_id = s.id)
+            ORDER BY s.id
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+        archived = [(sid, path, rate) for sid, path, rate in rows if path]
+        missing = [sid for sid, path, _ in rows if not path]
+        return archived, missing
+
+    def record_archive(self, song_id, path, sample_rate):
+        """Remembers where the decoded audio of a song is archived."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT OR REPLACE INTO song_archives (song_id, path, sample_rate) VALUES (?, ?, ?)",
+                     (song_id, path, sample_rate))
+        conn.commit()
+        conn.close()
+
+    def record_ingestion(self, video_id, url, status, song_id=None, detail=None):
+        """
+        Records the outcome of ingesting one video (LEDGER_DONE, LEDGER_FAILED or LEDGER_DUPLICATE).
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('INSERT OR REPLACE INTO ingestion_ledger (video_id, url, status, song_id, detail, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                     (video_id, url, status, song_id, detail, time.time()))
+        conn.commit()
+        conn.close()
+
+    def get_ledger_statuses(self, video_ids):
+        """
+        Returns: dict of video_id -> status for the given ids that are in the ledger
+        """
+        video_ids = list(video_ids)
+        statuses = {}
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for i in range(0, len(video_ids), 900):
+            chunk = video_ids[i:i + 900]
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor.execute(f"SELECT video_id, status FROM ingestion_ledger WHERE video_id IN ({placeholders})", chunk)
+            statuses.update(cursor.fetchall())
+        conn.close()
+        return statuses
+
+    def get_indexed_urls(self):
+        """Returns the set of URLs of all indexed songs."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT url FROM songs WHERE url IS NOT NULL")
+        urls = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return urls
+
+    def get_existing_file_hashes(self, file_hashes):
+        """Returns the subset of file_hashes that already belong to a song."""
+        file_hashes = list(file_hashes)
+        existing = set()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for i in range(0, len(file_hashes), 900):
+            chunk = file_hashes[i:i + 900]
+            placeholders = ','.join(['?'] * len(chunk))
+            cursor.execute(f"SELECT file_hash FROM songs WHERE file_hash IN ({placeholders})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        conn.close()
+        return existing
+
+    def has_fingerprints(self):
+        """True if at least one fingerprint is stored."""
+        conn = sqlite3.connect(self.db_path)
+        table = self._fp_table(conn.cursor())
+        result = conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]
+        conn.close()
+        return bool(result)
+
+    def drop_hash_index(self):
+        """
+        Drops the hash lookup index. Bulk-loading an empty library is much faster without it;
+        call create_hash_index() afterwards (queries are unusably slow until then).
+        """
+        conn = sqlite3.connect(self.db_path)
+        idx_hash, _ = self._index_names(self._fp_table(conn.cursor()))
+        conn.execute(f"DROP INDEX IF EXISTS {idx_hash}")
+        conn.commit()
+        conn.close()
+
+    def create_hash_index(self):
+        """(Re)creates the hash lookup index."""
+        conn = sqlite3.connect(self.db_path)
+        table = self._fp_table(conn.cursor())
+        idx_hash, _ = self._index_names(table)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {idx_hash} ON {table} (hash)')
         conn.commit()
         conn.close()
 
@@ -75,26 +419,149 @@ class DatabaseHandler:
         finally:
             conn.close()
 
-    def store_fingerprints(self, song_id, fingerprints):
+    def store_fingerprints(self, song_id, fingerprints, version=None):
         """
         Bulk inserts fingerprints for a song.
-        fingerprints: List of (hash, offset) tuples
+        fingerprints: FingerprintBatch or list of (hash, offset) tuples
+        version: Fingerprint version to write to (default: the active one)
         """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        table = self.get_version_table(version) if version else self._fp_table(cursor)
         
-        # Prepare data: (hash, song_id, offset)
-        data = [(f[0], song_id, f[1]) for f in fingerprints]
-        
-        # Fast bulk insert
-        cursor.executemany('INSERT INTO fingerprints (hash, song_id, offset) VALUES (?, ?, ?)', data)
+        # Fast bulk insert of (hash, song_id, offset) rows
+        cursor.executemany(f'INSERT INTO {table} (hash, song_id, offset) VALUES (?, ?, ?)',
+                           self._fingerprint_rows(fingerprints, song_id))
+        self._store_minhash(cursor, table, song_id, fingerprints)
         conn.commit()
         conn.close()
 
+    @staticmethod
+    def _fingerprint_rows(fingerprints, song_id):
+        if isinstance(fingerprints, FingerprintBatch):
+            return fingerprints.rows(song_id)
+        return ((f[0], song_id, f[1]) for f in fingerprints)
+
+    def _store_minhash(self, cursor, table, song_id, fingerprints):
+        """Record a song's MinHash signature and band buckets (skipped for non-digest hashes)."""
+        sig = minhash.signature(fingerprints)
+        if sig is None:
+            return
+        cursor.execute("INSERT OR REPLACE INTO minhash_signatures (song_id, fp_table, signature) VALUES (?, ?, ?)",
+                       (song_id, table, minhash.to_blob(sig)))
+        cursor.execute("DELETE FROM minhash_bands WHERE song_id = ? AND fp_table = ?", (song_id, table))
+        cursor.executemany("INSERT INTO minhash_bands (fp_table, band, bucket, song_id) VALUES (?, ?, ?, ?)",
+                           [(table, band, bucket, song_id) for band, bucket in minhash.band_buckets(sig)])
+
+    def backfill_minhash(self):
+        """
+        Computes signatures for songs of the active version that have none (databases built
+        before signatures existed) and marks the version's table as backfilled.
+        Returns: Number of songs signed
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        cursor = conn.cursor()
+        table = self._fp_table(cursor)
+        missing = [row[0] for row in cursor.execute(
+            "SELECT id FROM songs WHERE id NOT IN (SELECT song_id FROM minhash_signatures WHERE fp_table = ?)",
+            (table,)).fetchall()]
+        signed = 0
+        for song_id in missing:
+            rows = cursor.execute(f"SELECT hash, offset FROM {table} WHERE song_id = ?", (song_id,)).fetchall()
+            if rows:
+                self._store_minhash(cursor, table, song_id, rows)
+                signed += 1
+        cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                       (f"minhash_backfilled:{table}", str(signed)))
+        conn.commit()
+        conn.close()
+        return signed
+
+    def find_duplicate_candidates(self, fingerprints, limit=5):
+        """
+        Songs likely to share most of their fingerprints with `fingerprints`, via LSH band lookup.
+        
+        Returns: List of (song_id, estimated_jaccard), most similar first (at most `limit`),
+                 or None if no signature can be computed for the fingerprints
+        """
+        sig = minhash.signature(fingerprints)
+        if sig is None:
+            return None
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        table = self._fp_table(cursor)
+        buckets = minhash.band_buckets(sig)
+        values = ", ".join("(?, ?)" for _ in buckets)
+        cursor.execute(f'''
+            WITH q(band, bucket) AS (VALUES {values})
+            SELECT DISTINCT s.song_id, s.signature
+            FROM q
+            JOIN minhash_bands b ON b.fp_table = ? AND b.band = q.band AND b.bucket = q.bucket
+            JOIN minhash_signatures s ON s.song_id = b.song_id AND s.fp_table = b.fp_table
+        ''', [v for pair in buckets for v in pair] + [table])
+        candidates = [(song_id, minhash.estimate_similarity(sig, minhash.from_blob(blob)))
+                      for song_id, blob in cursor.fetchall()]
+        conn.close()
+        candidates.sort(key=lambda c: (-c[1], c[0]))
+        return candidates[:limit]
+
+    def add_songs_batch(self, songs):
+        """
+        Adds several songs and their fingerprints in a single transaction.
+        songs: List of dicts with title, artist, file_hash, genre, url, thumbnail and fingerprints
+               (fingerprints: FingerprintBatch or list of (hash, offset) tuples), plus optional
+               archive (path, sample_rate)
+        
+        Returns: List of new song_ids (None where the song already existed by file_hash or URL)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        table = self._fp_table(cursor)
+        song_ids = []
+        
+        try:
+            for song in songs:
+                try:
+                    cursor.execute('INSERT INTO songs (title, artist, genre, url, thumbnail, file_hash) VALUES (?, ?, ?, ?, ?, ?)',
+                                   (song['title'], song['artist'], song.get('genre', 'Unknown'), song.get('url'),
+                                    song.get('thumbnail'), song['file_hash']))
+                except sqlite3.IntegrityError:
+                    song_ids.append(None)
+                    continue
+                song_id = cursor.lastrowid
+                cursor.executemany(f'INSERT INTO {table} (hash, song_id, offset) VALUES (?, ?, ?)',
+                                   self._fingerprint_rows(song['fingerprints'], song_id))
+                self._store_minhash(cursor, table, song_id, song['fingerprints'])
+                if song.get('archive'):
+                    cursor.execute("INSERT OR REPLACE INTO song_archives (song_id, path, sample_rate) VALUES (?, ?, ?)",
+                                   (song_id, song['archive'][0], song['archive'][1]))
+                song_ids.append(song_id)
+            conn.commit()
+        finally:
+            conn.close()
+        return song_ids
+
+    def _lookup_hashes(self, cursor, keys, chunk_size=900):
+        """
+        Yields (hash, song_id, db_offset) rows for the given hash keys.
+        SQLite limit for variables is usually 999, so keys are queried in chunks.
+        """
+        table = self._fp_table(cursor)
+        for i in range(0, len(keys), chunk_size):
+            chunk_keys = keys[i:i + chunk_size]
+            
+            # Construct the query dynamically for this chunk
+            placeholders = ',' .join(['?'] * len(chunk_keys))
+            query = f"SELECT hash, song_id, offset FROM {table} WHERE hash IN ({placeholders})"
+            
+            # Since hashes are binary, SQLite handles binary blobs correctly with '?' placeholders
+            cursor.execute(query, chunk_keys)
+            yield from cursor
+
     def get_matches(self, hashes):
         """
         Finds all matching fingerprints in the database.
-        hashes: List of (hash, offset) tuples from the recorded audio.
+        hashes: FingerprintBatch or list of (hash, offset) tuples from the recorded audio.
         
         Returns: Iterator of (song_id, db_offset, recorded_offset)
         We allow the caller to handle the alignment logic.
@@ -112,27 +579,119 @@ class DatabaseHandler:
             
         keys = list(hash_dict.keys())
         
-        # SQLite limit for variables is usually 999. 
-        # For large compilations, we might have thousands of hashes, so we MUST batch.
-        chunk_size = 900
+        for hash_val, song_id, db_offset in self._lookup_hashes(cursor, keys):
+            # For each match, we yield the song_id and the time difference
+            if hash_val in hash_dict:
+                for recorded_offset in hash_dict[hash_val]:
+                    yield (song_id, db_offset, recorded_offset)
+
+        conn.close()
+
+    def get_alignment_scores(self, hashes, top_bins=1, min_count=1):
+        """
+        Scores candidate songs inside SQLite instead of shipping every matching row to Python.
+        The (song_id, db_offset - recorded_offset) histogram is built with GROUP BY and only
+        the strongest bins of each song are returned. Counts are identical to running the
+        alignment over get_matches(hashes).
+        hashes: FingerprintBatch or list of (hash, offset) tuples from the recorded audio.
+        top_bins: Aligned bins returned per song (best first)
+        min_count: Songs whose best bin has fewer aligned hashes are dropped in the query
         
-        for i in range(0, len(keys), chunk_size):
-            chunk_keys = keys[i:i + chunk_size]
-            
-            # Construct the query dynamically for this chunk
-            placeholders = ',' .join(['?'] * len(chunk_keys))
-            query = f"SELECT hash, song_id, offset FROM fingerprints WHERE hash IN ({placeholders})"
-            
-            # Since hashes are binary, SQLite handles binary blobs correctly with '?' placeholders
-            cursor.execute(query, chunk_keys)
-            
-            for hash_val, song_id, db_offset in cursor:
-                # For each match, we yield the song_id and the time difference
-                if hash_val in hash_dict:
-                    for recorded_offset in hash_dict[hash_val]:
-                        yield (song_id, db_offset, recorded_offset)
+        Returns: (List of (song_id, time_diff, aligned_count), total matched rows)
+        """
+        if not hashes:
+            return [], 0
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        table = self._fp_table(cursor)
+        
+        # Query hashes go into a connection-local temp table (duplicates kept, like get_matches)
+        cursor.execute("CREATE TEMP TABLE query_hashes (hash BLOB, offset INTEGER)")
+        cursor.executemany("INSERT INTO query_hashes (hash, offset) VALUES (?, ?)", hashes)
+        
+        # CROSS JOIN keeps the small query table as the outer loop, probing the hash index
+        cursor.execute(f'''
+            WITH bins AS (
+                SELECT f.song_id AS song_id, f.offset - q.offset AS diff, COUNT(*) AS n
+                FROM query_hashes q CROSS JOIN {table} f
+                WHERE f.hash = q.hash
+                GROUP BY f.song_id, diff
+            ), ranked AS (
+                SELECT song_id, diff, n,
+                       ROW_NUMBER() OVER (PARTITION BY song_id ORDER BY n DESC, diff) AS bin_rank,
+                       MAX(n) OVER (PARTITION BY song_id) AS best,
+                       SUM(n) OVER () AS total
+                FROM bins
+            )
+            SELECT song_id, diff, n, total FROM ranked
+            WHERE bin_rank <= ? AND best >= ?
+            ORDER BY best DESC, song_id, bin_rank
+        ''', (top_bins, min_count))
+        rows = cursor.fetchall()
+        
+        # total is over all bins, so it is missing if every song was filtered out
+        if rows:
+            total = rows[0][3]
+        else:
+            cursor.execute(f"SELECT COUNT(*) FROM query_hashes q CROSS JOIN {table} f WHERE f.hash = q.hash")
+            total = cursor.fetchone()[0]
+        conn.close()
+        return [(song_id, diff, n) for song_id, diff, n, _ in rows], total
 
+    def iter_fingerprints(self, song_ids=None, batch_size=100000):
+        """
+        Streams fingerprints of the active version in batches (for exports).
+        song_ids: Optional iterable of song ids to restrict to (default: all songs)
+        
+        Yields: Lists of (hash, song_id, offset) tuples
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        table = self._fp_table(cursor)
+        if song_ids is None:
+            queries = [(f"SELECT hash, song_id, offset FROM {table}", [])]
+        else:
+            ids = sorted(set(song_ids))
+            queries = [(f"SELECT hash, song_id, offset FROM {table} WHERE song_id IN ({','.join(['?'] * len(chunk))})", chunk)
+                       for chunk in (ids[i:i + 900] for i in range(0, len(ids), 900))]
+        try:
+            for query, params in queries:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            conn.close()
+
+    def get_matches_many(self, hash_lists):
+        """
+        Finds matching fingerprints for several recordings with one shared set of queries.
+        Hashes that occur in more than one recording are looked up only once.
+        hash_lists: List of hash lists, each a list of (hash, offset) tuples.
+        
+        Returns: List (same order as hash_lists) of lists of (song_id, db_offset, recorded_offset)
+        """
+        # hash -> [(recording_index, recorded_offset), ...]
+        hash_dict = {}
+        for idx, hashes in enumerate(hash_lists):
+            for h, offset in hashes:
+                if h not in hash_dict:
+                    hash_dict[h] = []
+                hash_dict[h].append((idx, offset))
+        
+        results = [[] for _ in hash_lists]
+        if not hash_dict:
+            return results
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        for hash_val, song_id, db_offset in self._lookup_hashes(cursor, list(hash_dict.keys())):
+            for idx, recorded_offset in hash_dict[hash_val]:
+                results[idx].append((song_id, db_offset, recorded_offset))
         conn.close()
+        return results
 
     def delete_song(self, song_id):
         """
@@ -240,11 +799,47 @@ class DatabaseHandler:
         Check if new fingerprints are too similar to existing songs.
         This detects audio duplicates even if titles differ.
         
+        Candidates come from the MinHash/LSH index; only those are compared in full, counting
+        the new song's hashes that match at one consistent time offset. Until the index has
+        been backfilled (see migrate_minhash), every song is compared instead.
+        
         Returns: (is_duplicate, song_id, match_score) or (False, None, 0)
         """
         if not new_fingerprints:
             return False, None, 0
         
+        if not self.minhash_ready():
+            # Songs stored before signatures existed would be missed by the LSH lookup
+            return self._check_similarity_full(new_fingerprints, threshold, min_matches)
+        candidates = self.find_duplicate_candidates(new_fingerprints)
+        if candidates is None:
+            # Hashes that cannot be signed (not binary digests): compare against everything
+            return self._check_similarity_full(new_fingerprints, threshold, min_matches)
+        if not candidates:
+            return False, None, 0
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        table = self._fp_table(cursor)
+        best_song_id, match_count = None, 0
+        for song_id, _ in candidates:
+            offsets = {}
+            for hash_val, db_offset in cursor.execute(f"SELECT hash, offset FROM {table} WHERE song_id = ?", (song_id,)):
+                offsets.setdefault(hash_val, []).append(db_offset)
+            alignment = Counter(db_offset - offset for h, offset in new_fingerprints for db_offset in offsets.get(h, ()))
+            aligned = alignment.most_common(1)[0][1] if alignment else 0
+            if aligned > match_count:
+                best_song_id, match_count = song_id, aligned
+        conn.close()
+        
+        if best_song_id is None:
+            return False, None, 0
+        match_ratio = match_count / len(new_fingerprints)
+        is_duplicate = match_ratio >= threshold and match_count >= min_matches
+        return is_duplicate, best_song_id, match_ratio
+
+    def _check_similarity_full(self, new_fingerprints, threshold, min_matches):
+        """Unaligned comparison against every song (fallback without a usable MinHash index)."""
         # Get matches from database
         matches_dict = {}
         for song_id, db_offset, _ in self.get_matches(new_fingerprints):
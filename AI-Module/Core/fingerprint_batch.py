@@ -0,0 +1,113 @@
+import numpy as np
+
+HASH_BYTES = 20
+
+
+class FingerprintBatch:
+    """
+    Array-backed fingerprints: an (n, 20) uint8 matrix of SHA1 hashes, their anchor offsets
+    and optionally the song each row belongs to.
+
+    Replaces lists of (hash, offset) tuples between the fingerprinter, the database and the
+    recognizers: one object and three arrays instead of 3n Python objects, and it pickles as a
+    few buffers when fingerprints cross process boundaries. Iterating still yields
+    (hash_bytes, offset) tuples, so code written for lists keeps working.
+    """
+
+    __slots__ = ("hashes", "offsets", "song_ids")
+
+    def __init__(self, hashes, offsets, song_ids=None):
+        """
+        :param hashes: (n, 20) uint8 array (or anything reshapeable to it)
+        :param offsets: n anchor offsets (frames)
+        :param song_ids: Optional n song ids
+        """
+        self.hashes = np.asarray(hashes, dtype=np.uint8).reshape(-1, HASH_BYTES)
+        self.offsets = np.asarray(offsets, dtype=np.int64).reshape(-1)
+        self.song_ids = None if song_ids is None else np.asarray(song_ids, dtype=np.int64).reshape(-1)
+        if len(self.offsets) != len(self.hashes):
+            raise ValueError(f"{len(self.hashes)} hashes but {len(self.offsets)} offsets")
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, HASH_BYTES), dtype=np.uint8), np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def from_digests(cls, digests, offsets, song_ids=None):
+        """Build from concatenated 20-byte digests (e.g. b''.join of sha1 digests)."""
+        return cls(np.frombuffer(digests, dtype=np.uint8), offsets, song_ids)
+
+    @classmethod
+    def from_tuples(cls, fingerprints):
+        """Build from (hash, offset) tuples."""
+        fingerprints = list(fingerprints)
+        if not fingerprints:
+            return cls.empty()
+        hashes, offsets = zip(*fingerprints)
+        digests = b''.join(hashes)
+        if len(digests) != len(hashes) * HASH_BYTES:
+            raise ValueError(f"Fingerprint hashes must be {HASH_BYTES}-byte digests")
+        return cls.from_digests(digests, offsets)
+
+    @classmethod
+    def coerce(cls, fingerprints):
+        """Return fingerprints as a FingerprintBatch (no copy if it already is one)."""
+        if isinstance(fingerprints, cls):
+            return fingerprints
+        return cls.from_tuples(fingerprints)
+
+    @classmethod
+    def concatenate(cls, batches):
+        batches = [cls.coerce(b) for b in batches]
+        if not batches:
+            return cls.empty()
+        song_ids = None
+        if all(b.song_ids is not None for b in batches):
+            song_ids = np.concatenate([b.song_ids for b in batches])
+        return cls(np.concatenate([b.hashes for b in batches]), np.concatenate([b.offsets for b in batches]), song_ids)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        """Tuple view: (hash_bytes, offset), like the list format"""
+        return zip(self.hash_list(), self.offsets.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return bytes(self.hashes[index]), int(self.offsets[index])
+        song_ids = None if self.song_ids is None else self.song_ids[index]
+        return FingerprintBatch(self.hashes[index], self.offsets[index], song_ids)
+
+    def __eq__(self, other):
+        if isinstance(other, FingerprintBatch):
+            return np.array_equal(self.hashes, other.hashes) and np.array_equal(self.offsets, other.offsets)
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"FingerprintBatch({len(self)} fingerprints)"
+
+    def hash_list(self):
+        """Hashes as a list of bytes objects (SQLite parameters, dict keys)"""
+        data = self.hashes.tobytes()
+        return [data[i:i + HASH_BYTES] for i in range(0, len(data), HASH_BYTES)]
+
+    def rows(self, song_id=None):
+        """(hash, song_id, offset) tuples for inserting into a fingerprint table"""
+        if song_id is None:
+            if self.song_ids is None:
+                raise ValueError("No song id given and the batch has none")
+            return zip(self.hash_list(), self.song_ids.tolist(), self.offsets.tolist())
+        return ((h, song_id, offset) for h, offset in self)
+
+    def with_song_id(self, song_id):
+        return FingerprintBatch(self.hashes, self.offsets, np.full(len(self), song_id, dtype=np.int64))
+
+    def keys(self):
+        """First 8 hash bytes as big-endian unsigned integers (sortable lookup keys)"""
+        return np.ascontiguousarray(self.hashes[:, :8]).view('>u8').ravel().astype(np.uint64)
@@ -1,76 +1,200 @@
 import numpy as np
 from scipy.ndimage import maximum_filter
 import hashlib
+import json
+
+from fingerprint_batch import FingerprintBatch
+
+# Bump when the hash layout itself changes (not just a parameter)
+HASH_SCHEME = "sha1:f1|f2|dt"
+
+# "fan": each anchor pairs with the next fan_value - 1 peaks in time order
+# "zone": each anchor pairs with up to fan_value - 1 peaks inside its target zone
+PAIRING_MODES = ("fan", "zone")
+
+# Fingerprinter parameters recorded in a fingerprint version's config
+CONFIG_KEYS = ("fan_value", "amp_min", "neighborhood_size", "max_time_delta", "pairing", "zone_min_dt",
+               "zone_max_dt", "zone_df", "peak_budget", "slice_frames", "freq_bands")
+
+
+def fingerprint_config(processor, fingerprinter):
+    """Every parameter that affects the stored hashes."""
+    config = dict(processor.config())
+    config.update(fingerprinter.config())
+    return config
+
+
+def config_version(config):
+    """Short stable id for a fingerprint configuration."""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
 
 class Fingerprinter:
-    def __init__(self):
+    def __init__(self, fan_value=6, amp_min=20, neighborhood_size=15, max_time_delta=200,
+                 pairing="fan", zone_min_dt=1, zone_max_dt=32, zone_df=64,
+                 peak_budget=None, query_peak_budget=None, slice_frames=10, freq_bands=4):
+        if pairing not in PAIRING_MODES:
+            raise ValueError(f"Unknown pairing mode: {pairing}")
         # Configuration for peak finding
-        self.fan_value = 6           # Slightly increased from 5
-        self.amp_min = 20            # Reduced from 30 to capture more peaks
-        self.neighborhood_size = 15  # Reduced from 20 for more granularity
+        self.fan_value = fan_value                  # Slightly increased from 5
+        self.amp_min = amp_min                      # Reduced from 30 to capture more peaks
+        self.neighborhood_size = neighborhood_size  # Reduced from 20 for more granularity
+        self.max_time_delta = max_time_delta        # Max frames between anchor and target
+        # Target zone (pairing="zone"): frames after the anchor and frequency bins either side
+        self.pairing = pairing
+        self.zone_min_dt = zone_min_dt
+        self.zone_max_dt = zone_max_dt
+        self.zone_df = zone_df
+        # Density control: keep at most peak_budget peaks (the loudest) per slice_frames x band cell.
+        # query_peak_budget applies to queries only (None: same as peak_budget); it is not part of
+        # the fingerprint version since nothing stored depends on it.
+        self.peak_budget = peak_budget
+        self.query_peak_budget = query_peak_budget
+        self.slice_frames = slice_frames
+        self.freq_bands = freq_bands
 
-    def get_2d_peaks(self, spectrogram):
+    def config(self):
+        config = {
+            "fan_value": self.fan_value,
+            "amp_min": self.amp_min,
+            "neighborhood_size": self.neighborhood_size,
+            "max_time_delta": self.max_time_delta,
+            "hash_scheme": HASH_SCHEME
+        }
+        # Fan pairing keeps the original keys so existing fingerprint versions stay valid
+        if self.pairing != "fan":
+            config.update({
+                "pairing": self.pairing,
+                "zone_min_dt": self.zone_min_dt,
+                "zone_max_dt": self.zone_max_dt,
+                "zone_df": self.zone_df
+            })
+        if self.peak_budget:
+            config.update({
+                "peak_budget": self.peak_budget,
+                "slice_frames": self.slice_frames,
+                "freq_bands": self.freq_bands
+            })
+        return config
+
+    @classmethod
+    def from_config(cls, config, query_peak_budget=None):
+        """
+        Fingerprinter reproducing a stored fingerprint configuration (see config()); keys the
+        config lacks keep their defaults. Raises ValueError for an unknown hash scheme.
+        """
+        scheme = config.get("hash_scheme", HASH_SCHEME)
+        if scheme != HASH_SCHEME:
+            raise ValueError(f"Unsupported hash scheme: {scheme}")
+        params = {key: config[key] for key in CONFIG_KEYS if key in config}
+        return cls(query_peak_budget=query_peak_budget, **params)
+
+    def get_2d_peaks(self, spectrogram, query=False, frame_offset=0):
         """
         Finds local maxima (peaks) in the 2D spectrogram.
+        
+        query: Apply the query peak budget instead of the indexing one.
+        frame_offset: Absolute frame index of spectrogram column 0 (aligns budget slices when
+                      peaks are found chunk by chunk).
+        
         Returns a list of (frequency_index, time_index) tuples.
         """
         # 1. Use maximum filter to find local peaks
         # This checks if a pixel is the highest value in its neighborhood
         local_max = maximum_filter(spectrogram, size=self.neighborhood_size) == spectrogram
         
-        # 2. Boolean mask of peaks that additionally meet the minimum amplitude requirement
-        background = (spectrogram == 0)
-        eroded_background = background # simplified
-        detected_peaks = local_max ^ eroded_background
+        # 2. Keep the local maxima above the minimum amplitude (row-major: by frequency, then time)
+        rows, cols = np.nonzero(local_max & (spectrogram > self.amp_min))
         
-        # 3. Filter out low amplitude peaks
-        peaks = []
-        rows, cols = spectrogram.shape
-        for r in range(rows):
-            for c in range(cols):
-                if detected_peaks[r, c] and spectrogram[r, c] > self.amp_min:
-                    peaks.append((r, c))
-                    
-        return peaks
-
-    def generate_hashes(self, peaks):
+        # 3. Cap the density so loud/dense material does not produce more peaks per second
+        budget = (self.query_peak_budget or self.peak_budget) if query else self.peak_budget
+        if budget and len(rows):
+            rows, cols = self._limit_density(spectrogram, rows, cols, budget, frame_offset)
+        
+        return list(zip(rows.tolist(), cols.tolist()))
+
+    def _limit_density(self, spectrogram, rows, cols, budget, frame_offset):
+        """Keep the `budget` strongest peaks of every (time slice, frequency band) cell."""
+        bands = rows * self.freq_bands // spectrogram.shape[0]
+        cells = (cols + frame_offset) // self.slice_frames * self.freq_bands + bands
+        amplitude = spectrogram[rows, cols]
+        
+        order = np.lexsort((-amplitude, cells))
+        sorted_cells = cells[order]
+        first = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        rank = np.arange(len(order)) - np.repeat(first, np.diff(np.r_[first, len(order)]))
+        
+        keep = np.sort(order[rank < budget])
+        return rows[keep], cols[keep]
+
+    def generate_hashes(self, peaks, anchor_range=None):
         """
         Generates hashes from the list of peaks using the "combinatorial hashing" strategy.
         Each hash allows us to match a specific constellation of frequencies.
         
-        Returns: List of (hash_string, time_offset_from_beginning)
+        anchor_range: Optional (start, end) indices (into the time-sorted peaks) of the anchors to hash.
+                      Targets are still taken from the whole list. Used for incremental hashing.
+        
+        Returns: FingerprintBatch of (hash, time_offset_from_beginning); iterates as tuples
         """
         peaks.sort(key=lambda x: x[1]) # Sort by time
         
-        hashes = []
-        for i in range(len(peaks)):
-            for j in range(1, self.fan_value):
-                if (i + j) < len(peaks):
-                    
-                    # Anchor point
-                    freq1 = peaks[i][0]
-                    t1 = peaks[i][1]
-                    
-                    # Target point
-                    freq2 = peaks[i + j][0]
-                    t2 = peaks[i + j][1]
-                    
-                    t_delta = t2 - t1
-                    
-                    # Constraint: target must be within reasonable time distance
-                    # (e.g., between 0 and 200 time steps)
-                    if 0 < t_delta < 200:
-                        # Create a hash from the frequencies and time delta
-                        # Format: "f1|f2|time_delta"
-                        h = hashlib.sha1(f"{freq1}|{freq2}|{t_delta}".encode('utf-8'))
-                        # Use binary digest (20 bytes) instead of hex string (40 chars) to save 50% space
-                        hash_digest = h.digest()
-                        
-                        # We return the hash and the ABSOLUTE time of the anchor (t1)
-                        # This allows us to align the song later.
-                        hashes.append((hash_digest, t1))
-                        
-        return hashes
+        start, end = anchor_range if anchor_range else (0, len(peaks))
+        if end <= start:
+            return FingerprintBatch.empty()
+        points = np.array(peaks, dtype=np.int64).reshape(-1, 2)
+        freqs, times = points[:, 0], points[:, 1]
+        
+        if self.pairing == "zone":
+            anchor_idx, target_idx = self._zone_pairs(freqs, times, start, end)
+        else:
+            anchor_idx, target_idx = self._fan_pairs(times, start, end)
+        return self._hash_pairs(freqs, times, anchor_idx, target_idx)
+
+    def _fan_pairs(self, times, start, end):
+        """
+        Fan-out pairing: each anchor with the next fan_value - 1 peaks, kept if the target is
+        0 < t_delta < max_time_delta frames later. Pairs come out anchor by anchor.
+        """
+        anchors = np.arange(start, end)
+        targets = anchors[:, None] + np.arange(1, self.fan_value)[None, :]
+        valid = targets < len(times)
+        t_delta = times[np.minimum(targets, len(times) - 1)] - times[anchors][:, None]
+        valid &= (t_delta > 0) & (t_delta < self.max_time_delta)
+        return np.broadcast_to(anchors[:, None], targets.shape)[valid], targets[valid]
+
+    def _zone_pairs(self, freqs, times, start, end):
+        """
+        Target-zone pairing: each anchor in peaks[start:end] is paired with the first fan_value - 1 peaks
+        (in time order) that lie zone_min_dt..zone_max_dt frames later and within zone_df bins.
+        Candidates are found with binary searches on the sorted times, no per-pair Python loop.
+        """
+        anchors = np.arange(start, end)
+        
+        # Candidate targets of each anchor are a contiguous slice of the time-sorted peaks
+        lo = np.searchsorted(times, times[anchors] + self.zone_min_dt, side='left')
+        hi = np.searchsorted(times, times[anchors] + self.zone_max_dt, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        anchor_idx = np.repeat(anchors, counts)
+        target_idx = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+        
+        in_band = np.abs(freqs[target_idx] - freqs[anchor_idx]) <= self.zone_df
+        anchor_idx, target_idx = anchor_idx[in_band], target_idx[in_band]
+        
+        # Keep the first fan_value - 1 in-band targets per anchor
+        first = np.flatnonzero(np.r_[True, anchor_idx[1:] != anchor_idx[:-1]])
+        rank = np.arange(len(anchor_idx)) - np.repeat(first, np.diff(np.r_[first, len(anchor_idx)]))
+        keep = rank < self.fan_value - 1
+        return anchor_idx[keep], target_idx[keep]
+
+    def _hash_pairs(self, freqs, times, anchor_idx, target_idx):
+        """SHA1 of "f1|f2|time_delta" per pair, stamped with the ABSOLUTE time of the anchor (t1) for alignment."""
+        t1 = times[anchor_idx]
+        # Binary digests (20 bytes) instead of hex strings (40 chars) to save 50% space
+        digests = b''.join(hashlib.sha1(f"{a}|{b}|{d}".encode('utf-8')).digest() for a, b, d in
+                           zip(freqs[anchor_idx].tolist(), freqs[target_idx].tolist(), (times[target_idx] - t1).tolist()))
+        return FingerprintBatch.from_digests(digests, t1)
 
 if __name__ == "__main__":
     # Integration Test
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Service Metrics
+Counters and histograms for recognition and ingestion, exported in Prometheus text format.
+
+Recording is an in-memory dict update, so it is cheap enough for the hot path. Most entry
+points are short-lived processes (one recognizer run per request), so each process merges
+its deltas into a shared SQLite store at exit (or periodically, for long-running workers).
+The exporter renders that store: either served over HTTP for Prometheus to scrape, or
+written to a .prom file for node_exporter's textfile collector.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import argparse
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "viltrumite_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (0, 10, 100, 1000, 10000, 100000, 1000000)
+
+# name -> (type, help, histogram buckets)
+DEFINITIONS = {
+    "recognitions_total": ("counter", "Local recognitions by outcome (match, no_match, error)", None),
+    "recognition_seconds": ("histogram", "Local recognition time including fingerprinting", LATENCY_BUCKETS),
+    "db_query_seconds": ("histogram", "Fingerprint lookup time per query", LATENCY_BUCKETS),
+    "rows_matched": ("histogram", "Fingerprint rows returned per query", ROW_BUCKETS),
+    "fallback_outcomes_total": ("counter", "Fallback workflow outcomes (local, shazam_known, shazam_new, local_candidates, none)", None),
+    "shazam_lookups_total": ("counter", "Shazam lookups by source (live, cache, skipped, circuit_open, budget_exhausted) and result", None),
+    "shazam_seconds": ("histogram", "Live Shazam request time", LATENCY_BUCKETS),
+    "circuit_transitions_total": ("counter", "Circuit breaker state changes by breaker and new state", None),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit, miss)", None),
+    "ingest_items_total": ("counter", "Ingested items by source and final status", None),
+    "ingest_fingerprint_seconds": ("histogram", "Decode and fingerprint time per ingested song", LATENCY_BUCKETS),
+    "index_jobs_total": ("counter", "Auto-index queue jobs processed by result", None),
+    "index_queue_jobs": ("gauge", "Auto-index queue jobs by status (read at scrape time)", None),
+}
+
+
+def default_metrics_path(db_path):
+    """The metrics store lives next to the songs database unless configured otherwise."""
+    return os.environ.get('METRICS_DB') or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'metrics.db')
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _encode_labels(key):
+    return json.dumps(key) if key else ""
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, label_key) -> value
+        self._histograms = {}  # (name, label_key) -> [bucket counts..., +Inf count, sum]
+        self.store_path = None
+        self.enabled = os.environ.get('VILTRUMITE_METRICS', 'on').lower() not in ('0', 'off', 'false')
+        self._flusher = None
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        buckets = DEFINITIONS[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            data = self._histograms.get(key)
+            if data is None:
+                data = self._histograms[key] = [0] * (len(buckets) + 2)
+            data[bisect_left(buckets, value)] += 1
+            data[-1] += value
+
+    def snapshot(self):
+        """Take and reset the pending deltas. Returns (counters, histograms)"""
+        with self._lock:
+            counters, histograms = self._counters, self._histograms
+            self._counters, self._histograms = {}, {}
+        return counters, histograms
+
+    def configure(self, store_path, flush_interval=None):
+        """
+        Persist metrics to store_path at process exit (and every flush_interval seconds if given).
+        Call once from an entry point; library code only records.
+        """
+        if not self.enabled:
+            return
+        first = self.store_path is None
+        self.store_path = store_path
+        if first:
+            atexit.register(self.flush)
+        if flush_interval and self._flusher is None:
+            def loop():
+                while True:
+                    time.sleep(flush_interval)
+                    self.flush()
+            self._flusher = threading.Thread(target=loop, daemon=True)
+            self._flusher.start()
+
+    def flush(self):
+        """Merge pending deltas into the store. Metrics are best-effort and never raise."""
+        if not self.store_path:
+            return
+        counters, histograms = self.snapshot()
+        if not counters and not histograms:
+            return
+        rows = [(name, _encode_labels(labels), "", value) for (name, labels), value in counters.items()]
+        for (name, key), data in histograms.items():
+            labels = _encode_labels(key)
+            buckets = DEFINITIONS[name][2]
+            for le, count in zip([str(b) for b in buckets] + ["+Inf"], data[:-1]):
+                if count:
+                    rows.append((name, labels, le, count))
+            rows.append((name, labels, "sum", data[-1]))
+        try:
+            store = MetricsStore(self.store_path)
+            store.add(rows)
+        except Exception as e:
+            print(f"[!] Could not write metrics: {e}", file=sys.stderr)
+
+
+class MetricsStore:
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        # le is "" for counters; bucket bounds (non-cumulative counts) and "sum" for histograms
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS samples (
+                name TEXT,
+                labels TEXT,
+                le TEXT,
+                value REAL,
+                PRIMARY KEY (name, labels, le)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def add(self, rows):
+        conn = self._connect()
+        conn.executemany('''
+            INSERT INTO samples (name, labels, le, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (name, labels, le) DO UPDATE SET value = value + excluded.value
+        ''', rows)
+        conn.commit()
+        conn.close()
+
+    def samples(self):
+        conn = self._connect()
+        rows = conn.execute("SELECT name, labels, le, value FROM samples ORDER BY name, labels").fetchall()
+        conn.close()
+        return rows
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(store_path, queue_path=None):
+    """Prometheus text exposition of the store (plus live queue depth if queue_path is given)."""
+    grouped = {}
+    if os.path.exists(store_path):
+        for name, labels, le, value in MetricsStore(store_path).samples():
+            grouped.setdefault(name, {}).setdefault(labels, {})[le] = value
+
+    lines = []
+    for name, series in sorted(grouped.items()):
+        kind, help_text, buckets = DEFINITIONS.get(name, ("untyped", "", None))
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        for label_key, values in series.items():
+            labels = json.loads(label_key) if label_key else []
+            if kind != "histogram":
+                lines.append(f"{full}{_format_labels(labels)} {_number(values.get('', 0))}")
+                continue
+            cumulative = 0
+            for le in [str(b) for b in buckets] + ["+Inf"]:
+                cumulative += values.get(le, 0)
+                lines.append(f"{full}_bucket{_format_labels(labels, {'le': le})} {_number(cumulative)}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {_number(values.get('sum', 0))}")
+            lines.append(f"{full}_count{_format_labels(labels)} {_number(cumulative)}")
+
+    if queue_path and os.path.exists(queue_path):
+        conn = sqlite3.connect(queue_path, timeout=10)
+        try:
+            counts = conn.execute("SELECT status, COUNT(*) FROM index_jobs GROUP BY status").fetchall()
+        except sqlite3.Error:
+            counts = []
+        conn.close()
+        full = PREFIX + "index_queue_jobs"
+        lines.append(f"# HELP {full} {DEFINITIONS['index_queue_jobs'][1]}")
+        lines.append(f"# TYPE {full} gauge")
+        for status, count in counts:
+            lines.append(f"{full}{_format_labels([('status', status)])} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, store_path, queue_path=None):
+    """Atomically write the exposition to a file (node_exporter textfile collector)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render(store_path, queue_path))
+    os.replace(tmp, path)
+
+
+def serve(store_path, host="127.0.0.1", port=9464, queue_path=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = render(store_path, queue_path).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"[*] Serving metrics on http://{host}:{port}/metrics", file=sys.stderr)
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+# Process-wide registry used by all instrumented modules
+REGISTRY = MetricsRegistry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+configure = REGISTRY.configure
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export recognition/ingestion metrics in Prometheus format")
+    default_db = os.path.join(os.path.dirname(__file__), '..', '..', 'Databases', 'songs.db')
+    parser.add_argument('--db', default=default_db, help='Songs database (locates metrics.db and the index queue)')
+    parser.add_argument('--metrics-db', help='Metrics store path (default: metrics.db next to --db)')
+    parser.add_argument('--queue-db', help='Auto-index queue to report depth for (default: next to --db)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = sub.add_parser('serve', help='Serve /metrics over HTTP')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=9464, help='Port (default: 9464)')
+
+    dump_parser = sub.add_parser('dump', help='Write the metrics to a file (or stdout)')
+    dump_parser.add_argument('--out', help='Output .prom file (default: stdout)')
+    dump_parser.add_argument('--interval', type=float, help='Rewrite the file every N seconds')
+
+    args = parser.parse_args()
+    store_path = args.metrics_db or default_metrics_path(args.db)
+    queue_path = args.queue_db or os.environ.get('INDEX_QUEUE_DB') or \
+        os.path.join(os.path.dirname(os.path.abspath(args.db)), 'index_queue.db')
+
+    if args.command == 'serve':
+        serve(store_path, args.host, args.port, queue_path)
+    elif not args.out:
+        sys.stdout.write(render(store_path, queue_path))
+    else:
+        while True:
+            write_textfile(args.out, store_path, queue_path)
+            if not args.interval:
+                break
+            time.sleep(args.interval)
@@ -0,0 +1,62 @@
+import hashlib
+
+import numpy as np
+
+from fingerprint_batch import FingerprintBatch
+
+# 64 min-hashes in 32 bands of 2 rows: songs sharing ~40% of their hashes (Jaccard) land in a
+# common bucket with >99% probability, unrelated songs (Jaccard ~0.01) with ~0.3%.
+NUM_HASHES = 64
+BANDS = 32
+ROWS = NUM_HASHES // BANDS
+
+# Fixed seed: signatures are stored, so the permutations must never change
+_rng = np.random.default_rng(0x6D696E68)
+_A = _rng.integers(1, 2 ** 63, NUM_HASHES, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_HASHES, dtype=np.uint64)
+
+
+def signature(fingerprints, chunk_size=8192):
+    """
+    MinHash signature of a song's set of fingerprint hashes.
+
+    Each permutation is a multiply-shift hash of the first 8 hash bytes (SHA1 output is already
+    uniform, so no further mixing is needed).
+
+    Returns: uint32 array of NUM_HASHES values, or None if the fingerprints are not binary digests
+    """
+    try:
+        batch = FingerprintBatch.coerce(fingerprints)
+    except (TypeError, ValueError):
+        return None
+    keys = np.unique(batch.keys())
+    if not len(keys):
+        return None
+
+    result = np.full(NUM_HASHES, np.iinfo(np.uint32).max, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            hashed = (_A[:, None] * chunk[None, :] + _B[:, None]) >> np.uint64(32)
+            np.minimum(result, hashed.min(axis=1), out=result)
+    return result.astype(np.uint32)
+
+
+def band_buckets(sig):
+    """LSH buckets of a signature. Returns: List of (band, bucket) with bucket a signed 64-bit int"""
+    rows = np.asarray(sig, dtype=np.uint32).reshape(BANDS, ROWS)
+    return [(band, int.from_bytes(hashlib.sha1(rows[band].tobytes()).digest()[:8], 'big', signed=True))
+            for band in range(BANDS)]
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of the two hash sets"""
+    return float(np.mean(np.asarray(sig_a) == np.asarray(sig_b)))
+
+
+def to_blob(sig):
+    return np.asarray(sig, dtype='<u4').tobytes()
+
+
+def from_blob(blob):
+    return np.frombuffer(blob, dtype='<u4')
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Library Snapshots
+Exports songs.db into a compact, read-optimized snapshot and serves queries from it.
+
+A snapshot is a directory of columnar .npy files (fingerprints sorted by hash, so lookups
+are binary searches over a memory-mapped array) plus songs.json and a manifest.json with
+per-file SHA256 checksums and the fingerprint version. Delta snapshots only hold the songs
+added since their base snapshot and the ids of deleted songs; a chain of deltas is loaded
+by pointing at the newest one.
+
+Loading maps the files without reading them, so a new node answers queries within seconds;
+no SQLite index has to be rebuilt or warmed.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+from database import DatabaseHandler
+from fingerprint_batch import FingerprintBatch, HASH_BYTES
+
+FORMAT_VERSION = 1
+COLUMNS = ("keys", "hashes", "song_ids", "offsets")
+MANIFEST = "manifest.json"
+SONGS = "songs.json"
+
+
+def _sha256(path, block_size=1 << 22):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    return manifest
+
+
+def snapshot_chain(directory):
+    """
+    Follow base links from a snapshot back to its full snapshot.
+    Returns: List of (directory, manifest), oldest first
+    """
+    chain = []
+    while directory:
+        manifest = read_manifest(directory)
+        chain.append((directory, manifest))
+        base = manifest.get("base")
+        directory = os.path.normpath(os.path.join(directory, base["path"])) if base else None
+    chain.reverse()
+
+    version = chain[0][1]["fingerprint_version"]
+    for (_, manifest), (_, previous) in zip(chain[1:], chain):
+        if manifest["base"]["id"] != previous["id"]:
+            raise ValueError(f"Snapshot {manifest['id']} was built on {manifest['base']['id']}, found {previous['id']}")
+        if manifest["fingerprint_version"] != version:
+            raise ValueError("Snapshot chain mixes fingerprint versions")
+    return chain
+
+
+def export_snapshot(db, out_dir, base=None):
+    """
+    Write a snapshot of the database's active fingerprint version.
+
+    Args:
+        db: DatabaseHandler to export
+        out_dir: New snapshot directory
+        base: Optional previous snapshot; only songs added (and ids deleted) since then are written
+
+    Returns: Manifest dict
+    """
+    version, config = db.get_active_fingerprint_version()
+    songs = db.get_all_songs()
+    current_ids = {row[0] for row in songs}
+
+    include_ids = None
+    deleted = []
+    base_info = None
+    if base:
+        chain = snapshot_chain(base)
+        if chain[-1][1]["fingerprint_version"] != version:
+            raise ValueError("Fingerprint version changed since the base snapshot; export a full snapshot")
+        known = set()
+        for directory, manifest in chain:
+            with open(os.path.join(directory, SONGS)) as f:
+                known.update(song["id"] for song in json.load(f))
+            known.difference_update(manifest["deleted"])
+        include_ids = current_ids - known
+        deleted = sorted(known - current_ids)
+        base_info = {"id": chain[-1][1]["id"],
+                     "path": os.path.relpath(os.path.abspath(base), os.path.abspath(out_dir))}
+        songs = [row for row in songs if row[0] in include_ids]
+
+    parts = []
+    if include_ids is None or include_ids:
+        for rows in db.iter_fingerprints(song_ids=include_ids):
+            hashes, song_ids, offsets = zip(*rows)
+            digests = b''.join(hashes)
+            if len(digests) != len(hashes) * HASH_BYTES:
+                raise ValueError(f"Snapshots require {HASH_BYTES}-byte binary hashes")
+            parts.append(FingerprintBatch.from_digests(digests, offsets, song_ids))
+    batch = FingerprintBatch.concatenate(parts) if parts else FingerprintBatch.empty().with_song_id(0)
+    keys = batch.keys()
+
+    # Sorted by hash prefix (deterministic order, so identical data gives identical files)
+    order = np.lexsort((batch.offsets, batch.song_ids, keys))
+    columns = {"keys": keys[order], "hashes": batch.hashes[order],
+               "song_ids": batch.song_ids[order].astype(np.int32), "offsets": batch.offsets[order].astype(np.int32)}
+
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for name, array in columns.items():
+        path = os.path.join(out_dir, f"{name}.npy")
+        np.save(path, array)
+        files[f"{name}.npy"] = {"sha256": _sha256(path), "bytes": os.path.getsize(path)}
+    with open(os.path.join(out_dir, SONGS), "w") as f:
+        json.dump([{"id": sid, "title": title, "artist": artist, "genre": genre, "url": url, "thumbnail": thumb}
+                   for sid, title, artist, genre, url, thumb in sorted(songs)], f)
+    files[SONGS] = {"sha256": _sha256(os.path.join(out_dir, SONGS)), "bytes": os.path.getsize(os.path.join(out_dir, SONGS))}
+
+    checksum = hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()
+    manifest = {
+        "format": FORMAT_VERSION,
+        "id": checksum[:16],
+        "checksum": checksum,
+        "created_at": time.time(),
+        "base": base_info,
+        "fingerprint_version": version,
+        "fingerprint_config": config,
+        "songs": len(songs),
+        "fingerprints": int(len(keys)),
+        "deleted": deleted,
+        "files": files
+    }
+
+    # The manifest is written last: a directory without one is an incomplete export
+    tmp = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+    return manifest
+
+
+def verify_snapshot(directory, manifest=None):
+    """Raises ValueError if a file does not match the manifest checksums."""
+    manifest = manifest or read_manifest(directory)
+    for name, info in manifest["files"].items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path) or _sha256(path) != info["sha256"]:
+            raise ValueError(f"Snapshot {manifest['id']}: checksum mismatch for {name}")
+    expected = hashlib.sha256(json.dumps(manifest["files"], sort_keys=True).encode('utf-8')).hexdigest()
+    if expected != manifest["checksum"]:
+        raise ValueError(f"Snapshot {manifest['id']}: manifest checksum mismatch")
+
+
+class SnapshotSegment:
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        # Memory-mapped: nothing is read until a query touches it
+        for name in COLUMNS:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'))
+        with open(os.path.join(directory, SONGS)) as f:
+            self.songs = json.load(f)
+
+    def warm(self):
+        """Read the column files once so the first queries do not wait on disk."""
+        for name in COLUMNS:
+            with open(os.path.join(self.directory, f"{name}.npy"), 'rb') as f:
+                while f.read(1 << 24):
+                    pass
+
+
+class SnapshotDatabase:
+    """
+    Read-only stand-in for DatabaseHandler, backed by a snapshot (chain).
+    Supports what recognition needs: get_matches, get_matches_many, get_alignment_scores,
+    get_song_by_id, get_all_songs and get_active_fingerprint_version.
+    """
+
+    def __init__(self, snapshot_dir, verify=True, warm=False):
+        """
+        Args:
+            snapshot_dir: Snapshot directory (the newest delta of a chain)
+            verify: Check every file against the manifest checksums
+            warm: Pre-read the column files into the page cache
+        """
+        self.db_path = snapshot_dir
+        chain = snapshot_chain(snapshot_dir)
+        if verify:
+            for directory, manifest in chain:
+                verify_snapshot(directory, manifest)
+        self.segments = [SnapshotSegment(directory, manifest) for directory, manifest in chain]
+        self.manifest = chain[-1][1]
+
+        # Later snapshots add songs and tombstone deleted ones (ids are never reused)
+        self.songs = {}
+        dead = set()
+        for segment in self.segments:
+            for song in segment.songs:
+                self.songs[song["id"]] = song
+            for song_id in segment.manifest["deleted"]:
+                self.songs.pop(song_id, None)
+                dead.add(song_id)
+        self._dead = np.array(sorted(dead), dtype=np.int32)
+
+        if warm:
+            for segment in self.segments:
+                segment.warm()
+
+    def get_active_fingerprint_version(self):
+        return self.manifest["fingerprint_version"], self.manifest["fingerprint_config"]
+
+    def get_song_by_id(self, song_id):
+        song = self.songs.get(song_id)
+        if song is None:
+            return None
+        return song["title"], song["artist"], song["genre"], song["thumbnail"], song["url"]
+
+    def get_all_songs(self, genre=None, search=None):
+        rows = []
+        for song in self.songs.values():
+            if genre and genre.lower() != 'all' and (song["genre"] or '').lower() != genre.lower():
+                continue
+            if search and not any(search.lower() in (song[k] or '').lower() for k in ("title", "artist", "genre")):
+                continue
+            rows.append((song["id"], song["title"], song["artist"], song["genre"], song["url"], song["thumbnail"]))
+        return rows
+
+    def _lookup(self, batch):
+        """
+        Returns: (query_index, song_id, db_offset) arrays of every fingerprint matching a query hash
+        """
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(batch):
+            return empty, empty, empty
+        query = batch.hashes
+        query_keys = batch.keys()
+
+        parts = []
+        for segment in self.segments:
+            lo = np.searchsorted(segment.keys, query_keys, side='left')
+            hi = np.searchsorted(segment.keys, query_keys, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            qidx = np.repeat(np.arange(len(query_keys)), counts)
+            pos = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+            # Only the 8-byte prefix was searched; confirm the full hash
+            same = np.all(segment.hashes[pos] == query[qidx], axis=1)
+            qidx, pos = qidx[same], pos[same]
+            song_ids = np.asarray(segment.song_ids[pos], dtype=np.int64)
+            offsets = np.asarray(segment.offsets[pos], dtype=np.int64)
+            if len(self._dead):
+                live = ~np.isin(song_ids, self._dead)
+                qidx, song_ids, offsets = qidx[live], song_ids[live], offsets[live]
+            parts.append((qidx, song_ids, offsets))
+
+        if not parts:
+            return empty, empty, empty
+        return tuple(np.concatenate(cols) for cols in zip(*parts))
+
+    def get_matches(self, hashes):
+        """Same contract as DatabaseHandler.get_matches: yields (song_id, db_offset, recorded_offset)"""
+        batch = FingerprintBatch.coerce(hashes)
+        qidx, song_ids, offsets = self._lookup(batch)
+        return iter(zip(song_ids.tolist(), offsets.tolist(), batch.offsets[qidx].tolist()))
+
+    def get_matches_many(self, hash_lists):
+        return [list(self.get_matches(hashes)) for hashes in hash_lists]
+
+    def get_alignment_scores(self, hashes, top_bins=1, min_count=1):
+        """Same contract as DatabaseHandler.get_alignment_scores, computed with numpy"""
+        batch = FingerprintBatch.coerce(hashes)
+        qidx, song_ids, offsets = self._lookup(batch)
+        if not len(qidx):
+            return [], 0
+        diffs = offsets - batch.offsets[qidx]
+
+        bins, counts = np.unique(np.stack([song_ids, diffs]), axis=1, return_counts=True)
+        bin_songs, bin_diffs = bins
+        # Per song: strongest bins first, smaller offset on ties (same order as the SQL mode)
+        order = np.lexsort((bin_diffs, -counts, bin_songs))
+        bin_songs, bin_diffs, counts = bin_songs[order], bin_diffs[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, bin_songs[1:] != bin_songs[:-1]])
+        rank = np.arange(len(bin_songs)) - np.repeat(starts, np.diff(np.r_[starts, len(bin_songs)]))
+        best = np.repeat(counts[starts], np.diff(np.r_[starts, len(bin_songs)]))
+
+        keep = (rank < top_bins) & (best >= min_count)
+        rows = sorted(zip((-best[keep]).tolist(), bin_songs[keep].tolist(), rank[keep].tolist(),
+                          bin_diffs[keep].tolist(), counts[keep].tolist()))
+        return [(song_id, diff, n) for _, song_id, _, diff, n in rows], len(qidx)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export, inspect and verify library snapshots")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export_p = sub.add_parser('export', help='Write a full or delta snapshot')
+    export_p.add_argument('out', help='New snapshot directory')
+    default_db = os.path.join(os.path.dirname(__file__), '..', '..', 'Databases', 'songs.db')
+    export_p.add_argument('--db', default=default_db, help='Path to database')
+    export_p.add_argument('--base', help='Previous snapshot; write only the changes since it (delta)')
+
+    info_p = sub.add_parser('info', help='Show a snapshot chain')
+    info_p.add_argument('snapshot')
+
+    verify_p = sub.add_parser('verify', help='Check every file of a snapshot chain')
+    verify_p.add_argument('snapshot')
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        start = time.perf_counter()
+        manifest = export_snapshot(DatabaseHandler(args.db), args.out, base=args.base)
+        kind = f"delta on {manifest['base']['id']}" if manifest["base"] else "full"
+        print(f"[*] Snapshot {manifest['id']} ({kind}): {manifest['songs']} songs, {manifest['fingerprints']} fingerprints, "
+              f"{len(manifest['deleted'])} deleted, {time.perf_counter() - start:.1f}s")
+    elif args.command == 'info':
+        for directory, manifest in snapshot_chain(args.snapshot):
+            size = sum(f["bytes"] for f in manifest["files"].values())
+            print(f"{manifest['id']}  {'delta' if manifest['base'] else 'full ':<5} {manifest['songs']:>7} songs "
+                  f"{manifest['fingerprints']:>10} fingerprints {len(manifest['deleted']):>5} deleted "
+                  f"{size / 1e6:>8.1f} MB  version {manifest['fingerprint_version']}  {directory}")
+    elif args.command == 'verify':
+        try:
+            for directory, manifest in snapshot_chain(args.snapshot):
+                verify_snapshot(directory, manifest)
+                print(f"  ✓ {manifest['id']} {directory}")
+        except ValueError as e:
+            print(f"[!] {e}")
+            sys.exit(1)
@@ -0,0 +1,143 @@
+from bisect import bisect_left
+
+import numpy as np
+from scipy.signal import get_window
+
+from fingerprinter import Fingerprinter
+from fingerprint_batch import FingerprintBatch
+
+
+class StreamingFingerprinter:
+    """
+    Incremental version of the AudioProcessor -> Fingerprinter pipeline.
+    Audio is fed in chunks; only the STFT columns, peaks and hashes that became
+    final since the previous chunk are computed. The concatenated output equals
+    what the offline pipeline produces for the whole recording.
+    """
+
+    def __init__(self, window_size=4096, step_size=2048, fingerprinter=None, query=False):
+        """
+        :param window_size: STFT window size (must match AudioProcessor.window_size)
+        :param step_size: STFT step size (must match AudioProcessor.step_size)
+        :param fingerprinter: Fingerprinter whose peak/hash settings are used
+        :param query: Fingerprinting a query (applies the query peak budget)
+        """
+        self.window_size = window_size
+        self.step_size = step_size
+        self.fingerprinter = fingerprinter or Fingerprinter()
+        self.query = query
+
+        # Same periodic Hann window librosa.stft uses
+        self._window = get_window('hann', window_size, fftbins=True).reshape(-1, 1)
+
+        # librosa.stft(center=True) zero-pads half a window on both sides
+        self._samples = np.zeros(window_size // 2, dtype=np.float32)
+        self._columns = None     # Spectrogram columns still needed for peak finding
+        self._col_base = 0       # Absolute index of self._columns[:, 0]
+        self._peak_upto = 0      # Columns before this index have final peaks
+        self._peaks = []         # Final peaks (time-sorted) still needed as hash targets
+        self._peak_base = 0      # Absolute index of self._peaks[0]
+        self._hashed_upto = 0    # Peaks before this absolute index have been hashed
+        self.finished = False
+
+    @classmethod
+    def from_processor(cls, processor, fingerprinter=None, query=False):
+        return cls(processor.window_size, processor.step_size, fingerprinter=fingerprinter, query=query)
+
+    @property
+    def frames(self):
+        """Number of STFT frames computed so far."""
+        return self._col_base + (self._columns.shape[1] if self._columns is not None else 0)
+
+    def _stft(self):
+        """Compute every complete frame in the sample buffer and keep the remainder."""
+        n_frames = 1 + (len(self._samples) - self.window_size) // self.step_size
+        if n_frames <= 0:
+            return None
+        frames = np.lib.stride_tricks.sliding_window_view(self._samples, self.window_size)[::self.step_size][:n_frames]
+        spec = np.abs(np.fft.rfft(frames.T * self._window, axis=0).astype(np.complex64))
+        self._samples = self._samples[n_frames * self.step_size:]
+        return spec
+
+    def _find_peaks(self, final):
+        """Run peak finding on columns whose neighborhood is now complete."""
+        if self._columns is None:
+            return
+        half = self.fingerprinter.neighborhood_size // 2
+        total = self.frames
+        end = total if final else total - half
+        fp = self.fingerprinter
+        budget = (fp.query_peak_budget or fp.peak_budget) if self.query else fp.peak_budget
+        if budget and not final:
+            # The peak budget is per time slice: only emit complete slices
+            end -= end % fp.slice_frames
+        if end <= self._peak_upto:
+            return
+
+        # Include `half` columns of context on both sides so the maximum filter sees the same neighborhood
+        ctx_start = max(self._col_base, self._peak_upto - half)
+        window = self._columns[:, ctx_start - self._col_base:]
+        new_peaks = [(f, t + ctx_start) for f, t in fp.get_2d_peaks(window, query=self.query, frame_offset=ctx_start)
+                     if self._peak_upto <= t + ctx_start < end]
+        new_peaks.sort(key=lambda x: x[1])
+        self._peaks.extend(new_peaks)
+        self._peak_upto = end
+
+        # Drop columns no future peak window will need
+        keep_from = max(self._col_base, self._peak_upto - half)
+        self._columns = self._columns[:, keep_from - self._col_base:]
+        self._col_base = keep_from
+
+    def _hash(self, final):
+        """Hash anchors whose pairing targets are all final."""
+        fan = self.fingerprinter.fan_value
+        total = self._peak_base + len(self._peaks)
+        if final:
+            end = total
+        elif self.fingerprinter.pairing == "zone":
+            # Anchors whose whole target zone lies in columns with final peaks
+            limit = self._peak_upto - self.fingerprinter.zone_max_dt
+            end = self._peak_base + bisect_left(self._peaks, limit, key=lambda p: p[1])
+        else:
+            end = total - (fan - 1)
+        if end <= self._hashed_upto:
+            return FingerprintBatch.empty()
+
+        hashes = self.fingerprinter.generate_hashes(
+            self._peaks, anchor_range=(self._hashed_upto - self._peak_base, end - self._peak_base))
+        self._hashed_upto = end
+
+        # Targets always follow their anchor, so hashed anchors are no longer needed
+        drop = max(0, self._hashed_upto - self._peak_base)
+        del self._peaks[:drop]
+        self._peak_base += drop
+        return hashes
+
+    def feed(self, samples):
+        """
+        Add mono float audio at the processor sample rate.
+        Returns: FingerprintBatch of the (hash, offset) pairs that became final with this chunk
+        """
+        if self.finished:
+            raise RuntimeError("StreamingFingerprinter already finished")
+        self._samples = np.concatenate([self._samples, np.asarray(samples, dtype=np.float32)])
+        spec = self._stft()
+        if spec is not None:
+            self._columns = spec if self._columns is None else np.hstack([self._columns, spec])
+        self._find_peaks(final=False)
+        return self._hash(final=False)
+
+    def finish(self):
+        """
+        Flush the end of the stream (trailing padding, last peaks and anchors).
+        Returns: FingerprintBatch of the remaining (hash, offset) pairs
+        """
+        if self.finished:
+            return FingerprintBatch.empty()
+        self._samples = np.concatenate([self._samples, np.zeros(self.window_size // 2, dtype=np.float32)])
+        spec = self._stft()
+        if spec is not None:
+            self._columns = spec if self._columns is None else np.hstack([self._columns, spec])
+        self.finished = True
+        self._find_peaks(final=True)
+        return self._hash(final=True)
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Batch Song Recognition
+Recognizes many clips in one process: clips are fingerprinted in parallel,
+their hash lookups are merged into shared database queries, and results are
+streamed as JSON lines with per-clip timings.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Add necessary paths for internal imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Preprocessing'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
+
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter, fingerprint_config
+from recognizer import SongRecognizer, fingerprint_query_samples, MAX_QUERY_SECONDS
+import metrics
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a', '.webm', '.mp4', '.flac', '.opus')
+
+# Per-process fingerprinting components (created once per worker by _init_worker)
+_processor = None
+_fingerprinter = None
+_max_query_seconds = MAX_QUERY_SECONDS
+
+
+def _init_worker(config, max_query_seconds):
+    global _processor, _fingerprinter, _max_query_seconds
+    _processor = AudioProcessor.from_config(config)
+    _fingerprinter = Fingerprinter.from_config(config)
+    _max_query_seconds = max_query_seconds
+
+
+def _fingerprint_clip(clip):
+    """
+    Worker: load and fingerprint one clip (the same window selection as SongRecognizer.recognize).
+    Returns: (clip, hashes or None, analyzed segment or None, load_ms, fingerprint_ms, error)
+    """
+    try:
+        start = time.perf_counter()
+        y, sr = _processor.load_audio(clip["path"])
+        loaded = time.perf_counter()
+        if y is None:
+            return clip, None, None, (loaded - start) * 1000, 0.0, "Failed to load audio file"
+
+        hashes, segment = fingerprint_query_samples(_processor, _fingerprinter, y, _max_query_seconds)
+        done = time.perf_counter()
+        return clip, hashes, segment, (loaded - start) * 1000, (done - loaded) * 1000, None
+    except Exception as e:
+        return clip, None, None, 0.0, 0.0, f"Recognition failed: {str(e)}"
+
+
+def load_clips(source):
+    """
+    Collect clips from a directory (recursively) or a manifest file.
+    A manifest has one clip per line: either a plain path or a JSON object
+    with "path" and an optional "id". Relative paths are resolved against the manifest.
+
+    Returns: List of {"id", "path"} dicts
+    """
+    clips = []
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    clips.append({"id": os.path.relpath(path, source), "path": path})
+        clips.sort(key=lambda c: c["id"])
+        return clips
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entry = json.loads(line) if line.startswith('{') else {"path": line}
+            path = entry["path"] if os.path.isabs(entry["path"]) else os.path.join(base, entry["path"])
+            clips.append({"id": entry.get("id", entry["path"]), "path": path})
+    return clips
+
+
+class BatchRecognizer:
+    def __init__(self, db_path="songs.db", workers=None, batch_size=16, max_query_seconds=MAX_QUERY_SECONDS):
+        """
+        Args:
+            db_path: Path to the songs database
+            workers: Fingerprinting processes (default: CPU count)
+            batch_size: Clips whose hash lookups are merged into one set of DB queries
+            max_query_seconds: Fingerprint at most this much of each clip, after trimming silence
+                               (None analyzes everything)
+        """
+        self.recognizer = SongRecognizer(db_path=db_path, max_query_seconds=max_query_seconds)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+
+    def _finish_batch(self, batch, return_top_n, min_confidence):
+        """Run the shared lookup for a batch of fingerprinted clips and build their results."""
+        lookup_start = time.perf_counter()
+        hash_lists = [hashes or [] for _, hashes, _, _, _, _ in batch]
+        all_matches = self.recognizer.db.get_matches_many(hash_lists)
+        lookup_ms = (time.perf_counter() - lookup_start) * 1000
+        metrics.observe("db_query_seconds", lookup_ms / 1000)
+
+        for (clip, hashes, segment, load_ms, fp_ms, error), matches in zip(batch, all_matches):
+            score_start = time.perf_counter()
+            if error:
+                result = {"success": False, "error": error}
+            elif not hashes:
+                result = {"success": False, "error": "No fingerprints could be generated from audio"}
+            elif not matches:
+                result = {
+                    "success": True,
+                    "match_found": False,
+                    "message": "No matching songs found in database",
+                    "fingerprints_generated": len(hashes)
+                }
+            else:
+                top_matches = self.recognizer.score_matches(matches, len(hashes), return_top_n=return_top_n,
+                                                            min_confidence=min_confidence)
+                result = {
+                    "success": True,
+                    "match_found": bool(top_matches),
+                    "matches": top_matches,
+                    "fingerprints_generated": len(hashes),
+                    "total_matches_checked": len(matches)
+                }
+            score_ms = (time.perf_counter() - score_start) * 1000
+            metrics.observe("rows_matched", len(matches))
+            metrics.inc("recognitions_total", outcome="error" if not result["success"] else
+                        "match" if result["match_found"] else "no_match")
+
+            # The lookup is shared by the whole batch, so each clip is charged an equal share
+            lookup_share = lookup_ms / len(batch)
+            result["clip"] = clip["id"]
+            if segment:
+                result["analyzed_segment"] = segment
+            result["timings_ms"] = {
+                "load": round(load_ms, 2),
+                "fingerprint": round(fp_ms, 2),
+                "lookup": round(lookup_share, 2),
+                "score": round(score_ms, 2),
+                "total": round(load_ms + fp_ms + lookup_share + score_ms, 2)
+            }
+            yield result
+
+    def recognize_all(self, clips, return_top_n=3, min_confidence=0.1):
+        """
+        Recognize clips, yielding one result dict per clip in input order.
+        """
+        # Workers fingerprint with the recognizer's (the database's active) parameters
+        config = fingerprint_config(self.recognizer.processor, self.recognizer.fingerprinter)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(config, self.recognizer.max_query_seconds)) as pool:
+            batch = []
+            for item in pool.map(_fingerprint_clip, clips, chunksize=1):
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    yield from self._finish_batch(batch, return_top_n, min_confidence)
+                    batch = []
+            if batch:
+                yield from self._finish_batch(batch, return_top_n, min_confidence)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recognize many audio clips in one process (JSON lines output)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Recognize every clip in a directory
+  python batch_recognizer.py clips/ --db songs.db
+
+  # Recognize clips listed in a manifest, 8 fingerprinting processes
+  python batch_recognizer.py manifest.txt --workers 8 > results.jsonl
+        """
+    )
+    parser.add_argument('source', help='Directory of clips or manifest file (one path or JSON object per line)')
+    default_db = os.path.join(os.path.dirname(__file__), '..', '..', 'Databases', 'songs.db')
+    parser.add_argument('--db', default=default_db, help='Path to database')
+    parser.add_argument('--top', '-t', type=int, default=3, help='Number of top matches to return (default: 3)')
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Fingerprinting processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=16, help='Clips per shared DB lookup (default: 16)')
+    parser.add_argument('--max-seconds', type=float, default=MAX_QUERY_SECONDS,
+                        help=f'Longest part of each clip to analyze, 0 for all (default: {MAX_QUERY_SECONDS})')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Error: Source not found: {args.source}", file=sys.stderr)
+        sys.exit(1)
+
+    clips = load_clips(args.source)
+    print(f"[*] Recognizing {len(clips)} clips...", file=sys.stderr)
+
+    start = time.perf_counter()
+    metrics.configure(metrics.default_metrics_path(args.db))
+    batch = BatchRecognizer(db_path=args.db, workers=args.workers, batch_size=args.batch_size,
+                            max_query_seconds=args.max_seconds or None)
+    count = 0
+    for result in batch.recognize_all(clips, return_top_n=args.top):
+        print(json.dumps(result), flush=True)
+        count += 1
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"[!] Done! {count} clips in {elapsed:.2f}s ({rate:.1f} clips/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Circuit Breaker
+Tracks the health of an external service across recognizer processes, so a slow
+or failing dependency (Shazam) is skipped instead of blocking every request.
+
+closed     calls go through; consecutive failures (errors, timeouts, slow responses) are counted
+open       calls are skipped until reset_timeout has passed since the breaker opened
+half_open  a single probe call is let through; success closes the breaker, failure reopens it
+"""
+
+import os
+import sys
+import time
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
+
+import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, state_path, name="shazam", failure_threshold=3, slow_seconds=5.0,
+                 reset_timeout=60.0, probe_timeout=30.0, clock=time.time):
+        """
+        Initialize the breaker.
+
+        Args:
+            state_path: Path to the SQLite state file (shared by all recognizer processes)
+            name: Service the breaker guards (one row per name)
+            failure_threshold: Consecutive failures that open the breaker
+            slow_seconds: Successful calls slower than this count as failures
+            reset_timeout: Seconds the breaker stays open before a probe is allowed
+            probe_timeout: Seconds after which an unfinished probe is assumed lost and another is allowed
+            clock: Time source (for tests)
+        """
+        self.state_path = state_path
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = probe_timeout
+        self.clock = clock
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE,
+        # so reading and updating the state is atomic across processes
+        return sqlite3.connect(self.state_path, timeout=10, isolation_level=None)
+
+    def _init_db(self):
+        """Initialize the state schema."""
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS circuit_breakers (
+                name TEXT PRIMARY KEY,
+                state TEXT,
+                failures INTEGER,
+                opened_at REAL,
+                probe_started_at REAL
+            )
+        ''')
+        conn.execute("INSERT OR IGNORE INTO circuit_breakers (name, state, failures) VALUES (?, ?, 0)",
+                     (self.name, CLOSED))
+        conn.close()
+
+    def _transaction(self, update):
+        """Run update(row, now) inside a write transaction; it returns (new row values or None, result)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT state, failures, opened_at, probe_started_at FROM circuit_breakers WHERE name = ?",
+                               (self.name,)).fetchone()
+            changes, result = update(row, self.clock())
+            if changes is not None:
+                conn.execute('''
+                    UPDATE circuit_breakers SET state = ?, failures = ?, opened_at = ?, probe_started_at = ?
+                    WHERE name = ?
+                ''', changes + (self.name,))
+                if changes[0] != row[0]:
+                    metrics.inc("circuit_transitions_total", breaker=self.name, state=changes[0])
+                    print(f"[!] Circuit '{self.name}': {row[0]} -> {changes[0]}", file=sys.stderr)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def allow(self):
+        """
+        Ask whether a call may be made now. In half_open only one caller gets the probe.
+
+        Returns: (allowed, state) with state the breaker state the decision was made in
+        """
+        def update(row, now):
+            state, failures, opened_at, probe_started_at = row
+            if state == CLOSED:
+                return None, (True, CLOSED)
+            if state == OPEN and now - opened_at < self.reset_timeout:
+                return None, (False, OPEN)
+            if state == HALF_OPEN and probe_started_at and now - probe_started_at < self.probe_timeout:
+                return None, (False, HALF_OPEN)
+            return (HALF_OPEN, failures, opened_at, now), (True, HALF_OPEN)
+
+        return self._transaction(update)
+
+    def record_success(self, duration=0.0):
+        """Report a completed call; a call slower than slow_seconds counts as a failure."""
+        if duration >= self.slow_seconds:
+            self.record_failure()
+            return
+
+        def update(row, now):
+            if row[0] == CLOSED and row[1] == 0:
+                return None, None
+            return (CLOSED, 0, None, None), None
+
+        self._transaction(update)
+
+    def record_failure(self):
+        """Report a failed or timed-out call."""
+        def update(row, now):
+            state, failures, opened_at, _ = row
+            failures += 1
+            if state == HALF_OPEN or failures >= self.failure_threshold:
+                return (OPEN, failures, now, None), None
+            return (state, failures, opened_at, None), None
+
+        self._transaction(update)
+
+    def state(self):
+        """Returns: Current state name (an open breaker past reset_timeout reports half_open)"""
+        conn = self._connect()
+        state, opened_at = conn.execute("SELECT state, opened_at FROM circuit_breakers WHERE name = ?",
+                                        (self.name,)).fetchone()
+        conn.close()
+        if state == OPEN and self.clock() - opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return state
+
+    def reset(self):
+        """Close the breaker and forget past failures."""
+        self._transaction(lambda row, now: ((CLOSED, 0, None, None), None))
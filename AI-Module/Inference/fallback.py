@@ -6,46 +6,48 @@ Master Recognizer with Shazam Fallback & Auto-Indexing
 import os
 import sys
 import json
+import time
 import asyncio
 import argparse
-import subprocess
 from shazamio import Shazam
 
 # Add necessary paths for internal imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Training'))
 
-from recognizer import SongRecognizer
+from recognizer import SongRecognizer, SCORING_MODES, MAX_QUERY_SECONDS
 from youtube_indexer import YouTubeIndexer
 from database import DatabaseHandler
+from shazam_cache import ShazamCache, default_cache_path
+from circuit_breaker import CircuitBreaker
+from index_queue import IndexQueue, default_queue_path, ensure_worker
+import metrics
 
-async def trigger_auto_index(title, artist, genre="Unknown"):
+# End-to-end deadline for one request (seconds) and the longest a single Shazam call may take;
+# Shazam is not called at all when less than MIN_SHAZAM_SECONDS of the budget is left
+REQUEST_BUDGET = 10.0
+SHAZAM_TIMEOUT = 5.0
+MIN_SHAZAM_SECONDS = 0.5
+# Answers slower than this still count towards opening the circuit breaker
+SHAZAM_SLOW_SECONDS = 3.0
+
+def trigger_auto_index(title, artist, genre="Unknown", db_path=None):
     """
-    Spawns a detached process to search and index the song from YouTube.
+    Queues the song for YouTube search + indexing and makes sure a worker pool is draining the queue.
+    Requests are deduplicated by normalized title/artist, so repeated discoveries cost nothing.
     """
     try:
-        query = f"{title} {artist} official audio"
-        # We call playlist_indexer.py to do the work. 
-        # Note: Duplicate checking is ON by default in playlist_indexer.py
-        indexer_path = os.path.join(os.path.dirname(__file__), "..", "Training", "playlist_indexer.py")
-        cmd = [
-            sys.executable, 
-            indexer_path,
-            "--search", query,
-            "--limit", "1",
-            "--genre", genre
-        ]
-        
-        # Start detached
-        subprocess.Popen(
-            cmd, 
-            stdout=subprocess.DEVNULL, 
-            stderr=subprocess.DEVNULL,
-            start_new_session=True
-        )
-        print(f"DEBUG: Triggered auto-indexing for {title} by {artist}", file=sys.stderr)
+        queue_path = default_queue_path(db_path)
+        job_id, created = IndexQueue(queue_path).enqueue(title, artist, genre=genre)
+        if created:
+            print(f"DEBUG: Queued auto-indexing job {job_id} for {title} by {artist}", file=sys.stderr)
+        else:
+            print(f"DEBUG: Auto-indexing for {title} by {artist} already queued (job {job_id})", file=sys.stderr)
+        ensure_worker(queue_path, db_path=db_path)
+        return job_id
     except Exception as e:
         print(f"DEBUG: Failed to trigger auto-indexing: {e}", file=sys.stderr)
+        return None
 
 import difflib
 
@@ -54,48 +56,133 @@ def is_similar(str1, str2, threshold=0.7):
     if not str1 or not str2: return False
     return difflib.SequenceMatcher(None, str1.lower(), str2.lower()).ratio() >= threshold
 
-async def recognize_workflow(audio_path, db_path="songs.db", return_top_n=3):
+def parse_shazam_track(shazam_out):
+    """Convert a raw Shazam response into our match format (None if nothing was found)"""
+    if not shazam_out or not shazam_out.get('track'):
+        return None
+    track = shazam_out['track']
+    images = track.get('images', {})
+    return {
+        "title": track.get('title', 'Unknown'),
+        "artist": track.get('subtitle', 'Unknown'),
+        "genre": track.get('genres', {}).get('primary', 'Unknown'),
+        "thumbnail": images.get('coverarthq') or images.get('coverart'),
+        "url": track.get('url'),
+        "confidence": 100,
+        "is_shazam_match": True
+    }
+
+async def recognize_workflow(audio_path, db_path="songs.db", return_top_n=3, cache=None,
+                             local_skip_confidence=None, scoring="python",
+                             max_query_seconds=MAX_QUERY_SECONDS, shazam=None, breaker=None,
+                             budget_seconds=REQUEST_BUDGET, shazam_timeout=SHAZAM_TIMEOUT):
     """
+    audio_path may also be the encoded audio itself (bytes), e.g. an upload read from stdin.
+
     1. Run local recognition (Top candidates)
-    2. Run Shazam recognition
+    2. Run Shazam recognition (unless the local match reaches local_skip_confidence, the cache knows the
+       answer, the circuit breaker is open or the request budget is spent), bounded by shazam_timeout
     3. Compare and decide on indexing
+
+    shazam is the client to call (a shazamio.Shazam by default); breaker guards it across requests
+    (by default its state is kept in the cache file).
     """
+    request_start = time.perf_counter()
+    deadline = request_start + budget_seconds
+    
     # Initialize components
-    recognizer = SongRecognizer(db_path=db_path)
-    shazam = Shazam()
+    recognizer = SongRecognizer(db_path=db_path, scoring=scoring, max_query_seconds=max_query_seconds)
+    if cache is None:
+        cache = ShazamCache(default_cache_path(db_path))
+    if breaker is None:
+        breaker = CircuitBreaker(cache.cache_path, slow_seconds=SHAZAM_SLOW_SECONDS)
     
     print(f"[*] Starting parallel recognition (Audio-based Local + Shazam)...", file=sys.stderr)
     
     # 1. Local Search (Checks your songs.db fingerprints)
     # We request top 10 internally to ensure we have enough variety to find unique library matches 
     # even if Shazam finds the primary song.
-    local_result = recognizer.recognize(audio_path, return_top_n=10, min_confidence=0)
+    # The query fingerprints are generated once and reused for the cache signature.
+    hashes = None
+    segment = None
+    local_start = time.perf_counter()
+    try:
+        hashes, segment = recognizer.fingerprint_query(audio_path)
+        if hashes is None:
+            metrics.inc("recognitions_total", outcome="error")
+            local_result = {"success": False, "error": "Failed to load audio file"}
+        else:
+            print(f"[*] Analyzing {segment['start']:.1f}s - {segment['end']:.1f}s of {segment['audio_duration']:.1f}s",
+                  file=sys.stderr)
+            local_result = recognizer.recognize_hashes(hashes, return_top_n=10, min_confidence=0)
+    except Exception as e:
+        metrics.inc("recognitions_total", outcome="error")
+        local_result = {"success": False, "error": f"Recognition failed: {str(e)}"}
+    metrics.observe("recognition_seconds", time.perf_counter() - local_start)
     local_matches = local_result.get('matches', [])
     
     # 2. Shazam Search (Checks Shazam's global database)
     shazam_match = None
-    try:
-        shazam_out = await shazam.recognize(audio_path)
-        if shazam_out and shazam_out.get('track'):
-            track = shazam_out['track']
-            images = track.get('images', {})
-            shazam_match = {
-                "title": track.get('title', 'Unknown'),
-                "artist": track.get('subtitle', 'Unknown'),
-                "genre": track.get('genres', {}).get('primary', 'Unknown'),
-                "thumbnail": images.get('coverarthq') or images.get('coverart'),
-                "url": track.get('url'),
-                "confidence": 100,
-                "is_shazam_match": True
-            }
-    except Exception as e:
-        print(f"[!] Shazam Error: {e}", file=sys.stderr)
+    shazam_lookup = "live"
+    shazam_error = None
+    signature = cache.signature(hashes) if hashes else []
+    
+    if (local_skip_confidence is not None and local_matches
+            and local_matches[0]['confidence'] >= local_skip_confidence):
+        shazam_lookup = "skipped"
+        print(f"[#] Confident local match ({local_matches[0]['confidence']}%), skipping Shazam.", file=sys.stderr)
+    else:
+        hit, cached_match = cache.get(signature)
+        if hit:
+            shazam_lookup = "cache"
+            shazam_match = cached_match
+            print(f"[#] Shazam cache hit ({'found' if cached_match else 'not found'}).", file=sys.stderr)
+        else:
+            timeout = min(shazam_timeout, deadline - time.perf_counter())
+            allowed = False
+            if timeout < MIN_SHAZAM_SECONDS:
+                shazam_lookup = "budget_exhausted"
+                print(f"[!] Request budget spent, skipping Shazam.", file=sys.stderr)
+            else:
+                allowed, breaker_state = breaker.allow()
+                if not allowed:
+                    shazam_lookup = "circuit_open"
+                    print(f"[!] Shazam circuit is {breaker_state}, skipping Shazam.", file=sys.stderr)
+            if allowed:
+                shazam_start = time.perf_counter()
+                try:
+                    client = shazam or Shazam()
+                    shazam_out = await asyncio.wait_for(client.recognize(audio_path), timeout)
+                    breaker.record_success(time.perf_counter() - shazam_start)
+                    shazam_match = parse_shazam_track(shazam_out)
+                    # Cache both outcomes; "not found" expires sooner
+                    cache.put(signature, shazam_match)
+                except asyncio.TimeoutError:
+                    shazam_error = "timeout"
+                    breaker.record_failure()
+                    print(f"[!] Shazam timed out after {timeout:.1f}s", file=sys.stderr)
+                except Exception as e:
+                    shazam_error = "error"
+                    breaker.record_failure()
+                    print(f"[!] Shazam Error: {e}", file=sys.stderr)
+                metrics.observe("shazam_seconds", time.perf_counter() - shazam_start)
+    if shazam_lookup in ("skipped", "circuit_open", "budget_exhausted"):
+        shazam_result = "skipped"
+    elif shazam_error:
+        shazam_result = shazam_error
+    else:
+        shazam_result = "found" if shazam_match else "not_found"
+    metrics.inc("shazam_lookups_total", source=shazam_lookup, result=shazam_result)
 
     # decision making
     should_index = False
     match_found = len(local_matches) > 0 or shazam_match is not None
     
-    if shazam_match:
+    if shazam_lookup == "skipped":
+        outcome = "local"
+        message = f"Song recognized as '{local_matches[0]['title']}'! (Already in your library)"
+    elif shazam_match:
+        outcome = "shazam_known"
         # Check if local top hit matches Shazam (via title/artist)
         already_indexed = False
         for local in local_matches:
@@ -107,19 +194,24 @@ async def recognize_workflow(audio_path, db_path="songs.db", return_top_n=3):
                 break
         
         if not already_indexed:
+            outcome = "shazam_new"
             should_index = True
             print(f"[+] Shazam found a NEW song: {shazam_match['title']}. Adding it to your DB via YouTube...", file=sys.stderr)
             message = f"New song discovered via Shazam: '{shazam_match['title']}'! Adding to your library..."
-            asyncio.create_task(trigger_auto_index(shazam_match['title'], shazam_match['artist'], genre=shazam_match['genre']))
+            trigger_auto_index(shazam_match['title'], shazam_match['artist'], genre=shazam_match['genre'], db_path=db_path)
     elif local_matches:
         # Shazam failed or was empty, but we have local candidates
+        outcome = "local_candidates"
         print(f"[-] Shazam failed to identify, but found {len(local_matches)} local candidates.", file=sys.stderr)
         message = f"Shazam couldn't find it, but here are the best matches from your local database."
     else:
         # Both failed
+        outcome = "none"
         print(f"[!] No match found in local database or Shazam.", file=sys.stderr)
         message = "Song not found in your local database or Shazam."
 
+    metrics.inc("fallback_outcomes_total", outcome=outcome)
+
     # Combine lists (Prefer Shazam first, then unique local hits)
     all_results = []
     seen_titles = set()
@@ -145,29 +237,70 @@ async def recognize_workflow(audio_path, db_path="songs.db", return_top_n=3):
     # Sort results: Shazam matches (100% confidence typically) vs Local
     # all_results.sort(key=lambda x: x.get('confidence', 0), reverse=True)
 
+    # Which sources the returned matches came from
+    sources = []
+    returned = all_results[:3]
+    if shazam_match and returned and returned[0] is shazam_match:
+        sources.append("shazam_cache" if shazam_lookup == "cache" else "shazam")
+    if any(not m['is_shazam_match'] for m in returned):
+        sources.append("local")
+
     return {
         "success": True,
         "match_found": match_found,
         "matches": all_results[:3], # Strictly follow user's "3 matches required"
         "shazam_discovery": should_index,
+        "shazam_lookup": shazam_lookup,
+        "shazam_status": shazam_result,
+        "sources": sources,
+        "elapsed_ms": round((time.perf_counter() - request_start) * 1000, 2),
+        "analyzed_segment": segment,
         "message": message
     }
 
 async def main():
     parser = argparse.ArgumentParser(description="Master Recognizer with Parallel Verification")
-    parser.add_argument('audio_file', help='Path to audio file')
+    parser.add_argument('audio_file', help="Path to audio file, or '-' to read the audio from stdin")
     default_db = os.path.join(os.path.dirname(__file__), '..', '..', 'Databases', 'songs.db')
     parser.add_argument('--db', default=default_db, help='Path to database')
     parser.add_argument('--json', action='store_true', help='Output as JSON')
     parser.add_argument('--top', '-t', type=int, default=3, help='Number of top local matches to check')
+    parser.add_argument('--cache-db', help='Path to the Shazam cache database (default: next to --db)')
+    parser.add_argument('--local-skip-confidence', type=float, default=None,
+                        help='Skip Shazam when the best local match reaches this confidence %% '
+                             '(default: always ask Shazam, so a wrong local match can still be corrected)')
+    
+    parser.add_argument('--scoring', choices=SCORING_MODES, default='python',
+                        help='Where the local alignment histogram is computed (default: python)')
+    
+    parser.add_argument('--max-seconds', type=float, default=MAX_QUERY_SECONDS,
+                        help=f'Longest part of the audio to fingerprint, 0 for all (default: {MAX_QUERY_SECONDS})')
+    
+    parser.add_argument('--budget', type=float, default=REQUEST_BUDGET,
+                        help=f'End-to-end time budget per request in seconds (default: {REQUEST_BUDGET})')
+    parser.add_argument('--shazam-timeout', type=float, default=SHAZAM_TIMEOUT,
+                        help=f'Longest a Shazam call may take in seconds (default: {SHAZAM_TIMEOUT})')
     
     args = parser.parse_args()
     
-    if not os.path.exists(args.audio_file):
+    if args.audio_file == '-':
+        # Uploads are streamed in by the backend; decoded from memory, never written to disk
+        audio = sys.stdin.buffer.read()
+        if not audio:
+            print(json.dumps({"success": False, "error": "No audio data received"}))
+            return
+    elif not os.path.exists(args.audio_file):
         print(json.dumps({"success": False, "error": "File not found"}))
         return
+    else:
+        audio = args.audio_file
 
-    result = await recognize_workflow(args.audio_file, db_path=args.db, return_top_n=args.top)
+    metrics.configure(metrics.default_metrics_path(args.db))
+    cache = ShazamCache(args.cache_db or default_cache_path(args.db))
+    result = await recognize_workflow(audio, db_path=args.db, return_top_n=args.top,
+                                      cache=cache, local_skip_confidence=args.local_skip_confidence,
+                                      scoring=args.scoring, max_query_seconds=args.max_seconds or None,
+                                      budget_seconds=args.budget, shazam_timeout=args.shazam_timeout)
     
     if args.json:
         print(json.dumps(result))
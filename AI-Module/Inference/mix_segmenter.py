@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Mix Segmentation
+Identifies the sequence of songs in a long recording (DJ mix, radio capture):
+the audio is cut into overlapping windows that are recognized in parallel,
+and neighbouring windows that agree on song and position are merged into a
+timeline of (start, end, song, confidence) entries.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Add necessary paths for internal imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Preprocessing'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
+
+from processor import AudioProcessor
+from recognizer import SongRecognizer, fingerprint_query_samples
+from snapshot import SnapshotDatabase
+from database import DatabaseHandler
+
+# Per-process state (created once per worker by _init_worker)
+_recognizer = None
+_audio = None
+_audio_buffer = None
+
+
+def _init_worker(db_path, snapshot, audio_name, num_samples):
+    """
+    Open one database/index handle per worker and map the decoded recording from shared memory,
+    so the audio is never copied into the workers whatever the start method.
+    """
+    global _recognizer, _audio, _audio_buffer
+    db = SnapshotDatabase(snapshot) if snapshot else None
+    _recognizer = SongRecognizer(db_path=db_path, db=db, max_query_seconds=None)
+    _audio_buffer = shared_memory.SharedMemory(name=audio_name)
+    _audio = np.ndarray((num_samples,), dtype=np.float32, buffer=_audio_buffer.buf)
+
+
+def _recognize_window(window):
+    """
+    Worker: fingerprint and recognize one window of the recording.
+    Returns: (window, best match dict or None)
+    """
+    index, start, end, min_confidence = window
+    recognizer = _recognizer
+    hashes, segment = fingerprint_query_samples(recognizer.processor, recognizer.fingerprinter,
+                                                _audio[start:end], max_seconds=None)
+    if not hashes:
+        return window, None
+    result = recognizer.recognize_hashes(hashes, return_top_n=1, min_confidence=min_confidence)
+    if not result.get("match_found"):
+        return window, None
+    # Offsets count from the analyzed part (silence trimmed); re-anchor them to the window start
+    match = result["matches"][0]
+    trimmed_frames = round(segment["start"] * recognizer.processor.sample_rate / recognizer.processor.step_size)
+    match["time_offset"] -= trimmed_frames
+    return window, match
+
+
+class MixSegmenter:
+    def __init__(self, db_path="songs.db", snapshot=None, workers=None, window_seconds=10.0,
+                 hop_seconds=5.0, min_confidence=2.0, offset_tolerance=2.0):
+        """
+        Args:
+            db_path: Path to the songs database
+            snapshot: Optional library snapshot directory to query instead of db_path
+            workers: Recognition processes (default: CPU count)
+            window_seconds: Length of each recognized window
+            hop_seconds: Distance between window starts (less than window_seconds for overlap)
+            min_confidence: Minimum confidence percentage for a window to count as a match
+            offset_tolerance: Seconds two windows' implied song start may differ and still be merged
+        """
+        if hop_seconds <= 0 or window_seconds <= 0:
+            raise ValueError("window_seconds and hop_seconds must be positive")
+        self.db_path = db_path
+        self.snapshot = snapshot
+        self.workers = workers or os.cpu_count() or 1
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.min_confidence = min_confidence
+        self.offset_tolerance = offset_tolerance
+        self.processor = AudioProcessor()
+
+    def windows(self, num_samples):
+        """Sample ranges of the overlapping windows. Returns: List of (index, start, end)"""
+        sr = self.processor.sample_rate
+        size = int(self.window_seconds * sr)
+        hop = int(self.hop_seconds * sr)
+        starts = range(0, max(num_samples - size, 0) + 1, hop)
+        ranges = [(i, start, min(start + size, num_samples)) for i, start in enumerate(starts)]
+        # Cover the tail when the last hop does not line up with the end of the recording
+        if ranges and ranges[-1][2] < num_samples:
+            ranges.append((len(ranges), num_samples - size, num_samples))
+        return ranges
+
+    def segment(self, audio_file_path):
+        """
+        Recognize a long recording window by window.
+
+        Args:
+            audio_file_path: Path to the recording (or its encoded bytes)
+
+        Returns:
+            dict with the merged timeline and the per-window matches
+        """
+        # Decode at the sample rate of the library's fingerprint version
+        db = SnapshotDatabase(self.snapshot) if self.snapshot else DatabaseHandler(self.db_path)
+        self.processor = AudioProcessor.from_config(db.get_active_fingerprint_version()[1] or {})
+        y, sr = self.processor.load_audio(audio_file_path)
+        if y is None:
+            return {"success": False, "error": "Failed to load audio file"}
+
+        num_samples = len(y)
+        jobs = [(i, start, end, self.min_confidence) for i, start, end in self.windows(num_samples)]
+        # Windows are cheap to describe, so hand each worker a few at a time
+        chunksize = max(1, len(jobs) // (self.workers * 4))
+        buffer = shared_memory.SharedMemory(create=True, size=max(num_samples * 4, 1))
+        try:
+            np.ndarray((num_samples,), dtype=np.float32, buffer=buffer.buf)[:] = y
+            del y
+            # Spawned (not forked) workers, as in the ingestion pipeline
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(self.db_path, self.snapshot, buffer.name, num_samples)) as pool:
+                recognized = list(pool.map(_recognize_window, jobs, chunksize=chunksize))
+        finally:
+            buffer.close()
+            buffer.unlink()
+
+        window_results = []
+        for (index, start, end, _), match in recognized:
+            window_results.append({
+                "start": round(start / sr, 2),
+                "end": round(end / sr, 2),
+                "match": match
+            })
+
+        return {
+            "success": True,
+            "duration": round(num_samples / sr, 2),
+            "timeline": self.merge(window_results),
+            "windows": window_results
+        }
+
+    def merge(self, window_results):
+        """
+        Merge consecutive windows that matched the same song at a consistent position.
+
+        A window's match implies where the song started in the recording (window start minus the
+        match's time offset); windows of one song are merged while those agree within
+        offset_tolerance. Unmatched windows in between do not break a run, another song does.
+        An entry starts no earlier than its implied song start; where two entries still overlap,
+        the boundary is that start if it was located, otherwise the middle of the overlap. Gaps
+        shorter than a hop are closed.
+
+        Returns: List of timeline entry dicts in recording order
+        """
+        frame_seconds = self.processor.step_size / self.processor.sample_rate
+        timeline = []
+        for window in window_results:
+            match = window["match"]
+            if match is None:
+                continue
+            song_start = window["start"] - match["time_offset"] * frame_seconds
+            last = timeline[-1] if timeline else None
+            if (last and last["song_id"] == match["song_id"]
+                    and abs(song_start - last["_song_start"]) <= self.offset_tolerance):
+                last["end"] = window["end"]
+                last["_confidences"].append(match["confidence"])
+                continue
+            timeline.append({
+                # A song starting inside its first window starts where the match puts it
+                "start": round(max(window["start"], song_start), 2),
+                "end": window["end"],
+                "song_id": match["song_id"],
+                "title": match["title"],
+                "artist": match["artist"],
+                "_song_start": song_start,
+                "_located": song_start >= window["start"] - self.offset_tolerance,
+                "_confidences": [match["confidence"]]
+            })
+
+        for prev, entry in zip(timeline, timeline[1:]):
+            if entry["start"] - prev["end"] <= self.hop_seconds:
+                # Closer than one hop is window granularity, not an unidentified stretch
+                prev["end"] = max(prev["end"], entry["start"])
+            if entry["start"] < prev["end"]:
+                if entry["_located"]:
+                    # The song's start was located, so the previous entry ends there
+                    prev["end"] = entry["start"]
+                else:
+                    prev["end"] = entry["start"] = round((entry["start"] + prev["end"]) / 2, 2)
+
+        for entry in timeline:
+            confidences = entry.pop("_confidences")
+            entry.pop("_song_start")
+            entry.pop("_located")
+            entry["confidence"] = round(sum(confidences) / len(confidences), 2)
+            entry["windows"] = len(confidences)
+        return timeline
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Identify the sequence of songs in a long recording",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Timeline of a DJ mix
+  python mix_segmenter.py mix.mp3 --db songs.db
+
+  # Finer windows, 8 recognition processes, JSON output
+  python mix_segmenter.py mix.mp3 --window 8 --hop 4 --workers 8 --json
+        """
+    )
+    parser.add_argument('audio_file', help="Path to the recording, or '-' to read it from stdin")
+    default_db = os.path.join(os.path.dirname(__file__), '..', '..', 'Databases', 'songs.db')
+    parser.add_argument('--db', default=default_db, help='Path to database')
+    parser.add_argument('--snapshot', help='Query a library snapshot directory instead of --db')
+    parser.add_argument('--workers', '-w', type=int, default=None, help='Recognition processes (default: CPU count)')
+    parser.add_argument('--window', type=float, default=10.0, help='Window length in seconds (default: 10)')
+    parser.add_argument('--hop', type=float, default=5.0, help='Seconds between window starts (default: 5)')
+    parser.add_argument('--min-confidence', type=float, default=2.0,
+                        help='Minimum confidence %% for a window match (default: 2)')
+    parser.add_argument('--json', action='store_true', help='Output result as JSON')
+
+    args = parser.parse_args()
+
+    audio = sys.stdin.buffer.read() if args.audio_file == '-' else args.audio_file
+    if args.audio_file != '-' and not os.path.exists(args.audio_file):
+        print(f"Error: File not found: {args.audio_file}", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    segmenter = MixSegmenter(db_path=args.db, snapshot=args.snapshot, workers=args.workers,
+                             window_seconds=args.window, hop_seconds=args.hop,
+                             min_confidence=args.min_confidence)
+    result = segmenter.segment(audio)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    if not result["success"]:
+        print(f"[-] {result['error']}")
+        sys.exit(1)
+    print(f"[*] {len(result['windows'])} windows over {result['duration']}s in {elapsed:.2f}s")
+    if not result["timeline"]:
+        print("[-] No songs identified")
+    for entry in result["timeline"]:
+        print(f"  {entry['start']:8.2f}s - {entry['end']:8.2f}s  {entry['title']} - {entry['artist']} "
+              f"({entry['confidence']}%, {entry['windows']} windows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ Takes an audio file and identifies the song using fingerprint matching.
 import os
 import sys
 import json
+import math
+import time
 import argparse
 from collections import Counter
 
@@ -17,132 +19,288 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Preprocessing'))
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
 
 from processor import AudioProcessor
-from fingerprinter import Fingerprinter
+from fingerprinter import Fingerprinter, fingerprint_config, config_version
 from database import DatabaseHandler
+from snapshot import SnapshotDatabase
+import metrics
+
+
+SCORING_MODES = ("python", "sql")
+
+# Longest stretch of a query that is fingerprinted (seconds); bounds per-request CPU
+MAX_QUERY_SECONDS = 30
+
+
+def fingerprint_query_samples(processor, fingerprinter, y, max_seconds=MAX_QUERY_SECONDS):
+    """
+    Drop silence from decoded query audio and fingerprint its most energetic window of at
+    most max_seconds. Shared by every recognition path so they all analyze the same part.
+    
+    Args:
+        processor: AudioProcessor the audio was decoded with
+        fingerprinter: Fingerprinter producing the query hashes
+        y: Audio samples at processor.sample_rate
+        max_seconds: Longest window to fingerprint (None: only trim silence)
+    
+    Returns: Tuple (hashes, segment), segment being the analyzed part of the audio
+             ({"start", "end", "audio_duration"} in seconds)
+    """
+    sr = processor.sample_rate
+    window, start = processor.select_window(y, max_seconds=max_seconds)
+    segment = {
+        "start": round(start / sr, 2),
+        "end": round((start + len(window)) / sr, 2),
+        "audio_duration": round(len(y) / sr, 2)
+    }
+    
+    spec = processor.get_spectrogram(window)
+    peaks = fingerprinter.get_2d_peaks(spec, query=True)
+    return fingerprinter.generate_hashes(peaks), segment
 
 
 class SongRecognizer:
-    def __init__(self, db_path="songs.db"):
-        """Initialize the song recognizer."""
-        self.processor = AudioProcessor()
-        self.fingerprinter = Fingerprinter()
-        self.db = DatabaseHandler(db_path)
+    def __init__(self, db_path="songs.db", processor=None, fingerprinter=None, scoring="python", db=None,
+                 max_query_seconds=MAX_QUERY_SECONDS):
+        """
+        Initialize the song recognizer.
+        
+        Args:
+            db_path: Path to the songs database
+            processor: AudioProcessor to use (default: the database's active fingerprint version)
+            fingerprinter: Fingerprinter to use (default: the database's active fingerprint version)
+            scoring: "python" (alignment over all matched rows) or "sql" (alignment histogram
+                     built in SQLite, only the best bin per song is returned)
+            db: Optional database object to query instead of opening db_path
+                (e.g. a SnapshotDatabase)
+            max_query_seconds: Fingerprint at most this much of a query, after trimming silence
+                               (None analyzes everything)
+        """
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {scoring}")
+        self.scoring = scoring
+        self.db = db or DatabaseHandler(db_path)
+        self.max_query_seconds = max_query_seconds
+        self._song_info_cache = {}
+        
+        # Queries only match fingerprints built with the same parameters, so components not
+        # given explicitly follow the database's active version
+        active, config = self.db.get_active_fingerprint_version()
+        self.processor = processor or AudioProcessor.from_config(config or {})
+        self.fingerprinter = fingerprinter or Fingerprinter.from_config(config or {})
+        version = config_version(fingerprint_config(self.processor, self.fingerprinter))
+        if active and active != version:
+            print(f"[!] Warning: database fingerprints are version {active}, recognizer produces {version}",
+                  file=sys.stderr)
+    
+    def fingerprint_query(self, audio_file_path):
+        """
+        Load an audio file (path or encoded bytes), drop silence, and fingerprint the most
+        energetic window of at most max_query_seconds.
+        
+        Returns: Tuple (hashes, segment), segment being the analyzed part of the audio
+                 ({"start", "end", "audio_duration"} in seconds), or (None, None) if the audio
+                 could not be loaded.
+        """
+        y, sr = self.processor.load_audio(audio_file_path)
+        if y is None:
+            return None, None
+        return fingerprint_query_samples(self.processor, self.fingerprinter, y, self.max_query_seconds)
+    
+    def fingerprint_file(self, audio_file_path):
+        """
+        Load an audio file and generate its query fingerprints (see fingerprint_query).
+        
+        Returns: List of (hash, offset) tuples, or None if the audio could not be loaded.
+        """
+        return self.fingerprint_query(audio_file_path)[0]
     
     def recognize(self, audio_file_path, return_top_n=3, min_confidence=0.1):
         """
         Recognize a song from an audio file.
         
         Args:
-            audio_file_path: Path to the audio file to recognize
+            audio_file_path: Path to the audio file to recognize (or its encoded bytes)
             return_top_n: Number of top matches to return
             min_confidence: Minimum confidence percentage to consider a match valid
             
         Returns:
             dict with recognition results
         """
+        start = time.perf_counter()
         try:
-            # 1. Load audio
-            y, sr = self.processor.load_audio(audio_file_path)
-            if y is None:
+            # 1. Load audio and generate fingerprints
+            hashes, segment = self.fingerprint_query(audio_file_path)
+            if hashes is None:
+                metrics.inc("recognitions_total", outcome="error")
                 return {
                     "success": False,
                     "error": "Failed to load audio file"
                 }
             
-            # 2. Generate fingerprints
-            spec = self.processor.get_spectrogram(y)
-            peaks = self.fingerprinter.get_2d_peaks(spec)
-            hashes = self.fingerprinter.generate_hashes(peaks)
+            result = self.recognize_hashes(hashes, return_top_n=return_top_n, min_confidence=min_confidence)
+            result["analyzed_segment"] = segment
+            return result
             
-            if not hashes:
-                return {
-                    "success": False,
-                    "error": "No fingerprints could be generated from audio"
-                }
+        except Exception as e:
+            metrics.inc("recognitions_total", outcome="error")
+            return {
+                "success": False,
+                "error": f"Recognition failed: {str(e)}"
+            }
+        finally:
+            metrics.observe("recognition_seconds", time.perf_counter() - start)
+    
+    def recognize_hashes(self, hashes, return_top_n=3, min_confidence=0.1):
+        """
+        Recognize a song from already generated query fingerprints.
+        
+        Args:
+            hashes: List of (hash, offset) tuples for the recorded audio
+            return_top_n: Number of top matches to return
+            min_confidence: Minimum confidence percentage to consider a match valid
             
-            # 3. Query database for matches
+        Returns:
+            dict with recognition results
+        """
+        if not hashes:
+            metrics.inc("recognitions_total", outcome="error")
+            return {
+                "success": False,
+                "error": "No fingerprints could be generated from audio"
+            }
+        
+        # Query database for matches
+        start = time.perf_counter()
+        if self.scoring == "sql":
+            # Songs that cannot reach min_confidence are dropped in the database (rounded down;
+            # rank_alignments still applies the exact threshold)
+            min_count = max(1, math.floor(min_confidence * len(hashes) / 100))
+            alignments, total_matches = self.db.get_alignment_scores(hashes, min_count=min_count)
+        else:
             matches = list(self.db.get_matches(hashes))
+            total_matches = len(matches)
+        metrics.observe("db_query_seconds", time.perf_counter() - start)
+        metrics.observe("rows_matched", total_matches)
+        
+        if not total_matches:
+            metrics.inc("recognitions_total", outcome="no_match")
+            return {
+                "success": True,
+                "match_found": False,
+                "message": "No matching songs found in database",
+                "fingerprints_generated": len(hashes)
+            }
+        
+        if self.scoring == "sql":
+            top_matches = self.rank_alignments(alignments, len(hashes), return_top_n=return_top_n,
+                                               min_confidence=min_confidence)
+        else:
+            top_matches = self.score_matches(matches, len(hashes), return_top_n=return_top_n,
+                                             min_confidence=min_confidence)
+        
+        metrics.inc("recognitions_total", outcome="match" if top_matches else "no_match")
+        if not top_matches:
+            return {
+                "success": True,
+                "match_found": False,
+                "message": "Matches found but could not retrieve song info"
+            }
+        
+        return {
+            "success": True,
+            "match_found": True,
+            "matches": top_matches,
+            "fingerprints_generated": len(hashes),
+            "total_matches_checked": total_matches
+        }
+    
+    def score_matches(self, matches, total_fingerprints, return_top_n=3, min_confidence=0.1):
+        """
+        Rank candidate songs by time-offset consensus.
+        
+        Args:
+            matches: Iterable of (song_id, db_offset, recorded_offset) tuples
+            total_fingerprints: Number of fingerprints generated for the query
+            return_top_n: Number of top matches to return
+            min_confidence: Minimum confidence percentage to consider a match valid
             
-            if not matches:
-                return {
-                    "success": True,
-                    "match_found": False,
-                    "message": "No matching songs found in database",
-                    "fingerprints_generated": len(hashes)
-                }
+        Returns:
+            List of match dicts sorted by confidence (best first)
+        """
+        # 1. Count matches per song and calculate alignment
+        song_matches = {}
+        
+        for song_id, db_offset, recorded_offset in matches:
+            if song_id not in song_matches:
+                song_matches[song_id] = []
             
-            # 4. Count matches per song and calculate alignment
-            song_matches = {}
+            # Time difference (alignment)
+            time_diff = db_offset - recorded_offset
+            song_matches[song_id].append(time_diff)
+        
+        # 2. Find best match using time alignment
+        alignments = []
+        for song_id, time_diffs in song_matches.items():
+            # Find the most common time alignment (consensus)
+            alignment_counter = Counter(time_diffs)
+            best_alignment, aligned_count = alignment_counter.most_common(1)[0]
+            alignments.append((song_id, best_alignment, aligned_count))
+        
+        return self.rank_alignments(alignments, total_fingerprints, return_top_n=return_top_n,
+                                    min_confidence=min_confidence)
+    
+    def rank_alignments(self, alignments, total_fingerprints, return_top_n=3, min_confidence=0.1):
+        """
+        Turn each candidate's best alignment into ranked match results.
+        
+        Args:
+            alignments: Iterable of (song_id, time_offset, aligned_count) tuples, one per song
+            total_fingerprints: Number of fingerprints generated for the query
+            return_top_n: Number of top matches to return
+            min_confidence: Minimum confidence percentage to consider a match valid
             
-            for song_id, db_offset, recorded_offset in matches:
-                if song_id not in song_matches:
-                    song_matches[song_id] = []
-                
-                # Time difference (alignment)
-                time_diff = db_offset - recorded_offset
-                song_matches[song_id].append(time_diff)
+        Returns:
+            List of match dicts sorted by confidence (best first)
+        """
+        best_matches = []
+        
+        for song_id, best_alignment, aligned_count in alignments:
+            # Calculate confidence score
+            match_ratio = aligned_count / total_fingerprints
+            confidence = min(100, match_ratio * 100)
             
-            # 5. Find best match using time alignment
-            best_matches = []
+            # Filter by confidence threshold
+            if confidence < min_confidence:
+                continue
             
-            for song_id, time_diffs in song_matches.items():
-                # Find the most common time alignment (consensus)
-                alignment_counter = Counter(time_diffs)
-                best_alignment, aligned_count = alignment_counter.most_common(1)[0]
+            # Get song info (cached, a long-lived recognizer sees the same songs repeatedly)
+            if song_id not in self._song_info_cache:
+                metrics.inc("cache_requests_total", cache="song_info", result="miss")
+                self._song_info_cache[song_id] = self.db.get_song_by_id(song_id)
+            else:
+                metrics.inc("cache_requests_total", cache="song_info", result="hit")
+            song_info = self._song_info_cache[song_id]
+            if song_info:
+                title, artist, genre, thumbnail, url = song_info
                 
-                # Calculate confidence score
-                total_fingerprints = len(hashes)
-                match_ratio = aligned_count / total_fingerprints
-                confidence = min(100, match_ratio * 100)
-                
-                # Filter by confidence threshold
-                if confidence < min_confidence:
-                    continue
-                
-                # Get song info
-                song_info = self.db.get_song_by_id(song_id)
-                if song_info:
-                    title, artist, genre, thumbnail, url = song_info
-                    
-                    best_matches.append({
-                        "song_id": song_id,
-                        "title": title,
-                        "artist": artist,
-                        "genre": genre,
-                        "thumbnail": thumbnail,
-                        "url": url,
-                        "confidence": round(confidence, 2),
-                        "matched_fingerprints": aligned_count,
-                        "total_fingerprints": total_fingerprints,
-                        "time_offset": best_alignment
-                    })
-            
-            # Sort by confidence
-            best_matches.sort(key=lambda x: x['confidence'], reverse=True)
-            
-            # Return top N matches
-            top_matches = best_matches[:return_top_n]
-            
-            if not top_matches:
-                return {
-                    "success": True,
-                    "match_found": False,
-                    "message": "Matches found but could not retrieve song info"
-                }
-            
-            return {
-                "success": True,
-                "match_found": True,
-                "matches": top_matches,
-                "fingerprints_generated": len(hashes),
-                "total_matches_checked": len(matches)
-            }
-            
-        except Exception as e:
-            return {
-                "success": False,
-                "error": f"Recognition failed: {str(e)}"
-            }
+                best_matches.append({
+                    "song_id": song_id,
+                    "title": title,
+                    "artist": artist,
+                    "genre": genre,
+                    "thumbnail": thumbnail,
+                    "url": url,
+                    "confidence": round(confidence, 2),
+                    "matched_fingerprints": aligned_count,
+                    "total_fingerprints": total_fingerprints,
+                    "time_offset": best_alignment
+                })
+        
+        # Sort by confidence
+        best_matches.sort(key=lambda x: x['confidence'], reverse=True)
+        
+        # Return top N matches
+        return best_matches[:return_top_n]
 
 
 def main():
@@ -162,20 +320,32 @@ Examples:
         """
     )
     
-    parser.add_argument('audio_file', help='Path to audio file to recognize')
+    parser.add_argument('audio_file', help="Path to audio file to recognize, or '-' to read it from stdin")
     parser.add_argument('--top', '-t', type=int, default=3, help='Number of top matches to return (default: 3)')
     parser.add_argument('--json', action='store_true', help='Output result as JSON')
     parser.add_argument('--db', default='songs.db', help='Path to database file (default: songs.db)')
+    parser.add_argument('--snapshot', help='Query a library snapshot directory instead of --db')
+    parser.add_argument('--scoring', choices=SCORING_MODES, default='python',
+                        help='Where the alignment histogram is computed (default: python)')
+    parser.add_argument('--max-seconds', type=float, default=MAX_QUERY_SECONDS,
+                        help=f'Longest part of the audio to analyze, 0 for all (default: {MAX_QUERY_SECONDS})')
     
     args = parser.parse_args()
     
-    if not os.path.exists(args.audio_file):
+    if args.audio_file == '-':
+        audio = sys.stdin.buffer.read()
+    elif not os.path.exists(args.audio_file):
         print(f"Error: Audio file not found: {args.audio_file}")
         sys.exit(1)
+    else:
+        audio = args.audio_file
     
     # Recognize
-    recognizer = SongRecognizer(db_path=args.db)
-    result = recognizer.recognize(args.audio_file, return_top_n=args.top)
+    metrics.configure(metrics.default_metrics_path(args.db))
+    db = SnapshotDatabase(args.snapshot) if args.snapshot else None
+    recognizer = SongRecognizer(db_path=args.db, scoring=args.scoring, db=db,
+                                max_query_seconds=args.max_seconds or None)
+    result = recognizer.recognize(audio, return_top_n=args.top)
     
     # Output
     if args.json:
@@ -204,6 +374,8 @@ Examples:
         print("\n" + "=" * 60)
         print(f"Fingerprints generated: {result['fingerprints_generated']}")
         print(f"Total matches checked: {result['total_matches_checked']}")
+        segment = result['analyzed_segment']
+        print(f"Analyzed: {segment['start']:.1f}s - {segment['end']:.1f}s of {segment['audio_duration']:.1f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Shazam Lookup Cache
+Persists external Shazam results keyed by a fingerprint signature of the query,
+so repeated clips of the same song do not hit the external service again.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
+
+import metrics
+
+
+class ShazamCache:
+    def __init__(self, cache_path, ttl=7 * 24 * 3600, negative_ttl=15 * 60,
+                 max_entries=5000, signature_size=64, min_similarity=0.5, min_signature=None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_path: Path to the SQLite cache file (shared by all worker processes)
+            ttl: Seconds a positive Shazam result stays valid
+            negative_ttl: Seconds a "not found" result stays valid
+            max_entries: Maximum number of cached results before the least recently used are evicted
+            signature_size: Number of hashes kept in a query signature
+            min_similarity: Minimum estimated Jaccard similarity between the query's and a cached
+                            entry's signature for a hit
+            min_signature: Queries with fewer signature hashes (short or quiet clips) bypass the
+                           cache entirely (default: signature_size)
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.signature_size = signature_size
+        self.min_similarity = min_similarity
+        self.min_signature = signature_size if min_signature is None else min_signature
+        self._init_db()
+
+    def _connect(self):
+        # Several recognizer processes share this file, so wait on locks instead of failing
+        conn = sqlite3.connect(self.cache_path, timeout=10)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _init_db(self):
+        """Initialize the cache schema."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+        # result is NULL for a cached "not found" response
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shazam_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                result TEXT,
+                created_at REAL,
+                expires_at REAL,
+                last_used REAL
+            )
+        ''')
+
+        # Signature hashes of the query that produced each result
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shazam_signatures (
+                hash BLOB,
+                entry_id INTEGER,
+                FOREIGN KEY(entry_id) REFERENCES shazam_results(id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sig_hash ON shazam_signatures (hash)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_sig_entry ON shazam_signatures (entry_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_results_last_used ON shazam_results (last_used)')
+
+        conn.commit()
+        conn.close()
+
+    def signature(self, hashes):
+        """
+        Build a robust signature from query fingerprints.
+        The hashes are SHA1 digests (uniformly distributed), so keeping the smallest N
+        distinct values gives a bottom-k MinHash sketch. Two clips of the same passage
+        share part of their sketch even when their start times or lengths differ.
+
+        hashes: List of (hash, offset) tuples
+        Returns: Sorted list of signature hashes
+        """
+        unique = {h for h, _ in hashes}
+        return sorted(unique)[:self.signature_size]
+
+    def usable(self, signature):
+        """
+        Whether a signature is large enough to identify a clip. Single f1|f2|dt hashes recur
+        across unrelated songs, so a sketch of a few hashes would match other songs' entries.
+        """
+        return bool(signature) and len(signature) >= self.min_signature
+
+    @staticmethod
+    def similarity(a, b):
+        """
+        Bottom-k estimate of the Jaccard similarity of the hash sets two signatures were taken
+        from: the share of the k smallest hashes of their union that appear in both.
+        """
+        a, b = set(a), set(b)
+        k = min(len(a), len(b))
+        if not k:
+            return 0.0
+        union = sorted(a | b)[:k]
+        return sum(1 for h in union if h in a and h in b) / k
+
+    def get(self, signature):
+        """
+        Look up a cached Shazam result for a query signature.
+
+        Returns: (hit, result) where result is None for a cached "not found"
+        """
+        if not self.usable(signature):
+            return False, None
+
+        hit, result = self._lookup(signature)
+        metrics.inc("cache_requests_total", cache="shazam", result="hit" if hit else "miss")
+        return hit, result
+
+    def _lookup(self, signature):
+        conn = self._connect()
+        cursor = conn.cursor()
+        now = time.time()
+
+        # Entries sharing the most hashes are the only ones that can reach min_similarity
+        placeholders = ','.join(['?'] * len(signature))
+        cursor.execute(f'''
+            SELECT s.entry_id
+            FROM shazam_signatures s
+            JOIN shazam_results r ON r.id = s.entry_id
+            WHERE s.hash IN ({placeholders}) AND r.expires_at > ?
+            GROUP BY s.entry_id
+            ORDER BY COUNT(*) DESC, r.last_used DESC
+            LIMIT 3
+        ''', list(signature) + [now])
+        entry_id = None
+        for (candidate,) in cursor.fetchall():
+            cursor.execute("SELECT hash FROM shazam_signatures WHERE entry_id = ?", (candidate,))
+            if self.similarity(signature, [h for (h,) in cursor.fetchall()]) >= self.min_similarity:
+                entry_id = candidate
+                break
+
+        if entry_id is None:
+            conn.close()
+            return False, None
+
+        cursor.execute("SELECT result FROM shazam_results WHERE id = ?", (entry_id,))
+        result = cursor.fetchone()[0]
+        cursor.execute("UPDATE shazam_results SET last_used = ? WHERE id = ?", (now, entry_id))
+        conn.commit()
+        conn.close()
+
+        return True, json.loads(result) if result is not None else None
+
+    def put(self, signature, result):
+        """
+        Store a Shazam result (or None for "not found") under a query signature.
+        Expired entries are purged and the cache is trimmed to max_entries.
+        Signatures too small to identify a clip (see usable) are not stored.
+        """
+        if not self.usable(signature):
+            return
+
+        now = time.time()
+        ttl = self.ttl if result is not None else self.negative_ttl
+        payload = json.dumps(result) if result is not None else None
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('INSERT INTO shazam_results (result, created_at, expires_at, last_used) VALUES (?, ?, ?, ?)',
+                           (payload, now, now + ttl, now))
+            entry_id = cursor.lastrowid
+            cursor.executemany('INSERT INTO shazam_signatures (hash, entry_id) VALUES (?, ?)',
+                               [(h, entry_id) for h in signature])
+
+            # Evict expired entries, then the least recently used ones beyond the size limit
+            cursor.execute("DELETE FROM shazam_results WHERE expires_at <= ?", (now,))
+            cursor.execute('''
+                DELETE FROM shazam_results WHERE id IN (
+                    SELECT id FROM shazam_results ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Remove every cached entry."""
+        conn = self._connect()
+        conn.execute("DELETE FROM shazam_results")
+        conn.commit()
+        conn.close()
+
+    def stats(self):
+        """Returns dict with positive/negative/expired entry counts."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        now = time.time()
+        cursor.execute('''
+            SELECT
+                SUM(CASE WHEN result IS NOT NULL AND expires_at > ? THEN 1 ELSE 0 END),
+                SUM(CASE WHEN result IS NULL AND expires_at > ? THEN 1 ELSE 0 END),
+                SUM(CASE WHEN expires_at <= ? THEN 1 ELSE 0 END)
+            FROM shazam_results
+        ''', (now, now, now))
+        positive, negative, expired = cursor.fetchone()
+        conn.close()
+        return {"positive": positive or 0, "negative": negative or 0, "expired": expired or 0}
+
+
+def default_cache_path(db_path):
+    """The cache lives next to the songs database unless configured otherwise."""
+    return os.environ.get('SHAZAM_CACHE_DB') or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'shazam_cache.db')
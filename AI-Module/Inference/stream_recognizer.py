@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Streaming Song Recognition
+Session-based recognition for live microphone audio. PCM chunks are fingerprinted
+incrementally, only the new hashes are looked up, and per-song alignment histograms
+are updated in place so an answer can be emitted as soon as it is confident.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from collections import Counter
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Add necessary paths for internal imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Preprocessing'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
+
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter
+from stream_fingerprinter import StreamingFingerprinter
+from database import DatabaseHandler
+import metrics
+
+
+class StreamingSession:
+    def __init__(self, db, processor=None, fingerprinter=None, return_top_n=3,
+                 min_aligned=20, min_margin=2.0, min_confidence=0.1):
+        """
+        Args:
+            db: DatabaseHandler to query
+            processor: AudioProcessor providing sample rate and STFT settings
+                       (default: the database's active fingerprint version)
+            fingerprinter: Fingerprinter providing peak/hash settings
+                           (default: the database's active fingerprint version)
+            return_top_n: Number of top matches to return
+            min_aligned: Aligned hashes the leading song needs before an early answer
+            min_margin: Leading song's aligned count must be this many times the runner-up's
+            min_confidence: Minimum confidence percentage to consider a match valid
+        """
+        self.db = db
+        _, config = db.get_active_fingerprint_version()
+        self.processor = processor or AudioProcessor.from_config(config or {})
+        self.stream = StreamingFingerprinter.from_processor(
+            self.processor, fingerprinter or Fingerprinter.from_config(config or {}), query=True)
+        self.return_top_n = return_top_n
+        self.min_aligned = min_aligned
+        self.min_margin = min_margin
+        self.min_confidence = min_confidence
+
+        self.histograms = {}      # song_id -> Counter(time_diff -> count)
+        self.best = {}            # song_id -> (aligned_count, time_diff)
+        self.total_fingerprints = 0
+        self.total_matches = 0
+        self.samples_seen = 0
+        self.answer = None        # First confident result, kept once emitted
+        self.last_active = time.time()
+        self._song_info = {}
+
+    @property
+    def audio_seconds(self):
+        return self.samples_seen / self.processor.sample_rate
+
+    def _update(self, hashes):
+        """Look up only the new hashes and update the alignment histograms."""
+        self.total_fingerprints += len(hashes)
+        if not hashes:
+            return
+        start = time.perf_counter()
+        matches = list(self.db.get_matches(hashes))
+        metrics.observe("db_query_seconds", time.perf_counter() - start)
+        metrics.observe("rows_matched", len(matches))
+        for song_id, db_offset, recorded_offset in matches:
+            self.total_matches += 1
+            time_diff = db_offset - recorded_offset
+            histogram = self.histograms.get(song_id)
+            if histogram is None:
+                histogram = self.histograms[song_id] = Counter()
+            histogram[time_diff] += 1
+            count = histogram[time_diff]
+            if count > self.best.get(song_id, (0, None))[0]:
+                self.best[song_id] = (count, time_diff)
+
+    def _ranked(self):
+        return sorted(self.best.items(), key=lambda item: item[1][0], reverse=True)
+
+    def is_confident(self):
+        """True when the leading song is clearly ahead of every other candidate."""
+        ranked = self._ranked()
+        if not ranked:
+            return False
+        lead = ranked[0][1][0]
+        runner_up = ranked[1][1][0] if len(ranked) > 1 else 0
+        return lead >= self.min_aligned and lead >= self.min_margin * max(runner_up, 1)
+
+    def result(self, final=False):
+        """Build a recognition result from the current histograms."""
+        matches = []
+        for song_id, (aligned_count, best_alignment) in self._ranked():
+            confidence = min(100, aligned_count / max(self.total_fingerprints, 1) * 100)
+            if confidence < self.min_confidence:
+                continue
+            if song_id not in self._song_info:
+                self._song_info[song_id] = self.db.get_song_by_id(song_id)
+            song_info = self._song_info[song_id]
+            if not song_info:
+                continue
+            title, artist, genre, thumbnail, url = song_info
+            matches.append({
+                "song_id": song_id,
+                "title": title,
+                "artist": artist,
+                "genre": genre,
+                "thumbnail": thumbnail,
+                "url": url,
+                "confidence": round(confidence, 2),
+                "matched_fingerprints": aligned_count,
+                "total_fingerprints": self.total_fingerprints,
+                "time_offset": best_alignment
+            })
+            if len(matches) >= self.return_top_n:
+                break
+
+        result = {
+            "success": True,
+            "match_found": bool(matches),
+            "final": final,
+            "confident": self.is_confident(),
+            "audio_seconds": round(self.audio_seconds, 2),
+            "fingerprints_generated": self.total_fingerprints,
+            "total_matches_checked": self.total_matches
+        }
+        if matches:
+            result["matches"] = matches
+        else:
+            result["message"] = "No matching songs found in database"
+        return result
+
+    def feed(self, samples):
+        """
+        Add a chunk of mono float PCM at the processor sample rate.
+        Returns: A result dict the first time the answer becomes confident, otherwise None
+        """
+        self.last_active = time.time()
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples_seen += len(samples)
+        self._update(self.stream.feed(samples))
+        if self.answer is None and self.is_confident():
+            self.answer = self.result()
+            return self.answer
+        return None
+
+    def finish(self):
+        """Flush the stream and return the final result."""
+        self._update(self.stream.finish())
+        result = self.result(final=True)
+        metrics.inc("recognitions_total", outcome="match" if result["match_found"] else "no_match")
+        return result
+
+
+class StreamingRecognizer:
+    def __init__(self, db_path="songs.db", session_timeout=120, **session_options):
+        """
+        Manages concurrent streaming sessions against one database.
+
+        Args:
+            db_path: Path to the songs database
+            session_timeout: Seconds of inactivity before a session is discarded
+            session_options: Passed to every StreamingSession
+        """
+        self.db = DatabaseHandler(db_path)
+        self.processor = AudioProcessor.from_config(self.db.get_active_fingerprint_version()[1] or {})
+        self.session_timeout = session_timeout
+        self.session_options = session_options
+        self.sessions = {}
+
+    def open_session(self):
+        """Start a session. Returns its id."""
+        self.expire_sessions()
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = StreamingSession(self.db, processor=self.processor, **self.session_options)
+        return session_id
+
+    def feed(self, session_id, samples):
+        """Feed PCM to a session. Returns an early result dict or None."""
+        return self.sessions[session_id].feed(samples)
+
+    def close_session(self, session_id):
+        """Finish a session and return its final result."""
+        return self.sessions.pop(session_id).finish()
+
+    def expire_sessions(self):
+        """Drop sessions idle for longer than session_timeout."""
+        cutoff = time.time() - self.session_timeout
+        for session_id in [sid for sid, s in self.sessions.items() if s.last_active < cutoff]:
+            del self.sessions[session_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recognize a song from a live PCM stream on stdin (JSON lines output)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Input is raw mono PCM at 44.1kHz (s16le by default). One JSON line is printed as
+soon as the answer is confident, and a final line when the stream ends.
+
+Examples:
+  ffmpeg -i mic.webm -f s16le -ac 1 -ar 44100 - | python stream_recognizer.py --db songs.db
+        """
+    )
+    default_db = os.path.join(os.path.dirname(__file__), '..', '..', 'Databases', 'songs.db')
+    parser.add_argument('--db', default=default_db, help='Path to database')
+    parser.add_argument('--format', choices=['s16le', 'f32le'], default='s16le', help='PCM sample format (default: s16le)')
+    parser.add_argument('--chunk', type=float, default=0.5, help='Seconds of audio per processing step (default: 0.5)')
+    parser.add_argument('--top', '-t', type=int, default=3, help='Number of top matches to return (default: 3)')
+    parser.add_argument('--min-aligned', type=int, default=20, help='Aligned hashes required for an early answer (default: 20)')
+    parser.add_argument('--stop-early', action='store_true', help='Stop reading once a confident answer is emitted')
+
+    args = parser.parse_args()
+
+    metrics.configure(metrics.default_metrics_path(args.db))
+    recognizer = StreamingRecognizer(db_path=args.db, return_top_n=args.top, min_aligned=args.min_aligned)
+    session_id = recognizer.open_session()
+
+    dtype = np.int16 if args.format == 's16le' else np.float32
+    chunk_bytes = int(args.chunk * recognizer.processor.sample_rate) * np.dtype(dtype).itemsize
+    start = time.perf_counter()
+    pending = b''
+
+    while True:
+        data = sys.stdin.buffer.read(chunk_bytes)
+        if not data:
+            break
+        pending += data
+        usable = len(pending) - len(pending) % np.dtype(dtype).itemsize
+        samples = np.frombuffer(pending[:usable], dtype=dtype)
+        pending = pending[usable:]
+        if dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+
+        early = recognizer.feed(session_id, samples)
+        if early:
+            early["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+            print(json.dumps(early), flush=True)
+            if args.stop_early:
+                break
+
+    final = recognizer.close_session(session_id)
+    final["elapsed_seconds"] = round(time.perf_counter() - start, 3)
+    print(json.dumps(final), flush=True)
+
+
+if __name__ == "__main__":
+    main()
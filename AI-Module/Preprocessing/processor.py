@@ -1,5 +1,10 @@
+import io
+import os
+import subprocess
+import threading
 import librosa
 import numpy as np
+import soundfile as sf
 import warnings
 
 # Suppress PySoundFile warning as we expect it for some formats and have a fallback
@@ -7,21 +12,53 @@ warnings.filterwarnings("ignore", message="PySoundFile failed. Trying audioread
 # Suppress FutureWarning from librosa internal call
 warnings.filterwarnings("ignore", category=FutureWarning, module="librosa.core.audio")
 
+def ffmpeg_decode_command(sample_rate):
+    """ffmpeg invocation decoding any container on stdin to mono float32 PCM on stdout"""
+    return ['ffmpeg', '-v', 'error', '-i', 'pipe:0', '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1']
+
 class AudioProcessor:
-    def __init__(self, sample_rate=44100):
+    def __init__(self, sample_rate=44100, window_size=4096, step_size=2048):
         """
         Initialize the AudioProcessor.
         :param sample_rate: The target sample rate to convert all audio to (default 44.1kHz)
+        :param window_size: STFT window size (n_fft)
+        :param step_size: STFT step size (hop_length)
         """
         self.sample_rate = sample_rate
+        self.window_size = window_size
+        self.step_size = step_size
+
+    def config(self):
+        """Parameters that affect the spectrogram (part of the fingerprint version)."""
+        return {
+            "sample_rate": self.sample_rate,
+            "window_size": self.window_size,
+            "step_size": self.step_size
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Processor matching a stored fingerprint configuration (see config()).
+        
+        :param config: Fingerprint config dict; keys it lacks keep their defaults.
+        :return: AudioProcessor
+        """
+        return cls(**{key: config[key] for key in ("sample_rate", "window_size", "step_size") if key in config})
 
     def load_audio(self, file_path):
         """
         Loads an audio file, converts it to mono, and resamples it.
         
-        :param file_path: Path to the input audio file.
+        :param file_path: Path to the input audio file, or the encoded file contents (bytes).
         :return: Tuple (audio_time_series, sample_rate)
         """
+        if isinstance(file_path, (bytes, bytearray)):
+            try:
+                return self.decode_bytes(file_path), self.sample_rate
+            except Exception as e:
+                print(f"Error decoding audio data ({len(file_path)} bytes): {e or type(e).__name__}")
+                return None, None
         try:
             # librosa.load automatically resamples and converts to mono by default (mono=True)
             # sr=self.sample_rate ensures consistent sampling rate across all files
@@ -31,6 +68,149 @@ class AudioProcessor:
             print(f"Error loading audio file {file_path}: {e}")
             return None, None
 
+    def decode_bytes(self, data):
+        """
+        Decodes an in-memory audio file (e.g. an upload streamed over stdin) without writing it to disk.
+        libsndfile reads WAV/FLAC/OGG/MP3 from memory; other containers (WebM, M4A) are piped through ffmpeg.
+        
+        :param data: Encoded audio file contents.
+        :return: Mono audio time series at self.sample_rate. Raises RuntimeError if neither can decode it.
+        """
+        try:
+            y, _ = librosa.load(io.BytesIO(data), sr=self.sample_rate, mono=True)
+            return y
+        except Exception:
+            pass
+        
+        try:
+            proc = subprocess.run(ffmpeg_decode_command(self.sample_rate), input=bytes(data), capture_output=True)
+        except OSError as e:
+            raise RuntimeError(f"Unsupported format and no decoder available: {e}")
+        if proc.returncode != 0 or not proc.stdout:
+            message = proc.stderr.decode(errors='replace').strip()
+            raise RuntimeError(f"Decoder could not read the audio: {message or 'no output'}")
+        return np.frombuffer(proc.stdout, dtype=np.float32)
+
+    def decode_stream(self, chunks, command=None, block_size=1 << 16):
+        """
+        Decodes encoded audio that arrives in pieces (e.g. an HTTP download) through a decoder pipe,
+        yielding samples while the input is still arriving. Nothing is written to disk.
+        
+        :param chunks: Iterable of encoded byte strings (consumed on a background thread).
+        :param command: Decoder reading the container on stdin and writing mono float32 PCM at
+                        self.sample_rate on stdout (default: ffmpeg).
+        :param block_size: Samples per yielded block.
+        :return: Generator of float32 arrays. Raises OSError if the decoder cannot be started and
+                 RuntimeError if it fails on the input; errors raised by `chunks` are re-raised.
+        """
+        proc = subprocess.Popen(command or ffmpeg_decode_command(self.sample_rate),
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        feed_errors = []
+        stderr = []
+        
+        def feed():
+            try:
+                for chunk in chunks:
+                    proc.stdin.write(chunk)
+            except BrokenPipeError:
+                pass  # The decoder gave up; its exit status says why
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+        
+        threads = [threading.Thread(target=feed, daemon=True),
+                   threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)]
+        for t in threads:
+            t.start()
+        try:
+            pending = b''
+            while True:
+                data = proc.stdout.read(block_size * 4)
+                if not data:
+                    break
+                pending += data
+                usable = len(pending) - len(pending) % 4
+                if usable:
+                    yield np.frombuffer(pending[:usable], dtype=np.float32)
+                pending = pending[usable:]
+            proc.wait()
+            for t in threads:
+                t.join()
+            if feed_errors:
+                raise feed_errors[0]
+            if proc.returncode != 0:
+                message = b''.join(stderr).decode(errors='replace').strip()
+                raise RuntimeError(f"Decoder exited with status {proc.returncode}: {message}")
+        finally:
+            if proc.poll() is None:
+                # Consumer stopped early
+                proc.kill()
+                proc.wait()
+
+    def select_window(self, y, max_seconds=None, top_db=40):
+        """
+        Picks the part of a query worth fingerprinting: trims silent/low-energy lead-in and tail,
+        then keeps the max_seconds window containing the most energetic frames, so the cost of
+        the spectrogram and peak picking no longer grows with the upload length.
+        
+        :param y: Audio time series.
+        :param max_seconds: Longest window to return (None: only trim silence).
+        :param top_db: Frames this far below the loudest frame count as silence.
+        :return: Tuple (window, start_sample)
+        """
+        hop = self.step_size
+        n_frames = len(y) // hop
+        if n_frames == 0:
+            return y, 0
+        
+        # Frame energy (dB) on the STFT hop grid
+        frames = y[:n_frames * hop].reshape(n_frames, hop).astype(np.float64)
+        db = 10 * np.log10(np.maximum(np.mean(frames ** 2, axis=1), 1e-20))
+        active = db > db.max() - top_db
+        
+        idx = np.flatnonzero(active)
+        first, last = idx[0], idx[-1] + 1
+        max_frames = max(1, int(max_seconds * self.sample_rate / hop)) if max_seconds else n_frames
+        if last - first > max_frames:
+            # Sliding count of energetic frames; the earliest best window wins ties
+            counts = np.concatenate([[0], np.cumsum(active[first:last])])
+            first += int(np.argmax(counts[max_frames:] - counts[:-max_frames]))
+            last = first + max_frames
+        
+        start = int(first) * hop
+        end = len(y) if last == n_frames else int(last) * hop
+        return y[start:end], start
+
+    def save_archive(self, y, path):
+        """
+        Archives decoded audio as 16-bit FLAC so it can be re-fingerprinted later
+        without downloading it again (lossless for the fingerprinting pipeline's input).
+        
+        This costs roughly 3.3 MiB per minute at 44.1kHz. Lossy codecs are 2-6x smaller
+        (Opus/Vorbis at 0.5-1.9 MiB/min) but move enough spectral peaks that only 15-48%
+        of the original hashes come back, so a re-fingerprint from them would drift.
+        
+        :param y: Audio time series at self.sample_rate.
+        :param path: Destination .flac path.
+        """
+        with self.archive_writer(path) as archive:
+            archive.write(y)
+
+    def archive_writer(self, path):
+        """
+        Opens an archive for writing decoded audio block by block (same format as save_archive).
+        
+        :param path: Destination .flac path.
+        :return: soundfile.SoundFile; call write(block) per block and close() at the end.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return sf.SoundFile(path, 'w', samplerate=self.sample_rate, channels=1, subtype='PCM_16', format='FLAC',
+                            compression_level=1.0)
+
     def get_spectrogram(self, y):
         """
         Generates a spectrogram from the audio time series.
@@ -41,11 +221,8 @@ class AudioProcessor:
         """
         # n_fft is the window size
         # hop_length is the step size
-        window_size = 4096
-        step_size = 2048
-        
         # Perform STFT
-        STFT = librosa.stft(y, n_fft=window_size, hop_length=step_size)
+        STFT = librosa.stft(y, n_fft=self.window_size, hop_length=self.step_size)
         
         # Convert to magnitude (ignoring phase for now, as we just want peaks)
         spectrogram = np.abs(STFT)
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Auto-Index Job Queue
+SQLite-backed queue of "find this song on YouTube and index it" requests.
+Jobs are deduplicated by normalized title/artist, retried with exponential backoff,
+and drained by a worker pool with a fixed concurrency cap.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import threading
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, '..', 'Core'))
+
+import metrics
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Worker row claim_spawn records until the spawned pool sends its first heartbeat
+SPAWN_PLACEHOLDER = "spawn-pending"
+
+
+def normalize_key(title, artist):
+    """
+    Normalize title/artist into a dedup key so that
+    "Song (Official Video)" by "ARTIST" and "song" by "Artist" collapse together.
+    """
+    def clean(text):
+        text = re.sub(r'[\(\[].*?[\)\]]', '', text or '')
+        text = re.sub(r'\b(official|video|audio|lyrics?|hd|4k|1080p)\b', '', text, flags=re.IGNORECASE)
+        text = re.sub(r'[^\w]+', ' ', text.lower())
+        return ' '.join(text.split())
+    return f"{clean(title)}|{clean(artist)}"
+
+
+def default_queue_path(db_path=None):
+    """The queue lives next to the songs database unless configured otherwise."""
+    if os.environ.get('INDEX_QUEUE_DB'):
+        return os.environ['INDEX_QUEUE_DB']
+    if db_path is None:
+        db_path = os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'index_queue.db')
+
+
+class IndexQueue:
+    def __init__(self, queue_path, max_attempts=5, backoff_base=30, backoff_max=3600, heartbeat_timeout=60):
+        """
+        Initialize the queue.
+
+        Args:
+            queue_path: Path to the SQLite queue file
+            max_attempts: Attempts before a job is marked failed
+            backoff_base: Delay in seconds before the first retry (doubles each attempt)
+            backoff_max: Upper bound for the retry delay in seconds
+            heartbeat_timeout: Seconds without a heartbeat before a worker is considered dead
+        """
+        self.queue_path = queue_path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.heartbeat_timeout = heartbeat_timeout
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None so we control transactions explicitly (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.queue_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        """Initialize the queue schema."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS index_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dedup_key TEXT UNIQUE,
+                title TEXT,
+                artist TEXT,
+                genre TEXT,
+                query TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_run_at REAL,
+                worker_id TEXT,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL,
+                updated_at REAL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON index_jobs (status, next_run_at)')
+
+        # Live worker pools (used to recover jobs from crashed workers and to avoid double-spawning)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS index_workers (
+                worker_id TEXT PRIMARY KEY,
+                pid INTEGER,
+                heartbeat_at REAL
+            )
+        ''')
+        conn.close()
+
+    def enqueue(self, title, artist, genre="Unknown", query=None):
+        """
+        Add an index request unless an equivalent one is already queued, running or done.
+        A previously failed request is reset and retried.
+
+        Returns: (job_id, created)
+        """
+        key = normalize_key(title, artist)
+        query = query or f"{title} {artist} official audio"
+        now = time.time()
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id, status FROM index_jobs WHERE dedup_key = ?", (key,)).fetchone()
+            if row is None:
+                cursor = conn.execute('''
+                    INSERT INTO index_jobs (dedup_key, title, artist, genre, query, status, attempts, next_run_at, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)
+                ''', (key, title, artist, genre, query, PENDING, now, now, now))
+                conn.execute("COMMIT")
+                return cursor.lastrowid, True
+
+            if row["status"] == FAILED:
+                conn.execute('''
+                    UPDATE index_jobs SET status = ?, attempts = 0, next_run_at = ?, last_error = NULL, updated_at = ?
+                    WHERE id = ?
+                ''', (PENDING, now, now, row["id"]))
+                conn.execute("COMMIT")
+                return row["id"], True
+
+            conn.execute("COMMIT")
+            return row["id"], False
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, worker_id):
+        """
+        Atomically take the next due job and mark it running.
+
+        Returns: Job dict, or None if nothing is due
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute('''
+                SELECT * FROM index_jobs WHERE status = ? AND next_run_at <= ?
+                ORDER BY next_run_at, id LIMIT 1
+            ''', (PENDING, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute('''
+                UPDATE index_jobs SET status = ?, worker_id = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            ''', (RUNNING, worker_id, now, row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        job = dict(row)
+        job["status"] = RUNNING
+        job["attempts"] += 1
+        job["worker_id"] = worker_id
+        return job
+
+    def complete(self, job_id, result=None):
+        """Mark a job as done."""
+        conn = self._connect()
+        conn.execute("UPDATE index_jobs SET status = ?, result = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                     (DONE, json.dumps(result) if result is not None else None, time.time(), job_id))
+        conn.close()
+
+    def fail(self, job_id, error):
+        """
+        Record a failed attempt. The job is rescheduled with exponential backoff,
+        or marked failed once max_attempts is reached.
+
+        Returns: The new job status
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT attempts FROM index_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            attempts = row["attempts"]
+            if attempts >= self.max_attempts:
+                status, next_run = FAILED, None
+            else:
+                status = PENDING
+                next_run = now + min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+            conn.execute('''
+                UPDATE index_jobs SET status = ?, next_run_at = ?, last_error = ?, worker_id = NULL, updated_at = ?
+                WHERE id = ?
+            ''', (status, next_run, str(error), now, job_id))
+            conn.execute("COMMIT")
+            return status
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get_job(self, job_id):
+        """Returns the job dict for job_id, or None."""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM index_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def find_job(self, title, artist):
+        """Returns the job dict for a title/artist pair, or None."""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM index_jobs WHERE dedup_key = ?", (normalize_key(title, artist),)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def stats(self):
+        """Returns dict of job counts per status plus the number of live workers."""
+        conn = self._connect()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM index_jobs GROUP BY status"):
+            counts[status] = count
+        counts["workers"] = conn.execute("SELECT COUNT(*) FROM index_workers WHERE heartbeat_at > ?",
+                                         (time.time() - self.heartbeat_timeout,)).fetchone()[0]
+        conn.close()
+        return counts
+
+    def heartbeat(self, worker_id):
+        """Register or refresh a live worker pool."""
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO index_workers (worker_id, pid, heartbeat_at) VALUES (?, ?, ?)",
+                     (worker_id, os.getpid(), time.time()))
+        conn.close()
+
+    def unregister(self, worker_id):
+        """Remove a worker pool that is shutting down cleanly."""
+        conn = self._connect()
+        conn.execute("DELETE FROM index_workers WHERE worker_id = ?", (worker_id,))
+        conn.close()
+
+    def unregister_if_idle(self, worker_id):
+        """
+        Remove a worker pool only if no job is pending, checked in the same transaction.
+        A job enqueued afterwards sees no live pool, so its ensure_worker starts a new one.
+
+        Returns: True if unregistered, False if pending jobs remain for this pool
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            pending = conn.execute("SELECT COUNT(*) FROM index_jobs WHERE status = ?", (PENDING,)).fetchone()[0]
+            if not pending:
+                conn.execute("DELETE FROM index_workers WHERE worker_id = ?", (worker_id,))
+            conn.execute("COMMIT")
+            return not pending
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def requeue_stale(self):
+        """
+        Put jobs back to pending if the worker that claimed them is gone (crash or restart).
+
+        Returns: Number of requeued jobs
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM index_workers WHERE heartbeat_at <= ?", (now - self.heartbeat_timeout,))
+            cursor = conn.execute('''
+                UPDATE index_jobs SET status = ?, next_run_at = ?, worker_id = NULL, updated_at = ?
+                WHERE status = ? AND (worker_id IS NULL OR worker_id NOT IN (SELECT worker_id FROM index_workers))
+            ''', (PENDING, now, now, RUNNING))
+            conn.execute("COMMIT")
+            return cursor.rowcount
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim_spawn(self, grace=30):
+        """
+        Decide whether the caller should start a worker pool.
+        Returns True (and records a placeholder heartbeat) only if no pool is alive
+        and no other process started one within the last `grace` seconds.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            alive = conn.execute("SELECT COUNT(*) FROM index_workers WHERE heartbeat_at > ?",
+                                 (now - max(grace, self.heartbeat_timeout),)).fetchone()[0]
+            if alive:
+                conn.execute("COMMIT")
+                return False
+            conn.execute("INSERT OR REPLACE INTO index_workers (worker_id, pid, heartbeat_at) VALUES (?, ?, ?)",
+                         (SPAWN_PLACEHOLDER, os.getpid(), now))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+def _default_indexer_factory(db_path, cookies):
+    from youtube_indexer import YouTubeIndexer
+    return lambda: YouTubeIndexer(db_path=db_path, cookies=cookies)
+
+
+class IndexWorkerPool:
+    def __init__(self, queue, concurrency=2, db_path=None, cookies=None, indexer_factory=None, poll_interval=2.0):
+        """
+        Drains the queue with at most `concurrency` indexers running at once.
+
+        Args:
+            queue: IndexQueue instance
+            concurrency: Number of worker threads (each owns one YouTubeIndexer)
+            db_path: Songs database path passed to the indexers
+            cookies: Optional cookies.txt passed to the indexers
+            indexer_factory: Callable returning an object with index_search(query, limit, genre)
+            poll_interval: Seconds to sleep when no job is due
+        """
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.indexer_factory = indexer_factory or _default_indexer_factory(db_path, cookies)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _work(self, exit_when_idle):
+        indexer = self.indexer_factory()
+        while not self._stop.is_set():
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                with self._lock:
+                    idle = self._active == 0
+                if exit_when_idle and idle and self.queue.stats()[PENDING] == 0:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+
+            with self._lock:
+                self._active += 1
+            try:
+                print(f"[*] Job {job['id']}: indexing '{job['title']}' by {job['artist']} (attempt {job['attempts']})", file=sys.stderr)
+                indexed = indexer.index_search(job["query"], limit=1, genre=job["genre"])
+                # index_search reports download errors and empty results by indexing nothing;
+                # only a song that is already in the library counts as done without indexing
+                search = getattr(indexer, 'last_search', None) or {}
+                if not indexed and not search.get("skipped"):
+                    raise RuntimeError(f"Nothing indexed for '{job['query']}' "
+                                       f"({search.get('results', 0)} results, {search.get('failed', 0)} failed)")
+                self.queue.complete(job["id"], {"indexed": indexed, "skipped": search.get("skipped", 0)})
+                metrics.inc("index_jobs_total", result="done")
+            except Exception as e:
+                status = self.queue.fail(job["id"], e)
+                metrics.inc("index_jobs_total", result="retry" if status == PENDING else "failed")
+                print(f"[!] Job {job['id']} failed ({status}): {e}", file=sys.stderr)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+    def run(self, exit_when_idle=False):
+        """Run the pool until stopped (or until the queue is empty, with exit_when_idle)."""
+        self.queue.heartbeat(self.worker_id)
+        # This pool is registered now, so the spawner's placeholder must not keep later
+        # discoveries from starting a pool once this one exits
+        self.queue.unregister(SPAWN_PLACEHOLDER)
+        self.queue.requeue_stale()
+
+        try:
+            while True:
+                threads = [threading.Thread(target=self._work, args=(exit_when_idle,), daemon=True)
+                           for _ in range(self.concurrency)]
+                for t in threads:
+                    t.start()
+                while any(t.is_alive() for t in threads):
+                    self.queue.heartbeat(self.worker_id)
+                    for t in threads:
+                        t.join(timeout=min(5.0, self.queue.heartbeat_timeout / 3))
+                if not exit_when_idle or self._stop.is_set() or self.queue.unregister_if_idle(self.worker_id):
+                    break
+                # Jobs were enqueued while the pool was winding down: keep draining
+        except KeyboardInterrupt:
+            self._stop.set()
+        finally:
+            self.queue.unregister(self.worker_id)
+
+    def stop(self):
+        self._stop.set()
+
+
+def ensure_worker(queue_path, db_path=None, concurrency=2):
+    """
+    Start a detached worker pool that exits once the queue is drained,
+    unless one is already running. At most one pool runs per queue file.
+    """
+    queue = IndexQueue(queue_path)
+    if not queue.claim_spawn():
+        return False
+    cmd = [sys.executable, os.path.abspath(__file__), '--queue-db', queue_path,
+           'work', '--concurrency', str(concurrency), '--exit-when-idle']
+    if db_path:
+        cmd[2:2] = ['--db', db_path]
+    subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Viltrumite auto-index job queue")
+    parser.add_argument('--db', help='Songs database path')
+    parser.add_argument('--queue-db', help='Queue database path (default: next to the songs database)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_p = sub.add_parser('enqueue', help='Queue a song for indexing')
+    enqueue_p.add_argument('--title', required=True)
+    enqueue_p.add_argument('--artist', required=True)
+    enqueue_p.add_argument('--genre', default='Unknown')
+
+    status_p = sub.add_parser('status', help='Show queue counts or a single job')
+    status_p.add_argument('--job', type=int, help='Job id')
+
+    work_p = sub.add_parser('work', help='Run a worker pool')
+    work_p.add_argument('--concurrency', type=int, default=2, help='Max indexers running at once (default: 2)')
+    work_p.add_argument('--exit-when-idle', action='store_true', help='Exit once no jobs are pending')
+    work_p.add_argument('--cookies', help='Path to cookies.txt file')
+
+    args = parser.parse_args()
+    queue = IndexQueue(args.queue_db or default_queue_path(args.db))
+
+    if args.command == 'enqueue':
+        job_id, created = queue.enqueue(args.title, args.artist, genre=args.genre)
+        print(json.dumps({"job_id": job_id, "created": created}))
+    elif args.command == 'status':
+        print(json.dumps(queue.get_job(args.job) if args.job else queue.stats(), indent=2))
+    elif args.command == 'work':
+        # Long-running: flush metrics periodically, not only at exit
+        metrics.configure(metrics.default_metrics_path(args.db or os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')),
+                          flush_interval=15)
+        pool = IndexWorkerPool(queue, concurrency=args.concurrency, db_path=args.db, cookies=args.cookies)
+        pool.run(exit_when_idle=args.exit_when_idle)
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Pipelined Ingestion Engine
+Overlaps the three ingestion stages instead of running them song by song:
+  fetch (thread pool, network-bound) -> fingerprint (process pool, CPU-bound) -> write (single batched DB writer)
+Stages are connected by bounded queues so a slow stage applies back-pressure
+instead of letting downloads pile up on disk.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, '..', 'Core'))
+sys.path.append(os.path.join(current_dir, '..', 'Preprocessing'))
+
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter, fingerprint_config, config_version
+from stream_fingerprinter import StreamingFingerprinter
+from fingerprint_batch import FingerprintBatch
+from database import LEDGER_DONE, LEDGER_FAILED, LEDGER_DUPLICATE
+import metrics
+
+# Per-process fingerprinting components (created once per worker by _init_worker)
+_processor = None
+_fingerprinter = None
+
+
+def _init_worker(config):
+    global _processor, _fingerprinter
+    _processor = AudioProcessor.from_config(config)
+    _fingerprinter = Fingerprinter.from_config(config)
+
+
+def archive_path(archive_dir, file_hash):
+    """Where the decoded audio of a song is archived (named after its file hash)"""
+    name = hashlib.sha1(str(file_hash).encode('utf-8')).hexdigest()
+    return os.path.join(os.path.abspath(archive_dir), name[:2], f"{name}.flac")
+
+
+def active_components(db):
+    """
+    Components producing the database's active fingerprint version (defaults if unversioned).
+    Returns: (AudioProcessor, Fingerprinter)
+    """
+    _, config = db.get_active_fingerprint_version()
+    config = config or {}
+    return AudioProcessor.from_config(config), Fingerprinter.from_config(config)
+
+
+def check_fingerprint_version(db, processor, fingerprinter):
+    """
+    Refuse to mix fingerprints from different parameter sets in one table, and bring the
+    duplicate-detection index up to date before songs are written.
+    Raises RuntimeError if the database's active version differs from this configuration.
+    """
+    config = fingerprint_config(processor, fingerprinter)
+    version = config_version(config)
+    if not db.ensure_fingerprint_version(version, config):
+        active, _ = db.get_active_fingerprint_version()
+        raise RuntimeError(f"Database fingerprints are version {active} but this indexer produces {version}; "
+                           f"run refingerprint.py or use matching parameters")
+    # Duplicate checks use the MinHash index once songs stored before it existed are signed
+    signed = db.migrate_minhash()
+    if signed:
+        print(f"[*] Signed {signed} existing songs for audio duplicate detection")
+    return version
+
+
+def fingerprint_stream(processor, fingerprinter, blocks, archive_to=None):
+    """
+    Fingerprint decoded audio as it arrives: each block is archived (optionally) and fed to a
+    StreamingFingerprinter before the next one is read, so neither the song's samples nor its
+    spectrogram are ever held at once.
+    Returns: (hashes, (archive_path, sample_rate) or None); raises RuntimeError if no audio arrives
+    """
+    stream = StreamingFingerprinter.from_processor(processor, fingerprinter)
+    archive = processor.archive_writer(archive_to) if archive_to else None
+    batches = []
+    try:
+        for block in blocks:
+            if archive is not None:
+                archive.write(block)
+            batches.append(stream.feed(block))
+        if not batches:
+            raise RuntimeError("No audio decoded")
+        batches.append(stream.finish())
+    except Exception:
+        if archive is not None:
+            archive.close()
+            os.remove(archive_to)
+        raise
+    if archive is None:
+        return FingerprintBatch.concatenate(batches), None
+    archive.close()
+    return FingerprintBatch.concatenate(batches), (archive_to, processor.sample_rate)
+
+
+def _fingerprint_encoded(data, decoder=None, archive_to=None):
+    """
+    Worker: decode a download held in memory (still encoded) through the decoder pipe and
+    fingerprint the PCM block by block, so decoded audio never crosses the process boundary.
+    Returns: Same tuple as _fingerprint_file
+    """
+    start = time.perf_counter()
+    try:
+        blocks = _processor.decode_stream([data], command=decoder)
+        hashes, archived = fingerprint_stream(_processor, _fingerprinter, blocks, archive_to)
+        return hashes, time.perf_counter() - start, None, archived
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e), None
+
+
+def _fingerprint_file(path, archive_to=None):
+    """
+    Worker: decode and fingerprint one audio file, optionally archiving the decoded audio.
+    Returns: (hashes or None, busy_seconds, error, (archive_path, sample_rate) or None)
+    """
+    start = time.perf_counter()
+    try:
+        y, sr = _processor.load_audio(path)
+        if y is None:
+            return None, time.perf_counter() - start, "Failed to load audio file", None
+        archived = None
+        if archive_to:
+            _processor.save_archive(y, archive_to)
+            archived = (archive_to, sr)
+        spec = _processor.get_spectrogram(y)
+        peaks = _fingerprinter.get_2d_peaks(spec)
+        hashes = _fingerprinter.generate_hashes(peaks)
+        return hashes, time.perf_counter() - start, None, archived
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e), None
+
+
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.done = 0
+        self.failed = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ok, seconds):
+        with self._lock:
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+            self.busy += seconds
+
+    def summary(self, elapsed):
+        return {
+            "done": self.done,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy, 2),
+            "items_per_second": round(self.done / elapsed, 3) if elapsed > 0 else 0,
+            # Fraction of the stage's worker capacity that was kept busy
+            "utilization": round(self.busy / (elapsed * self.workers), 3) if elapsed > 0 else 0
+        }
+
+
+class IngestionPipeline:
+    def __init__(self, db, fetch, is_duplicate=None, fetch_workers=4, fingerprint_workers=None,
+                 queue_size=8, write_batch=8, on_status=None, archive_dir=None):
+        """
+        Args:
+            db: DatabaseHandler that receives the songs
+            fetch: Callable(item) -> dict with path, title, artist, url, thumbnail, file_hash
+                   and temporary (delete the file after fingerprinting), or None on failure.
+                   Instead of a path it may carry encoded: the downloaded file's bytes (and
+                   optionally decoder, a command as for AudioProcessor.decode_stream), decoded
+                   and fingerprinted as a stream in the same pool
+            is_duplicate: Optional callable(title, artist, hashes) -> (is_dup, reason)
+            fetch_workers: Threads running fetch concurrently
+            fingerprint_workers: Processes decoding and fingerprinting (default: CPU count)
+            queue_size: Capacity of each inter-stage queue
+            write_batch: Songs written per DB transaction
+            on_status: Optional callable(item, status, song_id=None, detail=None) called with the
+                       final ledger status (LEDGER_DONE/FAILED/DUPLICATE) of every item
+            archive_dir: Optional directory where decoded audio is archived for re-fingerprinting
+        """
+        self.db = db
+        self.fetch = fetch
+        self.is_duplicate = is_duplicate
+        self.fetch_workers = max(1, fetch_workers)
+        self.fingerprint_workers = fingerprint_workers or os.cpu_count() or 1
+        self.queue_size = max(1, queue_size)
+        self.write_batch = max(1, write_batch)
+        self.on_status = on_status
+        self.archive_dir = archive_dir
+
+    def _report(self, item, status, song_id=None, detail=None):
+        if self.on_status:
+            try:
+                self.on_status(item, status, song_id=song_id, detail=detail)
+            except Exception as e:
+                print(f"[!] Could not record status for {item}: {e}")
+
+    def _fail(self, song, stage, error, failures):
+        """Record a song that dropped out of the pipeline at `stage`"""
+        failures.append({"item": song.get('url') or song.get('path') or song['item'], "stage": stage, "error": str(error)})
+        print(f"[!] {stage.capitalize()} failed: {song['title']} ({error})")
+        self._report(song['item'], LEDGER_FAILED, detail=str(error))
+
+    def _drain(self, source, stage, error, failures):
+        """After a stage crashed: fail everything still arriving so upstream stages never block on put()"""
+        while True:
+            song = source.get()
+            if song is None:
+                return
+            self._fail(song, stage, error, failures)
+            if song.get('temporary') and song.get('path') and os.path.exists(song['path']):
+                os.remove(song['path'])
+
+    def _fetch_loop(self, items, fetched, stats, failures):
+        while True:
+            try:
+                item = items.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            try:
+                song = self.fetch(item)
+                error = None if song else "Fetch failed"
+            except Exception as e:
+                song, error = None, str(e)
+            stats.record(song is not None, time.perf_counter() - start)
+            if song is None:
+                failures.append({"item": item, "stage": "fetch", "error": error})
+                print(f"[!] Fetch failed: {item} ({error})")
+                self._report(item, LEDGER_FAILED, detail=error)
+                continue
+            song['item'] = item
+            fetched.put(song)
+
+    def _fingerprint_loop(self, fetched, fingerprinted, pool, stats, failures):
+        in_flight = {}
+        exhausted = False
+        max_in_flight = self.fingerprint_workers + self.queue_size
+
+        try:
+            while not exhausted or in_flight:
+                # Keep every fingerprint process busy without holding more than the queue bound
+                while not exhausted and len(in_flight) < max_in_flight:
+                    try:
+                        song = fetched.get(timeout=0.05 if in_flight else None)
+                    except queue.Empty:
+                        break
+                    if song is None:
+                        exhausted = True
+                        break
+                    archive_to = archive_path(self.archive_dir, song['file_hash']) if self.archive_dir else None
+                    try:
+                        if 'encoded' in song:
+                            # Download kept in memory: only the compressed bytes go to the worker
+                            future = pool.submit(_fingerprint_encoded, song.pop('encoded'), song.get('decoder'),
+                                                 archive_to)
+                        else:
+                            future = pool.submit(_fingerprint_file, song['path'], archive_to)
+                        in_flight[future] = song
+                    except Exception as e:
+                        # e.g. BrokenProcessPool: every later submit fails the same way
+                        stats.record(False, 0.0)
+                        self._fail(song, "fingerprinting", e, failures)
+                        if song.get('temporary') and os.path.exists(song['path']):
+                            os.remove(song['path'])
+
+                if not in_flight:
+                    continue
+                done, _ = wait(list(in_flight), timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    song = in_flight.pop(future)
+                    try:
+                        hashes, busy, error, archived = future.result()
+                    except Exception as e:
+                        hashes, busy, error, archived = None, 0.0, str(e), None
+                    finally:
+                        if song.get('temporary') and os.path.exists(song['path']):
+                            os.remove(song['path'])
+
+                    stats.record(hashes is not None, busy)
+                    metrics.observe("ingest_fingerprint_seconds", busy)
+                    if hashes is None:
+                        self._fail(song, "fingerprinting", error, failures)
+                        continue
+                    song['fingerprints'] = hashes
+                    song['archive'] = archived
+                    fingerprinted.put(song)
+        except Exception as e:
+            print(f"[!] Fingerprint stage stopped: {e}")
+            for song in in_flight.values():
+                self._fail(song, "fingerprinting", e, failures)
+            if not exhausted:
+                self._drain(fetched, "fingerprinting", e, failures)
+        finally:
+            fingerprinted.put(None)
+
+    def _flush(self, batch, stats, results, failures):
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            song_ids = self.db.add_songs_batch(batch)
+        except Exception as e:
+            # The batch is one transaction, so none of its songs were written
+            for song in batch:
+                stats.record(False, 0.0)
+                self._fail(song, "write", e, failures)
+            batch.clear()
+            return
+        per_song = (time.perf_counter() - start) / len(batch)
+        for song, song_id in zip(batch, song_ids):
+            stats.record(True, per_song)
+            if song_id:
+                results["indexed"] += 1
+                print(f"  ✓ Indexed! {song['title']} (ID: {song_id}, Hashes: {len(song['fingerprints'])})")
+                self._report(song['item'], LEDGER_DONE, song_id=song_id)
+            else:
+                results["skipped"] += 1
+                print(f"[-] Skipped: {song['title']} (already in database)")
+                self._report(song['item'], LEDGER_DUPLICATE, detail="Already in database")
+        batch.clear()
+
+    def _write_loop(self, fingerprinted, stats, results, total, failures):
+        batch = []
+        pending_keys = set()
+        finished = False
+        try:
+            while True:
+                try:
+                    song = fingerprinted.get(timeout=1.0)
+                except queue.Empty:
+                    # Nothing new for a while: commit what we have so progress is visible
+                    self._flush(batch, stats, results, failures)
+                    pending_keys.clear()
+                    continue
+                if song is None:
+                    finished = True
+                    break
+
+                results["processed"] += 1
+                print(f"[{results['processed']}/{total}] {song['title']}")
+
+                # Duplicates of songs already in the DB, or of songs waiting in this batch
+                key = (song['title'].strip().lower(), song['artist'].strip().lower())
+                dup, reason = (False, None)
+                try:
+                    if key in pending_keys:
+                        dup, reason = True, "Duplicate within batch"
+                    elif self.is_duplicate:
+                        dup, reason = self.is_duplicate(song['title'], song['artist'], song['fingerprints'])
+                except Exception as e:
+                    stats.record(False, 0.0)
+                    self._fail(song, "write", f"Duplicate check failed: {e}", failures)
+                    continue
+                if dup:
+                    results["skipped"] += 1
+                    print(f"[-] Skipped: {reason}")
+                    self._report(song['item'], LEDGER_DUPLICATE, detail=reason)
+                    continue
+
+                pending_keys.add(key)
+                batch.append(song)
+                if len(batch) >= self.write_batch:
+                    self._flush(batch, stats, results, failures)
+                    pending_keys.clear()
+
+            self._flush(batch, stats, results, failures)
+        except Exception as e:
+            print(f"[!] Write stage stopped: {e}")
+            for song in batch:
+                self._fail(song, "write", e, failures)
+            if not finished:
+                self._drain(fingerprinted, "write", e, failures)
+
+    def run(self, items):
+        """
+        Ingest every item (URL, path, ...) accepted by the fetch callable.
+
+        Returns: Summary dict with counts, per-stage throughput and failures
+        """
+        processor, fingerprinter = active_components(self.db)
+        check_fingerprint_version(self.db, processor, fingerprinter)
+        config = fingerprint_config(processor, fingerprinter)
+
+        items = list(items)
+        work = queue.Queue()
+        for item in items:
+            work.put(item)
+        fetched = queue.Queue(maxsize=self.queue_size)
+        fingerprinted = queue.Queue(maxsize=self.queue_size)
+
+        stats = {
+            "fetch": StageStats("fetch", self.fetch_workers),
+            "fingerprint": StageStats("fingerprint", self.fingerprint_workers),
+            "write": StageStats("write", 1)
+        }
+        failures = []
+        results = {"processed": 0, "indexed": 0, "skipped": 0}
+        start = time.perf_counter()
+
+        print(f"[*] Pipeline: {len(items)} items, {self.fetch_workers} fetchers, "
+              f"{self.fingerprint_workers} fingerprint processes")
+
+        # Spawned (not forked) workers: the parent already runs threads
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.fingerprint_workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(config,)) as pool:
+            fetchers = [threading.Thread(target=self._fetch_loop, args=(work, fetched, stats["fetch"], failures), daemon=True)
+                        for _ in range(min(self.fetch_workers, max(1, len(items))))]
+            fingerprinter = threading.Thread(target=self._fingerprint_loop,
+                                             args=(fetched, fingerprinted, pool, stats["fingerprint"], failures), daemon=True)
+            writer = threading.Thread(target=self._write_loop,
+                                      args=(fingerprinted, stats["write"], results, len(items), failures), daemon=True)
+
+            for t in fetchers + [fingerprinter, writer]:
+                t.start()
+            for t in fetchers:
+                t.join()
+            fetched.put(None)
+            fingerprinter.join()
+            writer.join()
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "total": len(items),
+            "indexed": results["indexed"],
+            "skipped": results["skipped"],
+            "failed": len(failures),
+            "elapsed_seconds": round(elapsed, 2),
+            "songs_per_second": round(results["indexed"] / elapsed, 3) if elapsed > 0 else 0,
+            "stages": {name: s.summary(elapsed) for name, s in stats.items()},
+            "failures": failures
+        }
+
+        print(f"\n[!] Done! Indexed {summary['indexed']}/{summary['total']} songs in {summary['elapsed_seconds']}s "
+              f"(skipped {summary['skipped']}, failed {summary['failed']})")
+        for name, s in summary["stages"].items():
+            print(f"    {name:<12} {s['done']:>5} ok  {s['failed']:>4} failed  "
+                  f"{s['items_per_second']:>7.2f}/s  utilization {s['utilization']:.0%}")
+        return summary
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Local Directory Indexer
+Bulk-loads a library from local audio files, fully offline.
+Metadata comes from a sidecar manifest, then file tags, then the filename ("Artist - Title").
+Files whose content hash is already indexed are skipped before decoding.
+"""
+
+import os
+import sys
+import csv
+import json
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, '..', 'Core'))
+
+from database import DatabaseHandler
+from ingest_pipeline import IngestionPipeline
+import metrics
+
+try:
+    import mutagen
+except ImportError:  # Tags are optional; manifest and filenames still work
+    mutagen = None
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a', '.webm', '.mp4', '.flac', '.opus', '.aac')
+MANIFEST_NAMES = ('manifest.json', 'manifest.csv')
+
+
+def content_hash(path, block_size=1 << 20):
+    """SHA1 of the file contents (stored as songs.file_hash)"""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest(path):
+    """
+    Read a sidecar manifest mapping relative paths to metadata.
+    JSON: {"rel/path.mp3": {"title": ..., "artist": ..., "genre": ...}, ...} or a list of objects with "path".
+    CSV: header row with path,title,artist[,genre,thumbnail,url].
+
+    Returns: dict of normalized relative path -> metadata dict
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        rows = [dict(meta, path=p) for p, meta in data.items()] if isinstance(data, dict) else data
+    return {os.path.normpath(row['path']): {k: v for k, v in row.items() if k != 'path' and v} for row in rows}
+
+
+def read_tags(path):
+    """Returns title/artist/genre from file tags (empty dict if unavailable)"""
+    if mutagen is None:
+        return {}
+    try:
+        audio = mutagen.File(path, easy=True)
+    except Exception:
+        return {}
+    if not audio or not audio.tags:
+        return {}
+    tags = {}
+    for key in ('title', 'artist', 'genre'):
+        values = audio.tags.get(key)
+        if values:
+            tags[key] = values[0]
+    return tags
+
+
+class LocalIndexer:
+    def __init__(self, db_path=None, genre="Unknown", check_duplicates=False, workers=None,
+                 hash_workers=8, write_batch=64, archive_dir=None):
+        """
+        Args:
+            db_path: Songs database path
+            genre: Genre for files without one in manifest/tags
+            check_duplicates: Also run title/audio duplicate detection (slower; content hash dedup always runs)
+            workers: Fingerprinting processes (default: CPU count)
+            hash_workers: Threads hashing files and reading tags
+            write_batch: Songs written per DB transaction
+            archive_dir: Optional directory where decoded audio is archived for re-fingerprinting
+        """
+        if db_path is None:
+            db_path = os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')
+        self.db = DatabaseHandler(db_path)
+        self.genre = genre
+        self.check_duplicates = check_duplicates
+        self.workers = workers
+        self.hash_workers = hash_workers
+        self.write_batch = write_batch
+        self.archive_dir = archive_dir
+
+    def _is_duplicate(self, title, artist, fingerprints=None):
+        """Same checks as YouTubeIndexer.is_duplicate"""
+        similar = self.db.find_similar_title(title, artist, threshold=0.85)
+        if similar:
+            return True, f"Title Match ({similar[0][3]:.2f})"
+        if fingerprints:
+            is_dup, dup_id, ratio = self.db.check_fingerprint_similarity(fingerprints, threshold=0.6)
+            if is_dup:
+                return True, f"Audio Match ({ratio:.2%})"
+        return False, None
+
+    def _record(self, item, status, song_id=None, detail=None):
+        metrics.inc("ingest_items_total", source="local", status=status)
+
+    def scan(self, directory, manifest=None):
+        """
+        Collect audio files with metadata and content hashes.
+
+        Returns: List of song dicts ready for IngestionPipeline
+        """
+        if manifest is None:
+            for name in MANIFEST_NAMES:
+                candidate = os.path.join(directory, name)
+                if os.path.exists(candidate):
+                    manifest = candidate
+                    break
+        entries = load_manifest(manifest) if manifest else {}
+
+        paths = []
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        paths.sort()
+
+        def describe(path):
+            rel = os.path.normpath(os.path.relpath(path, directory))
+            meta = dict(read_tags(path))
+            meta.update(entries.get(rel, {}))
+            if 'title' not in meta:
+                stem = os.path.splitext(os.path.basename(path))[0]
+                if ' - ' in stem and 'artist' not in meta:
+                    meta['artist'], meta['title'] = [part.strip() for part in stem.split(' - ', 1)]
+                else:
+                    meta['title'] = stem
+            return {
+                "path": path,
+                "title": meta['title'],
+                "artist": meta.get('artist', 'Unknown'),
+                "genre": meta.get('genre', self.genre),
+                "thumbnail": meta.get('thumbnail'),
+                "url": meta.get('url'),
+                "file_hash": content_hash(path),
+                "temporary": False
+            }
+
+        with ThreadPoolExecutor(max_workers=self.hash_workers) as pool:
+            return list(pool.map(describe, paths))
+
+    def index_directory(self, directory, manifest=None):
+        """
+        Index every new audio file under directory.
+
+        Returns: Pipeline summary dict (plus "unchanged" count)
+        """
+        print(f"[*] Scanning: {directory}")
+        songs = self.scan(directory, manifest)
+
+        # Unchanged files (same content hash already indexed) are skipped before decoding,
+        # as are byte-identical copies within the directory
+        existing = self.db.get_existing_file_hashes(s['file_hash'] for s in songs)
+        seen = set(existing)
+        new_songs = []
+        for song in songs:
+            if song['file_hash'] not in seen:
+                seen.add(song['file_hash'])
+                new_songs.append(song)
+        unchanged = len(songs) - len(new_songs)
+        print(f"[*] Found {len(songs)} files, {unchanged} unchanged, {len(new_songs)} to index")
+        if not new_songs:
+            print("[!] Nothing to index.")
+            return {"total": 0, "indexed": 0, "skipped": 0, "failed": 0, "unchanged": unchanged}
+
+        # Building from scratch: load without the hash index and build it once at the end
+        # (audio duplicate checks need the index, so keep it when they are enabled)
+        from_scratch = not self.check_duplicates and not self.db.has_fingerprints()
+        if from_scratch:
+            self.db.drop_hash_index()
+
+        try:
+            pipeline = IngestionPipeline(
+                self.db,
+                fetch=lambda song: song,
+                is_duplicate=self._is_duplicate if self.check_duplicates else None,
+                fetch_workers=1,
+                fingerprint_workers=self.workers,
+                queue_size=max(8, (self.workers or os.cpu_count() or 1) * 2),
+                write_batch=self.write_batch,
+                archive_dir=self.archive_dir,
+                on_status=self._record
+            )
+            summary = pipeline.run(new_songs)
+        finally:
+            if from_scratch:
+                print("[*] Building hash index...")
+                self.db.create_hash_index()
+
+        summary["unchanged"] = unchanged
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a local directory of audio files (offline)")
+    parser.add_argument('directory', help='Directory containing audio files (searched recursively)')
+    parser.add_argument('--manifest', help='Sidecar manifest (JSON or CSV); default: manifest.json/csv in the directory')
+    parser.add_argument('--genre', default='Unknown', help='Genre for files without one')
+    parser.add_argument('--db', help='Custom database path')
+    parser.add_argument('--workers', type=int, help='Fingerprinting processes (default: CPU count)')
+    parser.add_argument('--batch', type=int, default=64, help='Songs per DB transaction (default: 64)')
+    parser.add_argument('--check-duplicates', action='store_true', help='Also run title/audio duplicate detection')
+    parser.add_argument('--archive-dir', help='Keep decoded audio here for later re-fingerprinting')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+
+    args = parser.parse_args()
+    if not os.path.isdir(args.directory):
+        print(f"Error: Directory not found: {args.directory}")
+        sys.exit(1)
+
+    metrics.configure(metrics.default_metrics_path(args.db or os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')))
+    indexer = LocalIndexer(db_path=args.db, genre=args.genre, check_duplicates=args.check_duplicates,
+                           workers=args.workers, write_batch=args.batch, archive_dir=args.archive_dir)
+    summary = indexer.index_directory(args.directory, manifest=args.manifest)
+    if args.json:
+        print(json.dumps(summary))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Re-fingerprinting
+Rebuilds the fingerprint index from archived decoded audio (see --archive-dir on the indexers)
+when the fingerprint parameters change, without downloading anything again.
+
+The new version is built in its own table next to the active one, so recognition keeps
+working during the rebuild. Runs are resumable: songs that already have fingerprints in
+the new version are skipped. Activation is a single transaction.
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.join(current_dir, '..', 'Core'))
+sys.path.append(os.path.join(current_dir, '..', 'Preprocessing'))
+
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter, PAIRING_MODES, fingerprint_config, config_version
+from database import DatabaseHandler
+
+# Per-process fingerprinting components (created once per worker by _init_worker)
+_processor = None
+_fingerprinter = None
+
+
+def _init_worker(processor_config, fingerprinter_config):
+    global _processor, _fingerprinter
+    _processor = AudioProcessor(**processor_config)
+    _fingerprinter = Fingerprinter(**fingerprinter_config)
+
+
+def _refingerprint(job):
+    """
+    Worker: fingerprint one archived song.
+    Returns: (song_id, hashes or None, error)
+    """
+    song_id, path = job
+    try:
+        if not os.path.exists(path):
+            return song_id, None, "Archive file missing"
+        y, sr = _processor.load_audio(path)
+        if y is None:
+            return song_id, None, "Failed to load archive"
+        spec = _processor.get_spectrogram(y)
+        peaks = _fingerprinter.get_2d_peaks(spec)
+        return song_id, _fingerprinter.generate_hashes(peaks), None
+    except Exception as e:
+        return song_id, None, str(e)
+
+
+class Refingerprinter:
+    def __init__(self, db_path=None, processor=None, fingerprinter=None, workers=None):
+        """
+        Args:
+            db_path: Songs database path
+            processor: AudioProcessor with the new spectrogram parameters (default: current defaults)
+            fingerprinter: Fingerprinter with the new peak/hash parameters (default: current defaults)
+            workers: Fingerprinting processes (default: CPU count)
+        """
+        if db_path is None:
+            db_path = os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')
+        self.db = DatabaseHandler(db_path)
+        self.processor = processor or AudioProcessor()
+        self.fingerprinter = fingerprinter or Fingerprinter()
+        self.workers = workers or os.cpu_count() or 1
+        self.config = fingerprint_config(self.processor, self.fingerprinter)
+        self.version = config_version(self.config)
+
+    def _pass(self, pool):
+        """Fingerprint every archived song missing from the new version. Returns (done, failed, missing)"""
+        archived, missing = self.db.get_songs_to_refingerprint(self.version)
+        done = failed = 0
+        for song_id, hashes, error in pool.map(_refingerprint, [(sid, path) for sid, path, _ in archived], chunksize=1):
+            if hashes is None:
+                failed += 1
+                print(f"[!] Song {song_id}: {error}")
+                continue
+            self.db.store_fingerprints(song_id, hashes, version=self.version)
+            done += 1
+            print(f"  ✓ Song {song_id} ({len(hashes)} hashes) [{done}/{len(archived)}]")
+        return done, failed, missing
+
+    def run(self, activate=False, force=False, drop_old=False):
+        """
+        Build (or resume building) the new version and optionally switch to it.
+
+        Args:
+            activate: Switch recognition and ingestion to the new version when complete
+            force: Activate even if some songs have no archive (they will not be recognizable)
+            drop_old: Delete the previously active version's table after activation
+
+        Returns: Summary dict
+        """
+        previous, _ = self.db.get_active_fingerprint_version()
+        if previous is None:
+            # Unversioned database: label the existing table so it can be retired like any other version
+            self.db.ensure_fingerprint_version("legacy", {})
+            previous = "legacy"
+        if previous == self.version:
+            print(f"[!] Version {self.version} is already active.")
+            return {"version": self.version, "refingerprinted": 0, "failed": 0, "missing_archive": [], "activated": False}
+
+        self.db.create_fingerprint_version(self.version, self.config)
+        print(f"[*] Building fingerprint version {self.version} (active: {previous or 'none'})")
+
+        start = time.perf_counter()
+        fp_config = {k: v for k, v in self.fingerprinter.config().items() if k != "hash_scheme"}
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.processor.config(), fp_config)) as pool:
+            done, failed, missing = self._pass(pool)
+            if activate:
+                # Catch up with songs ingested while the rebuild was running
+                caught_up, late_failed, missing = self._pass(pool)
+                done += caught_up
+                failed += late_failed
+
+        activated = False
+        if missing:
+            print(f"[!] {len(missing)} song(s) have no archived audio and need to be re-indexed from source")
+        if activate and (not missing or force):
+            self.db.activate_fingerprint_version(self.version)
+            activated = True
+            print(f"[*] Activated version {self.version}")
+            if drop_old and previous:
+                self.db.drop_fingerprint_version(previous)
+                print(f"[*] Dropped version {previous}")
+        elif activate:
+            print("[!] Not activating: use --force to activate without the songs listed above")
+
+        elapsed = time.perf_counter() - start
+        print(f"\n[!] Done! Re-fingerprinted {done} song(s) in {elapsed:.1f}s (failed {failed})")
+        return {"version": self.version, "refingerprinted": done, "failed": failed,
+                "missing_archive": missing, "activated": activated}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild fingerprints from archived audio after a parameter change")
+    parser.add_argument('--db', help='Custom database path')
+    parser.add_argument('--workers', type=int, help='Fingerprinting processes (default: CPU count)')
+    parser.add_argument('--activate', action='store_true', help='Switch to the new version once it is complete')
+    parser.add_argument('--force', action='store_true', help='Activate even if some songs have no archive')
+    parser.add_argument('--drop-old', action='store_true', help='Delete the previous version after activation')
+    parser.add_argument('--status', action='store_true', help='List fingerprint versions and exit')
+
+    # New parameters (defaults: the values in AudioProcessor/Fingerprinter)
+    defaults = fingerprint_config(AudioProcessor(), Fingerprinter())
+    for key in ('sample_rate', 'window_size', 'step_size', 'fan_value', 'amp_min', 'neighborhood_size', 'max_time_delta'):
+        parser.add_argument('--' + key.replace('_', '-'), type=int, default=defaults[key],
+                            help=f'(default: {defaults[key]})')
+    zone_defaults = Fingerprinter(pairing="zone").config()
+    parser.add_argument('--pairing', choices=PAIRING_MODES, default='fan', help='Peak pairing mode (default: fan)')
+    for key in ('zone_min_dt', 'zone_max_dt', 'zone_df'):
+        parser.add_argument('--' + key.replace('_', '-'), type=int, default=zone_defaults[key],
+                            help=f'Target zone, --pairing zone only (default: {zone_defaults[key]})')
+    parser.add_argument('--peak-budget', type=int, help='Keep at most this many peaks per time slice and band (default: no cap)')
+    parser.add_argument('--slice-frames', type=int, default=10, help='Time slice of the peak budget in frames (default: 10)')
+    parser.add_argument('--freq-bands', type=int, default=4, help='Frequency bands of the peak budget (default: 4)')
+
+    args = parser.parse_args()
+    processor = AudioProcessor(sample_rate=args.sample_rate, window_size=args.window_size, step_size=args.step_size)
+    fingerprinter = Fingerprinter(fan_value=args.fan_value, amp_min=args.amp_min,
+                                  neighborhood_size=args.neighborhood_size, max_time_delta=args.max_time_delta,
+                                  pairing=args.pairing, zone_min_dt=args.zone_min_dt, zone_max_dt=args.zone_max_dt,
+                                  zone_df=args.zone_df, peak_budget=args.peak_budget,
+                                  slice_frames=args.slice_frames, freq_bands=args.freq_bands)
+    refingerprinter = Refingerprinter(db_path=args.db, processor=processor, fingerprinter=fingerprinter, workers=args.workers)
+
+    if args.status:
+        for version, status, table, count, config in refingerprinter.db.list_fingerprint_versions():
+            print(f"{version}  {status:<8} {count:>10} fingerprints  {table}")
+        sys.exit(0)
+
+    refingerprinter.run(activate=args.activate, force=args.force, drop_old=args.drop_old)
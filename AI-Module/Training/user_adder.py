@@ -2,7 +2,6 @@
 import os
 import sys
 import argparse
-import subprocess
 import json
 from pathlib import Path
 
@@ -12,44 +11,19 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'Core'))
 from youtube_indexer import YouTubeIndexer
 from database import DatabaseHandler
 
-def get_video_info(url):
-    """Get video duration and validation check using yt-dlp"""
+def get_video_info(indexer, url):
+    """
+    Get video title/duration for validation with a single in-process extraction.
+    The returned info is reused for the download, so the URL is only extracted once.
+    """
     try:
-        cmd = [
-            'yt-dlp',
-            '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            '--add-header', 'Accept-Language: en-US,en;q=0.9',
-            '--get-duration',
-            '--get-title',
-            '--simulate',
-            '--no-playlist',
-            url
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            return None, None
-        
-        lines = result.stdout.strip().split('\n')
-        if not lines:
-            return None, None
-            
-        title = lines[0]
-        duration_str = lines[-1] # Usually the last line
-        
-        # Convert duration to seconds
-        parts = duration_str.split(':')
-        seconds = 0
-        if len(parts) == 3: # H:M:S
-            seconds = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-        elif len(parts) == 2: # M:S
-            seconds = int(parts[0]) * 60 + int(parts[1])
-        elif len(parts) == 1: # S
-            seconds = int(parts[0])
-            
-        return title, seconds
+        info = indexer.extract_info(url)
+        if not info or info.get('duration') is None:
+            return None, None, None
+        return info.get('title'), int(info['duration']), info
     except Exception as e:
         print(f"Error validating URL: {e}", file=sys.stderr)
-        return None, None
+        return None, None, None
 
 def main():
     parser = argparse.ArgumentParser(description="Manually add a song from YouTube URL")
@@ -59,8 +33,11 @@ def main():
     
     args = parser.parse_args()
     
+    # Initialize indexer (its extractor is used for validation and download)
+    indexer = YouTubeIndexer(db_path=args.db)
+    
     print(f"[*] Validating URL: {args.url}")
-    title, duration = get_video_info(args.url)
+    title, duration, info = get_video_info(indexer, args.url)
     
     if duration is None:
         print(json.dumps({"success": False, "error": "Invalid YouTube URL or couldn't fetch info"}))
@@ -77,14 +54,12 @@ def main():
 
     print(f"[+] Validation passed: '{title}' ({duration}s)")
     
-    # Initialize indexer
-    indexer = YouTubeIndexer(db_path=args.db)
-    
     try:
         # Download, Fingerprint, Index
         success = indexer.process_and_index(
             args.url, 
-            genre=args.genre
+            genre=args.genre,
+            info=info
         )
         
         # indexer.cleanup_file is now handled internally in process_and_index
@@ -92,8 +67,8 @@ def main():
         if success:
             print(json.dumps({
                 "success": True, 
-                "message": f"Successfully added '{d_title or title}' to Viltrumite library!",
-                "title": d_title or title
+                "message": f"Successfully added '{title}' to Viltrumite library!",
+                "title": title
             }))
         else:
             print(json.dumps({"success": False, "error": "Song already exists in database or failed to index."}))
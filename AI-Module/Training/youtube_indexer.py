@@ -1,103 +1,318 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import argparse
-import subprocess
-import json
-import hashlib
+import threading
 from pathlib import Path
 
+import yt_dlp
+from yt_dlp.utils import DownloadError, YoutubeDLError
+from yt_dlp.networking import Request
+from yt_dlp.networking.impersonate import ImpersonateTarget
+
 # Fix path injections to find Core and Preprocessing modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 sys.path.append(os.path.join(current_dir, '..', 'Core'))
 sys.path.append(os.path.join(current_dir, '..', 'Preprocessing'))
 
-from processor import AudioProcessor
-from fingerprinter import Fingerprinter
-from database import DatabaseHandler
+from database import DatabaseHandler, LEDGER_DONE, LEDGER_FAILED, LEDGER_DUPLICATE
+import metrics
+from ingest_pipeline import (IngestionPipeline, active_components, archive_path, check_fingerprint_version,
+                             fingerprint_stream)
+
+def video_id_from_url(url):
+    """Extract the YouTube video id from a watch/short/embed URL (falls back to the URL itself)"""
+    match = re.search(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/)([\w-]{11})', url or '')
+    return match.group(1) if match else url
+
+# Bytes requested per HTTP read while streaming (ranged requests use the format's chunk size)
+STREAM_READ_SIZE = 1 << 16
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
 
 class YouTubeIndexer:
-    def __init__(self, db_path=None, temp_dir=None, genre="Unknown", skip_duplicates=True, cookies=None):
+    def __init__(self, db_path=None, temp_dir=None, genre="Unknown", skip_duplicates=True, cookies=None, ydl=None,
+                 archive_dir=None, stream=True, spill=True, decoder=None):
+        """
+        Args:
+            stream: Pipe downloads straight into the decoder and fingerprinter (no audio file on disk)
+            spill: When a download cannot be streamed (no direct HTTP format, no decoder, decode error),
+                   download it to temp_dir and fingerprint the file instead of failing
+            decoder: Command decoding streamed audio, as for AudioProcessor.decode_stream (default: ffmpeg)
+        """
         # Default paths relative to this script
         if db_path is None:
             db_path = os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')
         if temp_dir is None:
             temp_dir = os.path.join(current_dir, '..', 'temp_downloads')
             
-        self.processor = AudioProcessor()
-        self.fingerprinter = Fingerprinter()
         self.db = DatabaseHandler(db_path)
+        # Fingerprint with the parameters of the database's active version
+        self.processor, self.fingerprinter = active_components(self.db)
         self.temp_dir = temp_dir
         self.genre = genre
         self.skip_duplicates = skip_duplicates
         self.cookies_path = cookies
+        self.archive_dir = archive_dir  # Decoded audio kept here so songs can be re-fingerprinted
+        self.stream = stream
+        self.spill = spill
+        self.decoder = decoder
+        self.last_search = None  # Outcome counts of the latest index_search
         
         # Ensure temp directory exists
         Path(self.temp_dir).mkdir(exist_ok=True, parents=True)
         
-        # Standard robust headers for bot bypass
-        self.headers = [
-            '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-            '--force-overwrites',
-            '--no-check-certificates',
-            '--impersonate', 'chrome-110',
-            '--extractor-args', 'youtube:player-client=web,default;player-skip=web_embedded_client,mweb_benchmark'
-        ]
+        # Standard robust options for bot bypass (same as the old yt-dlp CLI flags)
+        self.ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'noprogress': True,
+            'http_headers': {'User-Agent': USER_AGENT},
+            'overwrites': True,
+            'nocheckcertificate': True,
+            'impersonate': ImpersonateTarget.from_str('chrome-110'),
+            'extractor_args': {'youtube': {'player_client': ['web', 'default'],
+                                           'player_skip': ['web_embedded_client', 'mweb_benchmark']}},
+            'format': 'bestaudio',
+            'noplaylist': True,
+            'cachedir': False,
+            # Playlists and searches only list their entries; each video is extracted once, when ingested
+            'extract_flat': 'in_playlist',
+            'outtmpl': os.path.join(os.path.abspath(self.temp_dir), '%(id)s.%(ext)s'),
+        }
         if self.cookies_path:
-            self.headers.extend(['--cookies', self.cookies_path])
-
-    def _run_ytdlp(self, args, quiet=False):
-        """Helper to run yt-dlp using the current python interpreter to ensure venv usage"""
-        cmd = [sys.executable, '-m', 'yt_dlp'] + self.headers + args
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0 and not quiet:
-            print(f"[!] yt-dlp Error:")
-            print(f"    {result.stderr.strip()}")
-        return result
-
-    def download_audio(self, url):
-        """Downloads audio and returns (file_path, thumbnail, title, artist)"""
+            self.ydl_opts['cookiefile'] = self.cookies_path
+        
+        # An injected extractor (e.g. a local stub in tests) is shared; otherwise each thread
+        # lazily creates one YoutubeDL and reuses it for every URL it handles
+        self._shared_ydl = ydl
+        self._local = threading.local()
+
+    def _get_ydl(self):
+        """Returns this thread's extractor instance, creating it on first use"""
+        if self._shared_ydl is not None:
+            return self._shared_ydl
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            try:
+                ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            except YoutubeDLError as e:
+                # Impersonation needs curl_cffi; carry on without it
+                if 'impersonate' not in str(e).lower():
+                    raise
+                opts = dict(self.ydl_opts)
+                opts.pop('impersonate')
+                ydl = yt_dlp.YoutubeDL(opts)
+            self._local.ydl = ydl
+        return ydl
+
+    def _report_error(self, e):
+        message = str(e)
+        print(f"[!] yt-dlp Error:")
+        print(f"    {message.strip()}")
+        if "bot" in message or "confirm you're not a bot" in message:
+            print("\n[!] YouTube detected a bot request.")
+            print("[!] TIP: Export cookies from your browser to a 'cookies.txt' file and use --cookies cookies.txt")
+
+    def extract_info(self, url):
+        """
+        Extract video metadata without downloading.
+        The returned info can be passed to download_audio/process_and_index to skip a second extraction.
+        
+        Returns: yt-dlp info dict (id, title, uploader, thumbnail, duration, ...) or None
+        """
         try:
-            print(f"[*] Metadata: {url}")
-            # Try to get metadata. If it fails due to bot detection, advise cookies.
-            meta_cmd = ['--print', '%(thumbnail)s\n%(title)s\n%(uploader)s', '--simulate', '--no-playlist', url]
-            result = self._run_ytdlp(meta_cmd)
-            
-            if result.returncode != 0:
-                if "bot" in result.stderr or "confirm you're not a bot" in result.stderr:
-                    print("\n[!] YouTube detected a bot request.")
-                    print("[!] TIP: Export cookies from your browser to a 'cookies.txt' file and use --cookies cookies.txt")
+            return self._get_ydl().extract_info(url, download=False)
+        except DownloadError as e:
+            self._report_error(e)
+            return None
+
+    def list_entries(self, url, start=None, end=None):
+        """Returns video URLs of a playlist, channel or ytsearchN: query (flat, no per-video extraction)"""
+        try:
+            info = self._get_ydl().extract_info(url, download=False)
+        except DownloadError as e:
+            self._report_error(e)
+            return []
+        entries = list(info.get('entries') or []) if info else []
+        entries = entries[(start or 1) - 1:end]
+        urls = []
+        for entry in entries:
+            if not entry:
+                continue
+            video_url = entry.get('url') or entry.get('webpage_url')
+            if not video_url and entry.get('id'):
+                video_url = f"https://www.youtube.com/watch?v={entry['id']}"
+            if video_url:
+                urls.append(video_url)
+        return urls
+
+    def download_audio(self, url, info=None):
+        """
+        Downloads audio and returns (file_path, thumbnail, title, artist).
+        Metadata and download come from a single extraction; pass `info` from extract_info to reuse it.
+        """
+        try:
+            ydl = self._get_ydl()
+            print(f"[*] Downloading audio: {url}")
+            if info is None:
+                info = ydl.extract_info(url, download=True)
+            else:
+                info = ydl.process_ie_result(info, download=True)
+            if not info:
                 return None, None, None, None
             
-            lines = result.stdout.strip().split('\n')
-            thumbnail, title, artist = None, "Unknown", "Unknown"
-            if len(lines) >= 1: thumbnail = lines[0]
-            if len(lines) >= 2: title = lines[1]
-            if len(lines) >= 3: artist = lines[2]
-
-            # Use video ID in filename
-            video_id_cmd = ['--get-id', url]
-            id_result = self._run_ytdlp(video_id_cmd, quiet=True)
-            video_id = id_result.stdout.strip() if id_result.returncode == 0 else hashlib.md5(url.encode()).hexdigest()
-
-            output_template = os.path.join(os.path.abspath(self.temp_dir), f'{video_id}.%(ext)s')
-            dl_cmd = ['-f', 'bestaudio', '-o', output_template, '--no-playlist', '--no-cache-dir', url]
-            
-            print(f"[*] Downloading audio...")
-            self._run_ytdlp(dl_cmd)
+            thumbnail = info.get('thumbnail')
+            title = info.get('title') or "Unknown"
+            artist = info.get('uploader') or "Unknown"
             
             # Find the file
-            for ext in ['mp3', 'webm', 'm4a', 'wav', 'opus']:
-                files = list(Path(self.temp_dir).glob(f"{video_id}.{ext}"))
-                if files:
-                    return str(files[0]), thumbnail, title, artist
+            downloads = info.get('requested_downloads') or []
+            file_path = downloads[0].get('filepath') if downloads else None
+            if not file_path:
+                file_path = ydl.prepare_filename(info)
+            if file_path and os.path.exists(file_path):
+                return file_path, thumbnail, title, artist
             
+            return None, None, None, None
+        except DownloadError as e:
+            self._report_error(e)
             return None, None, None, None
         except Exception as e:
             print(f"[!] Download Error: {e}")
             return None, None, None, None
 
+    def _http_chunks(self, info):
+        """Yields the raw bytes of the selected format, in ranged requests when the format asks for them"""
+        ydl = self._get_ydl()
+        headers = dict(info.get('http_headers') or {})
+        range_size = (info.get('downloader_options') or {}).get('http_chunk_size')
+        if not range_size:
+            with ydl.urlopen(Request(info['url'], headers=headers)) as response:
+                yield from iter(lambda: response.read(STREAM_READ_SIZE), b'')
+            return
+        
+        start = 0
+        while True:
+            ranged = dict(headers, Range=f"bytes={start}-{start + range_size - 1}")
+            received = 0
+            with ydl.urlopen(Request(info['url'], headers=ranged)) as response:
+                for chunk in iter(lambda: response.read(STREAM_READ_SIZE), b''):
+                    received += len(chunk)
+                    yield chunk
+            if received < range_size:
+                return
+            start += received
+
+    def _streamable(self, url, info):
+        """Whether the selected format is a direct HTTP(S) download that can be streamed"""
+        if info.get('url') and info.get('protocol', 'https') in ('http', 'https'):
+            return True
+        print(f"[*] Format of {url} cannot be streamed ({info.get('protocol') or 'no direct URL'})")
+        return False
+
+    @staticmethod
+    def _describe(info):
+        """Song metadata of an extracted video"""
+        return {
+            "title": info.get('title') or "Unknown",
+            "artist": info.get('uploader') or "Unknown",
+            "thumbnail": info.get('thumbnail'),
+            "file_hash": f"{info.get('id')}.{info.get('ext') or 'audio'}"
+        }
+
+    def stream_audio(self, url, info=None):
+        """
+        Reads a video's audio over HTTP into memory, still encoded (about 1 MB per minute), for the
+        pipeline's fingerprint processes, which decode and fingerprint it as a stream. No audio
+        file is written and decoded samples never leave the worker.
+        
+        Returns: dict with encoded (bytes), decoder, title, artist, thumbnail and file_hash,
+                 or None if the audio could not be streamed
+        """
+        if info is None:
+            info = self.extract_info(url)
+        if not info or not self._streamable(url, info):
+            return None
+        
+        print(f"[*] Streaming audio: {url}")
+        try:
+            encoded = b''.join(self._http_chunks(info))
+        except Exception as e:
+            print(f"[!] Streaming failed: {e or type(e).__name__}")
+            return None
+        if not encoded:
+            print(f"[!] Streaming failed: empty response")
+            return None
+        return dict(self._describe(info), encoded=encoded, decoder=self.decoder)
+
+    def record(self, url, status, song_id=None, detail=None):
+        """Write an item's outcome to the ingestion ledger"""
+        metrics.inc("ingest_items_total", source="youtube", status=status)
+        self.db.record_ingestion(video_id_from_url(url), url, status, song_id=song_id, detail=detail)
+
+    def filter_pending(self, urls):
+        """
+        Drop URLs that were already ingested (done or skipped as duplicate in the ledger, or present
+        in songs.URL) before anything is downloaded. Failed items are kept so they are retried.
+        """
+        ids = [video_id_from_url(u) for u in urls]
+        statuses = self.db.get_ledger_statuses(set(ids))
+        indexed = {video_id_from_url(u) for u in self.db.get_indexed_urls()}
+        
+        pending = [u for u, vid in zip(urls, ids)
+                   if vid not in indexed and statuses.get(vid) not in (LEDGER_DONE, LEDGER_DUPLICATE)]
+        if len(pending) < len(urls):
+            print(f"[*] Skipping {len(urls) - len(pending)} already ingested item(s)")
+        return pending
+
+    def fetch_audio(self, url):
+        """
+        Pipeline fetch stage: stream (or download) one URL and describe it for IngestionPipeline.
+        Streamed songs carry their encoded bytes instead of a file path.
+        """
+        info = None
+        if self.stream:
+            # One extraction serves both the stream and a spilled download
+            info = self.extract_info(url)
+            if not info:
+                return None
+            streamed = self.stream_audio(url, info=info)
+            if streamed:
+                return dict(streamed, url=url, genre=self.genre)
+            if not self.spill:
+                return None
+            print(f"[*] Downloading to disk instead: {url}")
+        file_path, thumb, title, artist = self.download_audio(url, info=info)
+        if not file_path:
+            return None
+        return {
+            "path": file_path,
+            "title": title,
+            "artist": artist,
+            "thumbnail": thumb,
+            "url": url,
+            "genre": self.genre,
+            "file_hash": os.path.basename(file_path),
+            "temporary": True
+        }
+
+    def index_urls(self, urls, genre=None, workers=4):
+        """Ingest URLs through the parallel pipeline (downloads, fingerprinting and DB writes overlap)"""
+        genre = genre or self.genre
+
+        def fetch(url):
+            song = self.fetch_audio(url)
+            if song:
+                song["genre"] = genre
+            return song
+
+        pipeline = IngestionPipeline(self.db, fetch, is_duplicate=self.is_duplicate, fetch_workers=workers,
+                                     on_status=self.record, archive_dir=self.archive_dir)
+        return pipeline.run(urls)
+
     def is_duplicate(self, title, artist, fingerprints=None):
         """Check for existing song via title or audio fingerprints"""
         if not self.skip_duplicates:
@@ -116,18 +331,47 @@ class YouTubeIndexer:
                 
         return False, None
 
-    def process_and_index(self, url, genre=None):
+    def process_and_index(self, url, genre=None, info=None):
         """Standard workflow: Download -> Duplicate Check -> Index -> Cleanup"""
         genre = genre or self.genre
-        file_path, thumb, title, artist = self.download_audio(url)
+        
+        # Already ingested (ledger or songs.URL): skip before downloading anything
+        if not self.filter_pending([url]):
+            return False
+        
+        try:
+            check_fingerprint_version(self.db, self.processor, self.fingerprinter)
+        except RuntimeError as e:
+            print(f"[!] {e}")
+            return False
+        
+        if self.stream:
+            # One extraction serves both the stream and a spilled download
+            info = info or self.extract_info(url)
+            if not info:
+                self.record(url, LEDGER_FAILED, detail="Download failed")
+                return False
+            if self._streamable(url, info):
+                indexed = self._index_streamed(url, info, genre)
+                if indexed is not None:
+                    return indexed
+            if not self.spill:
+                self.record(url, LEDGER_FAILED, detail="Streaming failed")
+                return False
+            print(f"[*] Downloading to disk instead: {url}")
+        
+        file_path, thumb, title, artist = self.download_audio(url, info=info)
         
         if not file_path:
+            self.record(url, LEDGER_FAILED, detail="Download failed")
             return False
             
         try:
             print(f"[*] Processing: {title}")
             y, sr = self.processor.load_audio(file_path)
-            if y is None: return False
+            if y is None:
+                self.record(url, LEDGER_FAILED, detail="Failed to load audio file")
+                return False
             
             spec = self.processor.get_spectrogram(y)
             peaks = self.fingerprinter.get_2d_peaks(spec)
@@ -137,31 +381,75 @@ class YouTubeIndexer:
             dup, reason = self.is_duplicate(title, artist, hashes)
             if dup:
                 print(f"[-] Skipped: {reason}")
+                self.record(url, LEDGER_DUPLICATE, detail=reason)
                 return False
 
             song_id = self.db.add_song(title, artist, os.path.basename(file_path), genre=genre, url=url, thumbnail=thumb)
             if song_id:
                 self.db.store_fingerprints(song_id, hashes)
+                if self.archive_dir:
+                    archive = archive_path(self.archive_dir, os.path.basename(file_path))
+                    self.processor.save_archive(y, archive)
+                    self.db.record_archive(song_id, archive, sr)
                 print(f"  ✓ Indexed! (ID: {song_id}, Hashes: {len(hashes)})")
+                self.record(url, LEDGER_DONE, song_id=song_id)
                 return True
+            self.record(url, LEDGER_FAILED, detail="Could not add song")
             return False
         finally:
             if file_path and os.path.exists(file_path):
                 os.remove(file_path)
 
-    def index_playlist(self, url, genre=None, start=None, end=None):
+    def _index_streamed(self, url, info, genre):
+        """
+        Streams the download through the decoder into the fingerprinter (and archive), then runs
+        the duplicate check and DB write.
+        Returns: True/False like process_and_index, or None if streaming failed before anything was stored
+        """
+        song = self._describe(info)
+        archive = archive_path(self.archive_dir, song["file_hash"]) if self.archive_dir else None
+        print(f"[*] Streaming audio: {url}")
+        try:
+            blocks = self.processor.decode_stream(self._http_chunks(info), command=self.decoder)
+            hashes, _ = fingerprint_stream(self.processor, self.fingerprinter, blocks, archive_to=archive)
+        except Exception as e:
+            print(f"[!] Streaming failed: {e or type(e).__name__}")
+            return None
+        
+        print(f"[*] Processing: {song['title']}")
+        dup, reason = self.is_duplicate(song["title"], song["artist"], hashes)
+        song_id = None
+        if dup:
+            print(f"[-] Skipped: {reason}")
+            self.record(url, LEDGER_DUPLICATE, detail=reason)
+        else:
+            song_id = self.db.add_song(song["title"], song["artist"], song["file_hash"], genre=genre, url=url,
+                                       thumbnail=song["thumbnail"])
+            if not song_id:
+                self.record(url, LEDGER_FAILED, detail="Could not add song")
+        if not song_id:
+            if archive and os.path.exists(archive):
+                os.remove(archive)
+            return False
+        
+        self.db.store_fingerprints(song_id, hashes)
+        if archive:
+            self.db.record_archive(song_id, archive, self.processor.sample_rate)
+        print(f"  ✓ Indexed! (ID: {song_id}, Hashes: {len(hashes)})")
+        self.record(url, LEDGER_DONE, song_id=song_id)
+        return True
+
+    def index_playlist(self, url, genre=None, start=None, end=None, workers=1):
         range_str = f" (Range: {start}-{end})" if start or end else ""
         print(f"[*] Extracting playlist: {url}{range_str}")
         
-        cmd = ['--flat-playlist', '--print', 'url']
-        if start: cmd.extend(['--playlist-start', str(start)])
-        if end: cmd.extend(['--playlist-end', str(end)])
-        cmd.append(url)
+        urls = self.list_entries(url, start=start, end=end)
+        print(f"[*] Found {len(urls)} songs.")
+        urls = self.filter_pending(urls)
+        print(f"[*] Starting ingestion of {len(urls)} songs...")
         
-        result = self._run_ytdlp(cmd)
-        
-        urls = [u.strip() for u in result.stdout.strip().split('\n') if u.strip()]
-        print(f"[*] Found {len(urls)} songs. Starting ingestion...")
+        if workers > 1:
+            return self.index_urls(urls, genre, workers=workers)["indexed"]
         
         success = 0
         for i, video_url in enumerate(urls, 1):
@@ -169,16 +457,35 @@ class YouTubeIndexer:
             if self.process_and_index(video_url, genre):
                 success += 1
         print(f"\n[!] Done! Successfully indexed {success}/{len(urls)} songs.")
+        return success
 
-    def index_search(self, query, limit=10, genre=None):
+    def index_search(self, query, limit=10, genre=None, workers=1):
+        """
+        Index the results of a YouTube search.
+        
+        Returns: Number of songs indexed. self.last_search holds the outcome counts (results,
+                 indexed, skipped as already ingested or duplicate, failed) so callers can tell
+                 a search that found nothing usable from one whose songs are already in the library.
+        """
         print(f"[*] Searching YouTube: {query}")
-        cmd = ['--flat-playlist', '--print', 'url', f'ytsearch{limit}:{query}']
-        result = self._run_ytdlp(cmd)
+        entries = self.list_entries(f'ytsearch{limit}:{query}')
+        urls = self.filter_pending(entries)
+        skipped = len(entries) - len(urls)
+        if workers > 1 and len(urls) > 1:
+            summary = self.index_urls(urls, genre, workers=workers)
+            success, duplicates = summary["indexed"], summary["skipped"]
+        else:
+            success = 0
+            for i, video_url in enumerate(urls, 1):
+                print(f"\n[{i}/{len(urls)}] Ingesting search result...")
+                if self.process_and_index(video_url, genre):
+                    success += 1
+            statuses = self.db.get_ledger_statuses({video_id_from_url(u) for u in urls})
+            duplicates = sum(1 for status in statuses.values() if status == LEDGER_DUPLICATE)
         
-        urls = [u.strip() for u in result.stdout.strip().split('\n') if u.strip()]
-        for i, video_url in enumerate(urls, 1):
-            print(f"\n[{i}/{len(urls)}] Ingesting search result...")
-            self.process_and_index(video_url, genre)
+        self.last_search = {"results": len(entries), "indexed": success, "skipped": skipped + duplicates,
+                            "failed": len(urls) - success - duplicates}
+        return success
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Unified Viltrumite YouTube Indexer")
@@ -194,13 +501,21 @@ if __name__ == "__main__":
     parser.add_argument('--db', help='Custom database path')
     parser.add_argument('--cookies', help='Path to cookies.txt file')
     parser.add_argument('--no-skip', action='store_false', dest='skip', help='Disable duplicate detection')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel downloads for playlists/searches (default: 4, 1 = sequential)')
+    parser.add_argument('--archive-dir', help='Keep decoded audio here so songs can be re-fingerprinted without re-downloading')
+    parser.add_argument('--no-stream', action='store_false', dest='stream',
+                        help='Download every song to a temp file instead of streaming it into the decoder')
+    parser.add_argument('--no-spill', action='store_false', dest='spill',
+                        help='Fail songs that cannot be streamed instead of downloading them to disk')
     
     args = parser.parse_args()
-    indexer = YouTubeIndexer(db_path=args.db, genre=args.genre, skip_duplicates=args.skip, cookies=args.cookies)
+    metrics.configure(metrics.default_metrics_path(args.db or os.path.join(current_dir, '..', '..', 'Databases', 'songs.db')))
+    indexer = YouTubeIndexer(db_path=args.db, genre=args.genre, skip_duplicates=args.skip, cookies=args.cookies,
+                             archive_dir=args.archive_dir, stream=args.stream, spill=args.spill)
     
     if args.url:
         indexer.process_and_index(args.url)
     elif args.playlist:
-        indexer.index_playlist(args.playlist, start=args.start, end=args.end)
+        indexer.index_playlist(args.playlist, start=args.start, end=args.end, workers=args.workers)
     elif args.search:
-        indexer.index_search(args.search, limit=args.limit)
+        indexer.index_search(args.search, limit=args.limit, workers=args.workers)
@@ -66,7 +66,7 @@ console.log('\x1b[32m%s\x1b[0m', '  ✅ POST /api/auth/login    - User login');
 console.log('\x1b[32m%s\x1b[0m', '  ✅ GET  /api/auth/me       - Get current user info');
 console.log('\x1b[32m%s\x1b[0m', '  ✅ GET  /api/stats         - Database statistics');
 console.log('\x1b[32m%s\x1b[0m', '  ✅ GET  /api/songs         - List all indexed songs');
-console.log('\x1b[32m%s\x1b[0m', '  ✅ POST /api/recognize     - Song recognition (Multipart)');
+console.log('\x1b[32m%s\x1b[0m', '  ✅ POST /api/recognize     - Song recognition (Multipart or raw audio)');
 console.log('\x1b[36m%s\x1b[0m', '-------------------------------------------');
 
 module.exports = app;
@@ -1,26 +1,25 @@
-const fs = require('fs');
 const { runPythonScript } = require('../services/pythonService');
 const { PATHS } = require('../config');
 
 const recognize = async (req, res) => {
-    if (!req.file) {
+    if (!req.audioStream) {
         return res.status(400).json({ success: false, error: 'No audio file provided' });
     }
 
-    const audioFilePath = req.file.path;
+    let streamError = null;
+    req.audioStream.on('error', (err) => { streamError = err; });
 
     try {
+        // The upload is streamed into the recognizer's stdin and decoded in memory
         const result = await runPythonScript(PATHS.PYTHON_SCRIPTS.FALLBACK, [
-            audioFilePath, '--json', '--top', '3', '--db', PATHS.DB_SONGS
-        ]);
-
-        // Clean up uploaded file
-        if (fs.existsSync(audioFilePath)) fs.unlinkSync(audioFilePath);
+            '-', '--json', '--top', '3', '--db', PATHS.DB_SONGS
+        ], true, req.audioStream);
 
+        if (streamError) throw streamError;
         res.json(result);
     } catch (error) {
-        if (fs.existsSync(audioFilePath)) fs.unlinkSync(audioFilePath);
-        res.status(500).json({ success: false, error: error.message });
+        const err = streamError || error;
+        res.status(err.status || 500).json({ success: false, error: err.message });
     }
 };
 
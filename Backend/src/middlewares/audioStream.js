@@ -0,0 +1,68 @@
+const { Transform } = require('stream');
+const Busboy = require('busboy');
+
+const MAX_FILE_SIZE = 50 * 1024 * 1024; // 50MB max file size
+const AUDIO_EXTENSIONS = /\.(mp3|wav|ogg|m4a|webm|mp4)$/i;
+
+const isAudio = (mimeType, filename = '') =>
+    mimeType.startsWith('audio/') || mimeType === 'video/mp4' || AUDIO_EXTENSIONS.test(filename);
+
+// Passes the stream through, failing it once more than MAX_FILE_SIZE bytes have been seen
+const sizeLimit = () => {
+    let received = 0;
+    return new Transform({
+        transform(chunk, encoding, callback) {
+            received += chunk.length;
+            if (received > MAX_FILE_SIZE) {
+                return callback(Object.assign(new Error('File too large'), { status: 413 }));
+            }
+            callback(null, chunk);
+        }
+    });
+};
+
+// Exposes the uploaded audio as a stream on req.audioStream without writing it to disk.
+// Accepts multipart form data (field "audio") or a raw audio request body.
+const audioStream = (field) => (req, res, next) => {
+    const contentType = req.headers['content-type'] || '';
+
+    if (!contentType.startsWith('multipart/form-data')) {
+        if (!isAudio(contentType) && contentType !== 'application/octet-stream') {
+            return res.status(400).json({ success: false, error: 'No audio file provided' });
+        }
+        req.audioStream = req.pipe(sizeLimit());
+        return next();
+    }
+
+    let busboy;
+    try {
+        busboy = Busboy({ headers: req.headers, limits: { files: 1, fileSize: MAX_FILE_SIZE } });
+    } catch (err) {
+        return res.status(400).json({ success: false, error: err.message });
+    }
+
+    let handled = false;
+    busboy.on('file', (name, file, info) => {
+        if (handled || name !== field) {
+            file.resume();
+            return;
+        }
+        handled = true;
+        if (!isAudio(info.mimeType, info.filename)) {
+            file.resume();
+            return next(Object.assign(new Error('Only audio files are allowed!'), { status: 400 }));
+        }
+        file.on('limit', () => file.destroy(Object.assign(new Error('File too large'), { status: 413 })));
+        req.audioStream = file;
+        next();
+    });
+    busboy.on('close', () => {
+        if (!handled) res.status(400).json({ success: false, error: 'No audio file provided' });
+    });
+    busboy.on('error', (err) => {
+        if (!handled) next(err);
+    });
+    req.pipe(busboy);
+};
+
+module.exports = audioStream;
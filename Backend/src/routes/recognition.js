@@ -1,8 +1,8 @@
 const express = require('express');
 const router = express.Router();
 const recognitionController = require('../controllers/recognitionController');
-const upload = require('../middlewares/upload');
+const audioStream = require('../middlewares/audioStream');
 
-router.post('/recognize', upload.single('audio'), recognitionController.recognize);
+router.post('/recognize', audioStream('audio'), recognitionController.recognize);
 
 module.exports = router;
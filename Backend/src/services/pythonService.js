@@ -1,10 +1,18 @@
 const { spawn } = require('child_process');
 const { PATHS } = require('../config');
 
-const runPythonScript = (scriptPath, args, isJson = true) => {
+// input: optional readable stream piped into the script's stdin (e.g. an upload)
+const runPythonScript = (scriptPath, args, isJson = true, input = null) => {
     return new Promise((resolve, reject) => {
         const pythonProcess = spawn(PATHS.PYTHON_BIN, [scriptPath, ...args]);
 
+        if (input) {
+            // The script may exit before reading everything (e.g. on a bad upload)
+            pythonProcess.stdin.on('error', () => {});
+            input.on('error', (err) => pythonProcess.kill());
+            input.pipe(pythonProcess.stdin);
+        }
+
         let outputData = '';
         let errorData = '';
 
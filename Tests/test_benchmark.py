@@ -0,0 +1,56 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+
+# Add Benchmarks to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Benchmarks'))
+from synthetic import synth_song, generate_library, generate_queries
+from benchmark import compare
+from evaluate import parse_profile, distort, pareto_front
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_synthetic_audio_is_deterministic(self):
+        np.testing.assert_array_equal(synth_song(3, seconds=2), synth_song(3, seconds=2))
+        self.assertFalse(np.array_equal(synth_song(3, seconds=2), synth_song(4, seconds=2)))
+
+        songs = generate_library(os.path.join(self.temp_dir, "lib"), 2, seconds=2)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, "lib", "manifest.json")))
+        queries = generate_queries(songs, os.path.join(self.temp_dir, "q"), 2, clip_seconds=1,
+                                   song_seconds=2, n_negatives=1)
+        self.assertEqual([q["title"] is None for q in queries], [False, False, True])
+
+    def test_compare_flags_regressions(self):
+        baseline = {"steps": [{"library_size": 10, "recognize_p50_ms": 100, "ingest_songs_per_second": 2.0}]}
+        results = {"steps": [{"library_size": 10, "recognize_p50_ms": 150, "ingest_songs_per_second": 2.1}]}
+        regressions = compare(results, baseline, tolerance=0.2)
+        self.assertEqual([r["metric"] for r in regressions], ["recognize_p50_ms"])
+
+    def test_profiles_and_distortions(self):
+        self.assertEqual(parse_profile("wide:fan_value=10,neighborhood_size=20"),
+                         ("wide", {"fan_value": 10, "neighborhood_size": 20}))
+        with self.assertRaises(ValueError):
+            parse_profile("missing")
+
+        y = synth_song(1, seconds=1)
+        self.assertEqual(len(distort(y, "codec", ("OGG", "VORBIS"))), len(y))
+        self.assertLessEqual(np.max(np.abs(distort(y, "gain", 12))), 1.0)
+
+        reports = pareto_front([
+            {"recall": 0.9, "false_positive_rate": 0.0, "hashes_per_audio_second": 20, "query_p50_ms": 40},
+            {"recall": 0.8, "false_positive_rate": 0.0, "hashes_per_audio_second": 30, "query_p50_ms": 50},
+            {"recall": 0.95, "false_positive_rate": 0.1, "hashes_per_audio_second": 50, "query_p50_ms": 60},
+        ])
+        self.assertEqual([r["pareto"] for r in reports], [True, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
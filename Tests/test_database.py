@@ -1,10 +1,16 @@
 import unittest
 import os
 import sys
+import pickle
+import random
+import sqlite3
+from unittest import mock
+from collections import Counter
 
 # Add Core to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'AI-Module', 'Core'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Core'))
 from database import DatabaseHandler
+from fingerprint_batch import FingerprintBatch
 
 class TestDatabaseHandler(unittest.TestCase):
     def setUp(self):
@@ -32,5 +38,91 @@ class TestDatabaseHandler(unittest.TestCase):
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0][3], "Phonk")
 
+    def test_get_matches_many_matches_single_lookups(self):
+        sid = self.db.add_song("Song", "Artist", "h1")
+        self.db.store_fingerprints(sid, [(b"a" * 20, 10), (b"b" * 20, 12), (b"c" * 20, 15)])
+
+        queries = [[(b"a" * 20, 1), (b"b" * 20, 3)], [(b"b" * 20, 7), (b"z" * 20, 9)], []]
+        merged = self.db.get_matches_many(queries)
+        for hashes, matches in zip(queries, merged):
+            self.assertEqual(sorted(matches), sorted(self.db.get_matches(hashes)))
+
+    def test_fingerprint_batch_round_trip(self):
+        tuples = [(bytes([i]) * 20, i * 3) for i in range(10)]
+        batch = pickle.loads(pickle.dumps(FingerprintBatch.from_tuples(tuples)))
+        self.assertEqual(len(batch), 10)
+        self.assertEqual(list(batch), tuples)
+        self.assertEqual(batch[2], tuples[2])
+        self.assertEqual(list(batch[3:5]), tuples[3:5])
+
+        sid = self.db.add_song("Song", "Artist", "h1")
+        self.db.store_fingerprints(sid, batch)
+        query = FingerprintBatch.from_tuples(tuples[:4])
+        self.assertEqual(sorted(self.db.get_matches(query)), sorted(self.db.get_matches(tuples[:4])))
+
+    def test_alignment_scores_match_python_alignment(self):
+        rng = random.Random(0)
+        pool = [bytes([i]) * 20 for i in range(40)]
+        for n in range(3):
+            sid = self.db.add_song(f"Song {n}", "Artist", f"h{n}")
+            self.db.store_fingerprints(sid, [(rng.choice(pool), rng.randrange(200)) for _ in range(300)])
+        query = [(rng.choice(pool), rng.randrange(50)) for _ in range(60)] + [(pool[0], 5), (pool[0], 5)]
+
+        per_song = {}
+        matches = list(self.db.get_matches(query))
+        for song_id, db_offset, recorded_offset in matches:
+            per_song.setdefault(song_id, Counter())[db_offset - recorded_offset] += 1
+
+        scores, total = self.db.get_alignment_scores(query, top_bins=1)
+        self.assertEqual(total, len(matches))
+        self.assertEqual({sid: n for sid, _, n in scores},
+                         {sid: c.most_common(1)[0][1] for sid, c in per_song.items()})
+        for sid, diff, n in scores:
+            self.assertEqual(per_song[sid][diff], n)
+
+    def test_audio_duplicate_found_via_minhash(self):
+        self.db.migrate_minhash()
+        rng = random.Random(1)
+        original = [(rng.randbytes(20), t) for t in range(600)]
+        sid = self.db.add_song("Song", "Artist", "h1")
+        self.db.store_fingerprints(sid, original)
+        other = self.db.add_song("Other", "Artist", "h2")
+        self.db.store_fingerprints(other, [(rng.randbytes(20), t) for t in range(600)])
+
+        # Re-upload: shifted by 40 frames, a fifth of the hashes differ
+        reupload = [(h if i % 5 else rng.randbytes(20), t + 40) for i, (h, t) in enumerate(original)]
+        self.assertEqual(self.db.find_duplicate_candidates(reupload)[0][0], sid)
+        is_dup, song_id, ratio = self.db.check_fingerprint_similarity(reupload, threshold=0.6)
+        self.assertTrue(is_dup)
+        self.assertEqual(song_id, sid)
+        self.assertAlmostEqual(ratio, 0.8)
+
+        unrelated = [(rng.randbytes(20), t) for t in range(600)]
+        self.assertEqual(self.db.check_fingerprint_similarity(unrelated), (False, None, 0))
+
+    def test_unsigned_songs_are_backfilled_by_migration_only(self):
+        rng = random.Random(2)
+        original = [(rng.randbytes(20), t) for t in range(600)]
+        sid = self.db.add_song("Song", "Artist", "h1")
+        self.db.store_fingerprints(sid, original)
+        # Database written before signatures existed
+        conn = sqlite3.connect(self.test_db)
+        conn.execute("DELETE FROM minhash_signatures")
+        conn.execute("DELETE FROM minhash_bands")
+        conn.commit()
+        conn.close()
+
+        # Queries never backfill; without the index they compare against every song
+        with mock.patch.object(DatabaseHandler, 'backfill_minhash') as backfill:
+            db = DatabaseHandler(self.test_db)
+            self.assertEqual(db.check_fingerprint_similarity(original, threshold=0.6)[:2], (True, sid))
+        backfill.assert_not_called()
+        self.assertFalse(db.minhash_ready())
+
+        self.assertEqual(db.migrate_minhash(), 1)
+        self.assertTrue(db.minhash_ready())
+        self.assertEqual(db.find_duplicate_candidates(original)[0][0], sid)
+        self.assertEqual(db.migrate_minhash(), 0)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import sys
+import io
+import time
+import asyncio
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+# Add Inference to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Inference'))
+from fallback import recognize_workflow
+from shazam_cache import ShazamCache
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class StandInShazam:
+    """Local stand-in for the Shazam client: answers after `delay` seconds, or raises `error`."""
+    def __init__(self, delay=0.0, error=None, track=None):
+        self.delay = delay
+        self.error = error
+        self.track = track
+        self.calls = 0
+
+    async def recognize(self, audio):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {"track": self.track} if self.track else {}
+
+
+class TestShazamFallbackBudget(unittest.TestCase):
+    def setUp(self):
+        self.test_db = "test_fallback_songs.db"
+        self.cache_db = "test_fallback_cache.db"
+        self.cache = ShazamCache(self.cache_db)
+        self.now = 1000.0
+        self.breaker = CircuitBreaker(self.cache_db, failure_threshold=2, slow_seconds=1.0,
+                                      reset_timeout=30, clock=lambda: self.now)
+        sr = 44100
+        t = np.arange(3 * sr) / sr
+        buf = io.BytesIO()
+        sf.write(buf, 0.3 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * 1250 * t), sr, format='WAV')
+        self.audio = buf.getvalue()
+
+    def tearDown(self):
+        for path in (self.test_db, self.cache_db):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def run_workflow(self, shazam, **kwargs):
+        return asyncio.run(recognize_workflow(self.audio, db_path=self.test_db, cache=self.cache, shazam=shazam,
+                                              breaker=self.breaker, **kwargs))
+
+    def test_slow_service_times_out_and_opens_circuit(self):
+        slow = StandInShazam(delay=2.0)
+        start = time.perf_counter()
+        result = self.run_workflow(slow, shazam_timeout=0.6)
+        self.assertLess(time.perf_counter() - start, 1.8)
+        self.assertEqual(result["shazam_status"], "timeout")
+        self.assertEqual(result["sources"], [])
+
+        self.run_workflow(StandInShazam(error=RuntimeError("HTTP 503")))
+        self.assertEqual(self.breaker.state(), OPEN)
+
+        result = self.run_workflow(slow)
+        self.assertEqual(result["shazam_lookup"], "circuit_open")
+        self.assertEqual(slow.calls, 1)
+
+    def test_half_open_probe_recovers(self):
+        for _ in range(2):
+            self.breaker.record_failure()
+        self.now += 31
+        self.assertEqual(self.breaker.allow(), (True, HALF_OPEN))
+        # Only one probe at a time
+        self.assertEqual(self.breaker.allow(), (False, HALF_OPEN))
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state(), OPEN)
+
+        self.now += 31
+        track = {"title": "Found", "subtitle": "Artist", "genres": {"primary": "Pop"}}
+        with mock.patch('fallback.trigger_auto_index') as trigger:
+            result = self.run_workflow(StandInShazam(track=track))
+        trigger.assert_called_once()
+        self.assertEqual(result["shazam_status"], "found")
+        self.assertEqual(result["sources"], ["shazam"])
+        self.assertEqual(self.breaker.state(), CLOSED)
+
+    def test_spent_budget_skips_shazam(self):
+        shazam = StandInShazam()
+        result = self.run_workflow(shazam, budget_seconds=0.1)
+        self.assertEqual(result["shazam_lookup"], "budget_exhausted")
+        self.assertEqual(shazam.calls, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+
+# Add Training to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Training'))
+import time
+import threading
+from index_queue import IndexQueue, IndexWorkerPool, DONE, FAILED, PENDING
+
+class FakeIndexer:
+    def __init__(self, fail_times=0, indexed=1):
+        self.fail_times = fail_times
+        self.indexed = indexed
+        self.queries = []
+
+    def index_search(self, query, limit=10, genre=None):
+        self.queries.append(query)
+        if len(self.queries) <= self.fail_times:
+            raise RuntimeError("download failed")
+        return self.indexed
+
+class TestIndexQueue(unittest.TestCase):
+    def setUp(self):
+        self.test_db = "test_index_queue.db"
+        self.queue = IndexQueue(self.test_db, max_attempts=2, backoff_base=0)
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db + suffix):
+                os.remove(self.test_db + suffix)
+
+    def test_deduplicates_normalized_title_artist(self):
+        job_id, created = self.queue.enqueue("Song Name (Official Video)", "ARTIST")
+        self.assertTrue(created)
+        again, created = self.queue.enqueue("song name", "Artist")
+        self.assertFalse(created)
+        self.assertEqual(job_id, again)
+        self.assertEqual(self.queue.stats()[PENDING], 1)
+
+    def test_retry_then_fail(self):
+        job_id, _ = self.queue.enqueue("Song", "Artist")
+        self.assertEqual(self.queue.fail(self.queue.claim("w1")["id"], "boom"), PENDING)
+        self.assertEqual(self.queue.fail(self.queue.claim("w1")["id"], "boom"), FAILED)
+        self.assertIsNone(self.queue.claim("w1"))
+
+        # A new discovery of a failed song retries it
+        _, created = self.queue.enqueue("Song", "Artist")
+        self.assertTrue(created)
+        self.assertEqual(self.queue.get_job(job_id)["status"], PENDING)
+
+    def test_running_job_survives_worker_crash(self):
+        job_id, _ = self.queue.enqueue("Song", "Artist")
+        self.queue.claim("crashed-worker")
+        self.assertEqual(IndexQueue(self.test_db).requeue_stale(), 1)
+        self.assertEqual(self.queue.get_job(job_id)["status"], PENDING)
+
+    def test_pool_drains_queue(self):
+        indexer = FakeIndexer(fail_times=1)
+        self.queue.enqueue("Song A", "Artist")
+        self.queue.enqueue("Song B", "Artist")
+        pool = IndexWorkerPool(self.queue, concurrency=1, indexer_factory=lambda: indexer, poll_interval=0.01)
+        pool.run(exit_when_idle=True)
+
+        stats = self.queue.stats()
+        self.assertEqual(stats[DONE], 2)
+        self.assertEqual(stats["workers"], 0)
+        self.assertEqual(len(indexer.queries), 3)
+
+    def test_search_that_indexes_nothing_is_retried_later(self):
+        queue = IndexQueue(self.test_db, max_attempts=3, backoff_base=60)
+        job_id, _ = queue.enqueue("Song", "Artist")
+        pool = IndexWorkerPool(queue, concurrency=1, indexer_factory=lambda: FakeIndexer(indexed=0), poll_interval=0.01)
+        runner = threading.Thread(target=pool.run)
+        runner.start()
+        deadline = time.time() + 10
+        while queue.get_job(job_id)["attempts"] == 0 or queue.get_job(job_id)["status"] == "running":
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        pool.stop()
+        runner.join()
+
+        job = queue.get_job(job_id)
+        self.assertEqual(job["status"], PENDING)
+        self.assertGreater(job["next_run_at"], time.time() + 30)
+        self.assertIn("Nothing indexed", job["last_error"])
+
+    def test_exiting_pool_lets_next_discovery_spawn(self):
+        self.assertTrue(self.queue.claim_spawn())
+        self.assertFalse(self.queue.claim_spawn())
+        pool = IndexWorkerPool(self.queue, concurrency=1, indexer_factory=FakeIndexer, poll_interval=0.01)
+        pool.run(exit_when_idle=True)
+        self.assertTrue(self.queue.claim_spawn())
+
+        # A pool never unregisters while a job is pending
+        self.queue.heartbeat("w1")
+        self.queue.enqueue("Song", "Artist")
+        self.assertFalse(self.queue.unregister_if_idle("w1"))
+        self.assertEqual(self.queue.stats()["workers"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
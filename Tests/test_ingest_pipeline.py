@@ -0,0 +1,79 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+# Add Training to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Training'))
+from ingest_pipeline import IngestionPipeline, fingerprint_stream
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter
+from stream_fingerprinter import StreamingFingerprinter
+from database import DatabaseHandler, LEDGER_FAILED
+
+class TestIngestionPipeline(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseHandler(os.path.join(self.temp_dir, "songs.db"))
+        t = np.arange(44100 * 2) / 44100
+        self.paths = []
+        for n in range(3):
+            path = os.path.join(self.temp_dir, f"song{n}.wav")
+            tones = np.repeat(np.random.default_rng(n).uniform(200, 4000, 8), len(t) // 8 + 1)[:len(t)]
+            sf.write(path, (0.6 * np.sin(2 * np.pi * tones * t)).astype(np.float32), 44100)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def fetch(self, path):
+        name = os.path.basename(path)
+        return {"path": path, "title": name, "artist": "Artist", "url": None, "thumbnail": None, "file_hash": name}
+
+    def test_failing_duplicate_check_is_reported_not_hung(self):
+        def is_duplicate(title, artist, hashes):
+            if title == "song1.wav":
+                raise RuntimeError("database is locked")
+            return False, None
+
+        statuses = {}
+        pipeline = IngestionPipeline(self.db, self.fetch, is_duplicate=is_duplicate, fetch_workers=2,
+                                     fingerprint_workers=1, queue_size=1, write_batch=1,
+                                     on_status=lambda item, status, **kw: statuses.__setitem__(item, status))
+        result = {}
+        runner = threading.Thread(target=lambda: result.update(pipeline.run(self.paths)), daemon=True)
+        runner.start()
+        runner.join(timeout=60)
+        self.assertFalse(runner.is_alive())
+
+        self.assertEqual(result["indexed"], 2)
+        self.assertEqual([(f["item"], f["stage"]) for f in result["failures"]], [(self.paths[1], "write")])
+        self.assertEqual(statuses[self.paths[1]], LEDGER_FAILED)
+
+    def test_stream_is_fingerprinted_block_by_block(self):
+        processor, fingerprinter = AudioProcessor(), Fingerprinter()
+        y, _ = sf.read(self.paths[0], dtype='float32')
+        fed = []
+        feed = StreamingFingerprinter.feed
+
+        def blocks():
+            for n, start in enumerate(range(0, len(y), 8192)):
+                # Every earlier block was fingerprinted before this one is decoded
+                self.assertEqual(len(fed), n)
+                yield y[start:start + 8192]
+
+        with mock.patch.object(StreamingFingerprinter, 'feed', autospec=True,
+                               side_effect=lambda stream, block: fed.append(len(block)) or feed(stream, block)):
+            hashes, _ = fingerprint_stream(processor, fingerprinter, blocks())
+        self.assertEqual(len(fed), -(-len(y) // 8192))
+        offline = fingerprinter.generate_hashes(fingerprinter.get_2d_peaks(processor.get_spectrogram(y)))
+        self.assertEqual(hashes, offline)
+
+if __name__ == '__main__':
+    unittest.main()
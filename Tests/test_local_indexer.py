@@ -0,0 +1,45 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+# Add Training to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Training'))
+from local_indexer import LocalIndexer
+
+class TestLocalIndexer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.library = os.path.join(self.temp_dir, "library")
+        os.makedirs(self.library)
+        t = np.arange(44100 * 3) / 44100
+        for n, name in enumerate(["Alpha - First.wav", "second.wav"]):
+            tones = np.repeat(np.random.default_rng(n).uniform(200, 4000, 12), len(t) // 12 + 1)[:len(t)]
+            sf.write(os.path.join(self.library, name), (0.6 * np.sin(2 * np.pi * tones * t)).astype(np.float32), 44100)
+        with open(os.path.join(self.library, "manifest.json"), "w") as f:
+            json.dump({"second.wav": {"title": "Second", "artist": "Beta", "genre": "Pop"}}, f)
+        self.indexer = LocalIndexer(db_path=os.path.join(self.temp_dir, "songs.db"), workers=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_index_then_skip_unchanged(self):
+        summary = self.indexer.index_directory(self.library)
+        self.assertEqual(summary["indexed"], 2)
+
+        songs = {s[1]: s for s in self.indexer.db.get_all_songs()}
+        self.assertEqual(songs["First"][2], "Alpha")
+        self.assertEqual(songs["Second"][2:4], ("Beta", "Pop"))
+        self.assertTrue(self.indexer.db.has_fingerprints())
+
+        summary = self.indexer.index_directory(self.library)
+        self.assertEqual(summary["indexed"], 0)
+        self.assertEqual(summary["unchanged"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
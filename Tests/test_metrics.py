@@ -0,0 +1,37 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+# Add Core to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Core'))
+from metrics import MetricsRegistry, render
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = os.path.join(self.temp_dir, "metrics.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_processes_accumulate_into_store(self):
+        # Two short-lived "processes" flushing into the same store
+        for _ in range(2):
+            registry = MetricsRegistry()
+            registry.store_path = self.store
+            registry.inc("recognitions_total", outcome="match")
+            registry.observe("db_query_seconds", 0.02)
+            registry.observe("db_query_seconds", 3.0)
+            registry.flush()
+
+        text = render(self.store)
+        self.assertIn('viltrumite_recognitions_total{outcome="match"} 2', text)
+        self.assertIn('viltrumite_db_query_seconds_bucket{le="0.025"} 2', text)
+        self.assertIn('viltrumite_db_query_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('viltrumite_db_query_seconds_count 4', text)
+        self.assertIn('# TYPE viltrumite_db_query_seconds histogram', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import os
+import sys
+
+# Add Inference to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Inference'))
+from mix_segmenter import MixSegmenter
+
+class TestMixSegmenter(unittest.TestCase):
+    def setUp(self):
+        self.segmenter = MixSegmenter(window_seconds=10, hop_seconds=5)
+        self.frames_per_second = self.segmenter.processor.sample_rate / self.segmenter.processor.step_size
+
+    def window(self, start, song_id=None, song_start=0.0):
+        match = None
+        if song_id is not None:
+            offset = round((song_start - start) * self.frames_per_second)
+            match = {"song_id": song_id, "title": f"Song {song_id}", "artist": "Artist",
+                     "confidence": 40.0, "time_offset": -offset}
+        return {"start": start, "end": start + 10, "match": match}
+
+    def test_windows_cover_recording(self):
+        sr = self.segmenter.processor.sample_rate
+        windows = self.segmenter.windows(int(23 * sr))
+        self.assertEqual([start / sr for _, start, _ in windows], [0, 5, 10, 13])
+        self.assertEqual(windows[-1][2], int(23 * sr))
+        self.assertEqual(self.segmenter.windows(int(4 * sr)), [(0, 0, int(4 * sr))])
+
+    def test_merge_builds_timeline(self):
+        windows = [
+            self.window(0, 1, song_start=0),
+            self.window(5, 1, song_start=0),
+            self.window(10),                      # transition, nothing identified
+            self.window(15, 1, song_start=0),
+            self.window(20, 2, song_start=22),    # next song begins inside this window
+            self.window(25, 2, song_start=22),
+            self.window(30, 2, song_start=-20),   # same song, inconsistent position
+        ]
+        timeline = self.segmenter.merge(windows)
+        self.assertEqual([(e["song_id"], e["start"], e["end"], e["windows"]) for e in timeline],
+                         [(1, 0, 22.0, 3), (2, 22.0, 32.5, 2), (2, 32.5, 40, 1)])
+
+if __name__ == '__main__':
+    unittest.main()
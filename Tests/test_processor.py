@@ -0,0 +1,56 @@
+import unittest
+import io
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+# Add Preprocessing to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Preprocessing'))
+from processor import AudioProcessor
+
+class TestAudioProcessor(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        t = np.arange(22050 * 2) / 22050
+        self.path = os.path.join(self.temp_dir, "clip.wav")
+        sf.write(self.path, (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32), 22050)
+        self.processor = AudioProcessor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_bytes_decode_like_files(self):
+        y, sr = self.processor.load_audio(self.path)
+        with open(self.path, 'rb') as f:
+            from_bytes, sr_bytes = self.processor.load_audio(f.read())
+        self.assertEqual(sr_bytes, sr)
+        np.testing.assert_allclose(from_bytes, y)
+
+        buf = io.BytesIO()
+        sf.write(buf, y, sr, format='FLAC')
+        flac, _ = self.processor.load_audio(buf.getvalue())
+        self.assertEqual(len(flac), len(y))
+
+    def test_undecodable_bytes(self):
+        self.assertEqual(self.processor.load_audio(b'not audio' * 100), (None, None))
+
+    def test_select_window_trims_silence_and_bounds_length(self):
+        sr = self.processor.sample_rate
+        t = np.arange(sr * 20) / sr
+        tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+        y = np.concatenate([np.zeros(sr * 10, dtype=np.float32), tone, np.zeros(sr * 5, dtype=np.float32)])
+
+        window, start = self.processor.select_window(y)
+        self.assertAlmostEqual(start / sr, 10, delta=0.1)
+        self.assertAlmostEqual(len(window) / sr, 20, delta=0.1)
+
+        window, start = self.processor.select_window(y, max_seconds=8)
+        self.assertGreaterEqual(start / sr, 9.9)
+        self.assertLessEqual(len(window) / sr, 8)
+
+if __name__ == '__main__':
+    unittest.main()
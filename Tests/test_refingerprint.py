@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+# Add Training to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Training'))
+from local_indexer import LocalIndexer
+from refingerprint import Refingerprinter
+from fingerprinter import Fingerprinter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Inference'))
+from recognizer import SongRecognizer
+
+class TestRefingerprint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.library = os.path.join(self.temp_dir, "library")
+        os.makedirs(self.library)
+        for n in range(2):
+            self.write_song(f"song{n}.wav", n)
+        self.db_path = os.path.join(self.temp_dir, "songs.db")
+        self.archive_dir = os.path.join(self.temp_dir, "archive")
+
+    def write_song(self, name, seed):
+        t = np.arange(44100 * 3) / 44100
+        tones = np.repeat(np.random.default_rng(seed).uniform(200, 4000, 12), len(t) // 12 + 1)[:len(t)]
+        path = os.path.join(self.library, name)
+        sf.write(path, (0.6 * np.sin(2 * np.pi * tones * t)).astype(np.float32), 44100)
+        return path
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_rebuild_and_activate(self):
+        indexer = LocalIndexer(db_path=self.db_path, workers=1, archive_dir=self.archive_dir)
+        self.assertEqual(indexer.index_directory(self.library)["indexed"], 2)
+        old_version, _ = indexer.db.get_active_fingerprint_version()
+
+        refp = Refingerprinter(db_path=self.db_path, fingerprinter=Fingerprinter(pairing="zone", peak_budget=3),
+                               workers=1)
+        summary = refp.run(activate=True, drop_old=True)
+        self.assertEqual(summary["refingerprinted"], 2)
+        self.assertTrue(summary["activated"])
+        self.assertEqual(indexer.db.get_active_fingerprint_version()[0], refp.version)
+        self.assertNotEqual(refp.version, old_version)
+
+        # Resumable: nothing left to do, and queries now hit the new table
+        self.assertEqual(indexer.db.get_songs_to_refingerprint(refp.version), ([], []))
+        self.assertTrue(indexer.db.has_fingerprints())
+        self.assertEqual([v[0] for v in indexer.db.list_fingerprint_versions()], [refp.version])
+
+        # Indexing and recognition follow the active version's parameters
+        late = self.write_song("late.wav", 7)
+        self.assertEqual(indexer.index_directory(self.library)["indexed"], 1)
+        self.assertEqual(indexer.db.get_active_fingerprint_version()[0], refp.version)
+        recognizer = SongRecognizer(db_path=self.db_path)
+        self.assertEqual(recognizer.fingerprinter.config(), refp.fingerprinter.config())
+        result = recognizer.recognize(late)
+        self.assertTrue(result["match_found"])
+        self.assertEqual(result["matches"][0]["title"], "late")
+
+if __name__ == '__main__':
+    unittest.main()
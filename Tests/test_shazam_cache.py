@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+import time
+
+# Add Inference to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Inference'))
+from shazam_cache import ShazamCache
+
+class TestShazamCache(unittest.TestCase):
+    def setUp(self):
+        self.test_db = "test_shazam_cache.db"
+        self.cache = ShazamCache(self.test_db, signature_size=16)
+        self.hashes = [(bytes([i]) * 20, i) for i in range(40)]
+
+    def tearDown(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db + suffix):
+                os.remove(self.test_db + suffix)
+
+    def test_overlapping_query_hits(self):
+        self.cache.put(self.cache.signature(self.hashes), {"title": "Song", "artist": "Artist"})
+
+        # A shorter clip of the same passage shares most of the signature
+        hit, result = self.cache.get(self.cache.signature(self.hashes[:30]))
+        self.assertTrue(hit)
+        self.assertEqual(result["title"], "Song")
+
+        hit, _ = self.cache.get(self.cache.signature([(bytes([200 + i]) * 20, i) for i in range(20)]))
+        self.assertFalse(hit)
+
+    def test_songs_sharing_a_few_hashes_do_not_hit(self):
+        signature = self.cache.signature(self.hashes)
+        self.cache.put(signature, {"title": "Song"})
+
+        # Another song whose sketch shares 6 common hashes with the cached one
+        other = signature[:6] + [bytes([100 + i]) * 20 for i in range(10)]
+        self.assertFalse(self.cache.get(sorted(other))[0])
+        # A short clip's sketch of 3 hashes is never looked up or stored
+        self.assertFalse(self.cache.get(signature[:3])[0])
+        self.cache.put(signature[:3], {"title": "Other"})
+        self.assertEqual(self.cache.stats()["positive"], 1)
+
+    def test_negative_entry_expires(self):
+        self.cache.negative_ttl = 0.05
+        signature = self.cache.signature(self.hashes)
+        self.cache.put(signature, None)
+
+        hit, result = self.cache.get(signature)
+        self.assertTrue(hit)
+        self.assertIsNone(result)
+
+        time.sleep(0.1)
+        hit, _ = self.cache.get(signature)
+        self.assertFalse(hit)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.max_entries = 2
+        for n in range(3):
+            self.cache.put([bytes([n, k]) * 10 for k in range(16)], {"title": f"Song {n}"})
+            time.sleep(0.01)
+
+        hit, _ = self.cache.get([bytes([0, k]) * 10 for k in range(16)])
+        self.assertFalse(hit)
+        self.assertEqual(self.cache.stats()["positive"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
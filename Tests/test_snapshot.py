@@ -0,0 +1,74 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+# Add Core to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Core'))
+from database import DatabaseHandler
+from snapshot import export_snapshot, SnapshotDatabase
+
+def fake_fingerprints(seed, n=200):
+    rng = np.random.default_rng(seed)
+    # Few distinct hashes so songs share some of them
+    return [(hashlib.sha1(str(rng.integers(0, 300)).encode()).digest(), int(rng.integers(0, 500))) for _ in range(n)]
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = DatabaseHandler(os.path.join(self.temp_dir, "songs.db"))
+        self.ids = [self.add(n) for n in range(3)]
+        self.query = fake_fingerprints(0, 60)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def add(self, n):
+        song_id = self.db.add_song(f"Song {n}", "Artist", f"hash{n}")
+        self.db.store_fingerprints(song_id, fake_fingerprints(n))
+        return song_id
+
+    def assertSameAnswers(self, snapshot):
+        self.assertEqual(sorted(snapshot.get_matches(self.query)), sorted(self.db.get_matches(self.query)))
+        self.assertEqual(snapshot.get_alignment_scores(self.query, top_bins=2),
+                         self.db.get_alignment_scores(self.query, top_bins=2))
+
+    def test_full_snapshot_matches_database(self):
+        path = os.path.join(self.temp_dir, "full")
+        manifest = export_snapshot(self.db, path)
+        self.assertEqual(manifest["songs"], 3)
+        snapshot = SnapshotDatabase(path)
+        self.assertSameAnswers(snapshot)
+        self.assertEqual(snapshot.get_song_by_id(self.ids[1])[0], "Song 1")
+        self.assertEqual(snapshot.get_active_fingerprint_version(), self.db.get_active_fingerprint_version())
+
+    def test_delta_chain_applies_additions_and_deletions(self):
+        full = os.path.join(self.temp_dir, "full")
+        export_snapshot(self.db, full)
+        self.db.delete_song(self.ids[0])
+        self.add(3)
+
+        delta = os.path.join(self.temp_dir, "delta")
+        manifest = export_snapshot(self.db, delta, base=full)
+        self.assertEqual(manifest["songs"], 1)
+        self.assertEqual(manifest["deleted"], [self.ids[0]])
+
+        snapshot = SnapshotDatabase(delta)
+        self.assertSameAnswers(snapshot)
+        self.assertIsNone(snapshot.get_song_by_id(self.ids[0]))
+
+    def test_corrupted_file_is_rejected(self):
+        path = os.path.join(self.temp_dir, "full")
+        export_snapshot(self.db, path)
+        with open(os.path.join(path, "songs.json"), "w") as f:
+            json.dump([], f)
+        with self.assertRaises(ValueError):
+            SnapshotDatabase(path)
+
+if __name__ == '__main__':
+    unittest.main()
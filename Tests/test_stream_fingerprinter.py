@@ -0,0 +1,85 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+
+# Add Core and Preprocessing to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Core'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Preprocessing'))
+from processor import AudioProcessor
+from fingerprinter import Fingerprinter
+from stream_fingerprinter import StreamingFingerprinter
+
+class TestStreamingFingerprinter(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        sr = 44100
+        t = np.arange(sr * 6) / sr
+        tones = np.repeat(rng.uniform(200, 4000, 24), len(t) // 24 + 1)[:len(t)]
+        self.y = (0.6 * np.sin(2 * np.pi * tones * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+        self.processor = AudioProcessor()
+        self.fingerprinter = Fingerprinter()
+
+    def test_chunked_stream_matches_offline_hashes(self):
+        spec = self.processor.get_spectrogram(self.y)
+        offline = self.fingerprinter.generate_hashes(self.fingerprinter.get_2d_peaks(spec))
+
+        stream = StreamingFingerprinter.from_processor(self.processor, self.fingerprinter)
+        hashes = []
+        for i in range(0, len(self.y), 11025):
+            hashes += stream.feed(self.y[i:i + 11025])
+        hashes += stream.finish()
+
+        self.assertGreater(len(offline), 0)
+        self.assertEqual(hashes, offline)
+        self.assertEqual(stream.frames, spec.shape[1])
+
+    def test_zone_pairing_streams_and_respects_zone(self):
+        fingerprinter = Fingerprinter(pairing="zone", zone_max_dt=30, zone_df=100)
+        spec = self.processor.get_spectrogram(self.y)
+        peaks = fingerprinter.get_2d_peaks(spec)
+        offline = fingerprinter.generate_hashes(list(peaks))
+        self.assertGreater(len(offline), 0)
+
+        # Brute-force reference: first fan_value - 1 in-zone targets per anchor
+        peaks.sort(key=lambda x: x[1])
+        expected = 0
+        for i, (f1, t1) in enumerate(peaks):
+            targets = [p for p in peaks[i + 1:] if 1 <= p[1] - t1 <= 30 and abs(p[0] - f1) <= 100]
+            expected += min(len(targets), fingerprinter.fan_value - 1)
+        self.assertEqual(len(offline), expected)
+
+        stream = StreamingFingerprinter.from_processor(self.processor, fingerprinter)
+        hashes = []
+        for i in range(0, len(self.y), 11025):
+            hashes += stream.feed(self.y[i:i + 11025])
+        hashes += stream.finish()
+        self.assertEqual(hashes, offline)
+
+    def test_peak_budget_caps_density_and_streams(self):
+        noisy = self.y + 0.3 * np.random.default_rng(1).standard_normal(len(self.y)).astype(np.float32)
+        spec = self.processor.get_spectrogram(noisy)
+        fingerprinter = Fingerprinter(peak_budget=2, query_peak_budget=1, slice_frames=8, freq_bands=4)
+        unlimited = Fingerprinter().get_2d_peaks(spec)
+        peaks = fingerprinter.get_2d_peaks(spec)
+        query_peaks = fingerprinter.get_2d_peaks(spec, query=True)
+
+        cells = {}
+        for f, t in peaks:
+            cell = (t // 8, f * 4 // spec.shape[0])
+            cells[cell] = cells.get(cell, 0) + 1
+        self.assertLessEqual(max(cells.values()), 2)
+        self.assertLess(len(peaks), len(unlimited))
+        self.assertTrue(set(query_peaks) <= set(peaks))
+
+        offline = fingerprinter.generate_hashes(peaks)
+        stream = StreamingFingerprinter.from_processor(self.processor, fingerprinter)
+        hashes = []
+        for i in range(0, len(noisy), 11025):
+            hashes += stream.feed(noisy[i:i + 11025])
+        hashes += stream.finish()
+        self.assertEqual(hashes, offline)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import os
+import sys
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+# Add Training to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'AI-Module', 'Training'))
+from youtube_indexer import YouTubeIndexer
+from ingest_pipeline import fingerprint_stream
+
+class StubExtractor:
+    """Local stand-in for yt_dlp.YoutubeDL: no network, writes a synthetic tone as the download."""
+    TITLES = {"abc": "Morning Light", "xyz": "Desert Storm", "v0": "Neon River", "v1": "Paper Planes", "v2": "Cold Harbor"}
+
+    def __init__(self, temp_dir):
+        self.temp_dir = temp_dir
+        self.extractions = []
+        self.downloads = []
+
+    def _video(self, url):
+        video_id = url.rsplit('=', 1)[-1]
+        return {"id": video_id, "title": self.TITLES[video_id], "uploader": "Stub Artist",
+                "thumbnail": f"https://img/{video_id}.jpg", "duration": 4, "webpage_url": url}
+
+    def extract_info(self, url, download=True):
+        self.extractions.append(url)
+        if url.startswith("ytsearch") or "list=" in url:
+            return {"_type": "playlist", "entries": [{"url": f"https://yt/watch?v=v{n}"} for n in range(3)]}
+        info = self._video(url)
+        return self.process_ie_result(info, download=True) if download else info
+
+    @staticmethod
+    def audio(video_id):
+        rng = np.random.default_rng(sum(map(ord, video_id)))
+        t = np.arange(44100 * 4) / 44100
+        tones = np.repeat(rng.uniform(200, 4000, 16), len(t) // 16 + 1)[:len(t)]
+        return (0.6 * np.sin(2 * np.pi * tones * t)).astype(np.float32)
+
+    def process_ie_result(self, info, download=True):
+        path = os.path.join(self.temp_dir, f"{info['id']}.wav")
+        sf.write(path, self.audio(info["id"]), 44100)
+        self.downloads.append(info["id"])
+        return dict(info, requested_downloads=[{"filepath": path}])
+
+    def prepare_filename(self, info):
+        return os.path.join(self.temp_dir, f"{info['id']}.wav")
+
+class StubStreamExtractor(StubExtractor):
+    """Also resolves a direct media URL and serves it over a fake HTTP connection."""
+    def __init__(self, temp_dir, protocol="https"):
+        super().__init__(temp_dir)
+        self.protocol = protocol
+
+    def _video(self, url):
+        info = super()._video(url)
+        return dict(info, url=f"https://media/{info['id']}.wav", protocol=self.protocol, ext="wav")
+
+    def urlopen(self, request):
+        video_id = request.url.rsplit('/', 1)[-1].split('.')[0]
+        buf = io.BytesIO()
+        sf.write(buf, self.audio(video_id), 44100, format='WAV', subtype='FLOAT')
+        return io.BytesIO(buf.getvalue())
+
+# Decoder stand-in for environments without ffmpeg: WAV on stdin -> float32 PCM on stdout
+WAV_DECODER = [sys.executable, '-c', "import io, sys, soundfile as sf; "
+               "y, _ = sf.read(io.BytesIO(sys.stdin.buffer.read()), dtype='float32'); "
+               "sys.stdout.buffer.write(y.astype('<f4').tobytes())"]
+
+class TestYouTubeIndexer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.stub = StubExtractor(self.temp_dir)
+        self.indexer = YouTubeIndexer(db_path=os.path.join(self.temp_dir, "songs.db"),
+                                      temp_dir=self.temp_dir, ydl=self.stub)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_single_extraction_per_url(self):
+        self.assertTrue(self.indexer.process_and_index("https://yt/watch?v=abc"))
+        self.assertEqual(self.stub.extractions, ["https://yt/watch?v=abc"])
+
+        song = self.indexer.db.get_all_songs()[0]
+        self.assertEqual(song[1:3], ("Morning Light", "Stub Artist"))
+        self.assertEqual(song[5], "https://img/abc.jpg")
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "abc.wav")))
+
+    def test_prefetched_info_is_reused(self):
+        info = self.indexer.extract_info("https://yt/watch?v=xyz")
+        self.assertEqual(info["duration"], 4)
+        self.assertTrue(self.indexer.process_and_index("https://yt/watch?v=xyz", info=info))
+        self.assertEqual(len(self.stub.extractions), 1)
+
+    def test_playlist_uses_one_extractor(self):
+        self.assertEqual(self.indexer.index_playlist("https://yt/playlist?list=PL1", start=2), 2)
+        self.assertEqual(self.stub.downloads, ["v1", "v2"])
+
+    def test_rerun_skips_ingested_items_before_download(self):
+        self.indexer.index_playlist("https://yt/playlist?list=PL1", end=2)
+        self.stub.downloads.clear()
+
+        self.assertEqual(self.indexer.index_playlist("https://yt/playlist?list=PL1"), 1)
+        self.assertEqual(self.stub.downloads, ["v2"])
+        statuses = self.indexer.db.get_ledger_statuses([f"https://yt/watch?v=v{n}" for n in range(3)])
+        self.assertEqual(set(statuses.values()), {"done"})
+
+    def test_download_streams_into_fingerprinter(self):
+        stub = StubStreamExtractor(self.temp_dir)
+        indexer = YouTubeIndexer(db_path=os.path.join(self.temp_dir, "songs.db"), temp_dir=self.temp_dir, ydl=stub,
+                                 decoder=WAV_DECODER)
+        self.assertTrue(indexer.process_and_index("https://yt/watch?v=abc"))
+        streamed = indexer.stream_audio("https://yt/watch?v=xyz")
+        self.assertEqual(stub.downloads, [])
+        self.assertEqual(os.listdir(self.temp_dir), ["songs.db"])
+
+        # Pipeline songs carry the still-encoded download, not decoded samples
+        self.assertEqual(streamed["encoded"], stub.urlopen(mock.Mock(url="https://media/xyz.wav")).read())
+        self.assertEqual(streamed["file_hash"], "xyz.wav")
+        # Same fingerprints as decoding the whole file
+        offline = indexer.fingerprinter.generate_hashes(indexer.fingerprinter.get_2d_peaks(
+            indexer.processor.get_spectrogram(StubExtractor.audio("xyz"))))
+        blocks = indexer.processor.decode_stream([streamed["encoded"]], command=WAV_DECODER)
+        hashes, _ = fingerprint_stream(indexer.processor, indexer.fingerprinter, blocks)
+        self.assertEqual(hashes, offline)
+
+    def test_streamed_songs_are_fingerprinted_in_the_process_pool(self):
+        stub = StubStreamExtractor(self.temp_dir)
+        indexer = YouTubeIndexer(db_path=os.path.join(self.temp_dir, "songs.db"), temp_dir=self.temp_dir, ydl=stub,
+                                 decoder=WAV_DECODER, archive_dir=os.path.join(self.temp_dir, "archive"))
+        summary = indexer.index_urls([f"https://yt/watch?v=v{n}" for n in range(3)], workers=2)
+        self.assertEqual(summary["indexed"], 3)
+        self.assertEqual(summary["stages"]["fingerprint"]["done"], 3)
+        self.assertGreater(summary["stages"]["fingerprint"]["busy_seconds"], 0)
+        self.assertEqual(stub.downloads, [])
+        # Archived block by block inside the workers
+        archived = [f for _, _, files in os.walk(os.path.join(self.temp_dir, "archive")) for f in files]
+        self.assertEqual(len(archived), 3)
+
+    def test_unstreamable_format_spills_to_disk(self):
+        stub = StubStreamExtractor(self.temp_dir, protocol="m3u8_native")
+        indexer = YouTubeIndexer(db_path=os.path.join(self.temp_dir, "songs.db"), temp_dir=self.temp_dir, ydl=stub)
+        self.assertTrue(indexer.process_and_index("https://yt/watch?v=abc"))
+        self.assertEqual(stub.downloads, ["abc"])
+        self.assertEqual(len(stub.extractions), 1)
+
+        indexer.spill = False
+        self.assertFalse(indexer.process_and_index("https://yt/watch?v=xyz"))
+
+if __name__ == '__main__':
+    unittest.main()